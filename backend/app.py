@@ -15,6 +15,16 @@ from .i18n import load_locale, t
 from .routes import router as routes_router
 from .core.templates import templates, render_template
 from .core.context import get_current_lang
+from .core.workspace_index import workspace_index
+from .core import content_search
+from .core.retention import retention
+from .core.atomic import atomic
+from .core.drafts import drafts
+from .core.validators import validators
+from .core.docker_client import docker_client
+from .core.container_state import container_states
+from .core.docker_jobs import docker_jobs
+from .core.container_health import container_health
 from .config import settings
 
 logger = logging.getLogger(__name__)
@@ -44,6 +54,31 @@ app.add_middleware(
 # incluir rotas registradas
 app.include_router(routes_router)
 
+# -------------------------------
+# Serviços em background (por worker)
+# -------------------------------
+@app.on_event("startup")
+def start_services():
+    workspace_index.start()
+    retention.start()
+    container_states.start()
+    container_health.start()
+
+@app.on_event("shutdown")
+def stop_services():
+    workspace_index.stop()
+    retention.stop()
+    content_search.shutdown()
+    validators.shutdown()
+    container_health.stop()
+    container_states.stop()
+    docker_jobs.shutdown()
+    docker_client.close()
+    # rascunhos primeiro: as gravações deles entram no último lote de fsync
+    drafts.stop()
+    # último lote de fsync (rascunhos/blobs gravados em ATOMIC_FSYNC=batch)
+    atomic.stop()
+
 # -------------------------------
 # Helpers — sem vazar detalhes
 # -------------------------------
@@ -132,9 +167,11 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
         else:
             msg = t(lang, default_key)
 
+        # cabeçalhos da exceção (ex.: Content-Range no 416) seguem na resposta
         return JSONResponse(
             {"ok": False, "error": {"code": code, "message": msg}},
             status_code=exc.status_code,
+            headers=getattr(exc, "headers", None),
         )
         
     # HTML → páginas i18n conhecidas
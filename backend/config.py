@@ -61,6 +61,195 @@ class Settings:
             self.DOCKER_TIMEOUT = int(os.environ.get("DOCKER_TIMEOUT", "3"))
         except Exception:
             self.DOCKER_TIMEOUT = 3
+        # Cliente Docker compartilhado: conexões keep-alive no pool e circuito que abre
+        # após DOCKER_BREAKER_THRESHOLD falhas seguidas por DOCKER_BREAKER_COOLDOWN segundos
+        try:
+            self.DOCKER_POOL_SIZE = int(os.environ.get("DOCKER_POOL_SIZE", "10"))
+        except Exception:
+            self.DOCKER_POOL_SIZE = 10
+        try:
+            self.DOCKER_BREAKER_THRESHOLD = int(os.environ.get("DOCKER_BREAKER_THRESHOLD", "3"))
+        except Exception:
+            self.DOCKER_BREAKER_THRESHOLD = 3
+        try:
+            self.DOCKER_BREAKER_COOLDOWN = float(os.environ.get("DOCKER_BREAKER_COOLDOWN", "15"))
+        except Exception:
+            self.DOCKER_BREAKER_COOLDOWN = 15.0
+        # Estado dos containers em memória via stream de eventos do Docker (status/health sem consultar o daemon)
+        self.DOCKER_EVENTS = _b("DOCKER_EVENTS", True)
+        # Executor das operações Docker das rotas (restart/status fora do event loop):
+        # threads, fila máxima, operações simultâneas por container e prazos em segundos
+        try:
+            self.DOCKER_WORKERS = max(1, int(os.environ.get("DOCKER_WORKERS", "4")))
+        except Exception:
+            self.DOCKER_WORKERS = 4
+        try:
+            self.DOCKER_QUEUE_MAX = max(0, int(os.environ.get("DOCKER_QUEUE_MAX", "32")))
+        except Exception:
+            self.DOCKER_QUEUE_MAX = 32
+        try:
+            self.DOCKER_CONTAINER_CONCURRENCY = max(1, int(os.environ.get("DOCKER_CONTAINER_CONCURRENCY", "1")))
+        except Exception:
+            self.DOCKER_CONTAINER_CONCURRENCY = 1
+        try:
+            self.DOCKER_CALL_TIMEOUT = float(os.environ.get("DOCKER_CALL_TIMEOUT", "10"))
+        except Exception:
+            self.DOCKER_CALL_TIMEOUT = 10.0
+        try:
+            self.CONTAINER_RESTART_TIMEOUT = float(os.environ.get("CONTAINER_RESTART_TIMEOUT", "60"))
+        except Exception:
+            self.CONTAINER_RESTART_TIMEOUT = 60.0
+        # /api/health e /api/readyz: inspeções em paralelo com prazo total (parciais marcam timed_out);
+        # HEALTH_REFRESH_INTERVAL > 0 refaz em segundo plano e as rotas respondem o último snapshot
+        try:
+            self.HEALTH_SWEEP_WORKERS = max(1, int(os.environ.get("HEALTH_SWEEP_WORKERS", "8")))
+        except Exception:
+            self.HEALTH_SWEEP_WORKERS = 8
+        try:
+            self.HEALTH_SWEEP_DEADLINE = float(os.environ.get("HEALTH_SWEEP_DEADLINE", "5"))
+        except Exception:
+            self.HEALTH_SWEEP_DEADLINE = 5.0
+        try:
+            self.HEALTH_REFRESH_INTERVAL = float(os.environ.get("HEALTH_REFRESH_INTERVAL", "0"))
+        except Exception:
+            self.HEALTH_REFRESH_INTERVAL = 0.0
+
+        # Índice da árvore do workspace (auto = inotify se disponível, senão polling)
+        self.INDEX_WATCH = os.environ.get("INDEX_WATCH", "auto").strip().lower()
+        try:
+            self.INDEX_POLL_INTERVAL = float(os.environ.get("INDEX_POLL_INTERVAL", "5"))
+        except Exception:
+            self.INDEX_POLL_INTERVAL = 5.0
+
+        # Limite de entradas em /api/tree?recursive=true
+        try:
+            self.TREE_MAX_ENTRIES = int(os.environ.get("TREE_MAX_ENTRIES", "20000"))
+        except Exception:
+            self.TREE_MAX_ENTRIES = 20000
+
+        # Busca por conteúdo (/api/search/content)
+        try:
+            self.CONTENT_SEARCH_WORKERS = max(1, int(os.environ.get("CONTENT_SEARCH_WORKERS", str(min(8, os.cpu_count() or 1)))))
+        except Exception:
+            self.CONTENT_SEARCH_WORKERS = 4
+        try:
+            self.CONTENT_SEARCH_MAX_BYTES = int(os.environ.get("CONTENT_SEARCH_MAX_BYTES", str(20 * 1024 * 1024)))
+        except Exception:
+            self.CONTENT_SEARCH_MAX_BYTES = 20 * 1024 * 1024
+
+        # /api/file devolve o conteúdo inteiro em JSON só até este tamanho; acima disso 413 (usar /api/file/raw)
+        try:
+            self.FILE_INLINE_MAX_BYTES = int(os.environ.get("FILE_INLINE_MAX_BYTES", str(10 * 1024 * 1024)))
+        except Exception:
+            self.FILE_INLINE_MAX_BYTES = 10 * 1024 * 1024
+
+        # Tamanho máximo de uma janela em /api/file/window e /api/file/splice
+        try:
+            self.FILE_WINDOW_MAX_BYTES = int(os.environ.get("FILE_WINDOW_MAX_BYTES", str(4 * 1024 * 1024)))
+        except Exception:
+            self.FILE_WINDOW_MAX_BYTES = 4 * 1024 * 1024
+
+        # Diff no servidor (/api/diff): tamanho máximo de cada lado, prazo em segundos
+        # (estourado, o resto vira um 'replace' e o resultado sai como não exato) e cache
+        try:
+            self.DIFF_MAX_BYTES = int(os.environ.get("DIFF_MAX_BYTES", str(32 * 1024 * 1024)))
+        except Exception:
+            self.DIFF_MAX_BYTES = 32 * 1024 * 1024
+        try:
+            self.DIFF_TIMEOUT = float(os.environ.get("DIFF_TIMEOUT", "5"))
+        except Exception:
+            self.DIFF_TIMEOUT = 5.0
+        try:
+            self.DIFF_CACHE_ENTRIES = int(os.environ.get("DIFF_CACHE_ENTRIES", "128"))
+        except Exception:
+            self.DIFF_CACHE_ENTRIES = 128
+
+        # Validação (/api/validate): processos isolados (0 = na thread da requisição),
+        # prazo em segundos, limite de memória por processo (MB) e cache por (extensão, hash)
+        try:
+            self.VALIDATE_WORKERS = int(os.environ.get("VALIDATE_WORKERS", "2"))
+        except Exception:
+            self.VALIDATE_WORKERS = 2
+        try:
+            self.VALIDATE_TIMEOUT = float(os.environ.get("VALIDATE_TIMEOUT", "5"))
+        except Exception:
+            self.VALIDATE_TIMEOUT = 5.0
+        try:
+            self.VALIDATE_MEMORY_MB = int(os.environ.get("VALIDATE_MEMORY_MB", "512"))
+        except Exception:
+            self.VALIDATE_MEMORY_MB = 512
+        try:
+            self.VALIDATE_CACHE_ENTRIES = int(os.environ.get("VALIDATE_CACHE_ENTRIES", "512"))
+        except Exception:
+            self.VALIDATE_CACHE_ENTRIES = 512
+        # Validação direto do disco: a partir deste tamanho usa parser incremental
+        # (XML, CSV, YAML; JSON com ijson), com prazo próprio em segundos
+        try:
+            self.VALIDATE_STREAM_BYTES = int(os.environ.get("VALIDATE_STREAM_BYTES", str(8 * 1024 * 1024)))
+        except Exception:
+            self.VALIDATE_STREAM_BYTES = 8 * 1024 * 1024
+        try:
+            self.VALIDATE_STREAM_TIMEOUT = float(os.environ.get("VALIDATE_STREAM_TIMEOUT", "120"))
+        except Exception:
+            self.VALIDATE_STREAM_TIMEOUT = 120.0
+
+        # JSON Schema por glob: "docker-compose*.yml:schemas/compose.json,apps/*.yaml:schemas/app.json"
+        # (schema relativo ao workspace ou absoluto; associações salvas pela API têm prioridade)
+        self.VALIDATE_SCHEMAS: dict[str, str] = {}
+        for pair in os.environ.get("VALIDATE_SCHEMAS", "").split(","):
+            pair = pair.strip()
+            if not pair or ":" not in pair:
+                continue
+            pattern, schema = [p.strip() for p in pair.split(":", 1)]
+            if pattern and schema:
+                self.VALIDATE_SCHEMAS[pattern] = schema
+        # Schemas compilados mantidos em cache (por processo de validação)
+        try:
+            self.SCHEMA_CACHE_ENTRIES = int(os.environ.get("SCHEMA_CACHE_ENTRIES", "32"))
+        except Exception:
+            self.SCHEMA_CACHE_ENTRIES = 32
+
+        # Gravações atômicas: "always" (fsync a cada gravação), "batch" (rascunhos/blobs
+        # sincronizados em lote a cada ATOMIC_FSYNC_INTERVAL ms) ou "off"
+        self.ATOMIC_FSYNC = os.environ.get("ATOMIC_FSYNC", "batch").strip().lower()
+        try:
+            self.ATOMIC_FSYNC_INTERVAL = int(os.environ.get("ATOMIC_FSYNC_INTERVAL", "1000"))
+        except Exception:
+            self.ATOMIC_FSYNC_INTERVAL = 1000
+
+        # Rascunhos do autosave: buffer em memória (LRU) por worker, gravado no TEMP_DIR após
+        # DRAFT_FLUSH_DELAY ms sem alterações; conferido contra o disco a cada leitura
+        try:
+            self.DRAFT_BUFFER_BYTES = int(os.environ.get("DRAFT_BUFFER_BYTES", str(64 * 1024 * 1024)))
+        except Exception:
+            self.DRAFT_BUFFER_BYTES = 64 * 1024 * 1024
+        try:
+            self.DRAFT_FLUSH_DELAY = int(os.environ.get("DRAFT_FLUSH_DELAY", "2000"))
+        except Exception:
+            self.DRAFT_FLUSH_DELAY = 2000
+
+        # Backups: compressão dos blobs (zstd se o pacote zstandard existir, senão gzip)
+        self.BACKUP_COMPRESSION = os.environ.get("BACKUP_COMPRESSION", "zstd").strip().lower()
+        # "blob" = cada backup é um snapshot completo; "delta" = diff por linhas contra o anterior
+        self.BACKUP_MODE = os.environ.get("BACKUP_MODE", "blob").strip().lower()
+        try:
+            self.BACKUP_KEYFRAME_INTERVAL = max(1, int(os.environ.get("BACKUP_KEYFRAME_INTERVAL", "10")))
+        except Exception:
+            self.BACKUP_KEYFRAME_INTERVAL = 10
+        try:
+            self.BACKUP_CACHE_BYTES = int(os.environ.get("BACKUP_CACHE_BYTES", str(32 * 1024 * 1024)))
+        except Exception:
+            self.BACKUP_CACHE_BYTES = 32 * 1024 * 1024
+        # Retenção: ex. "last=10,hourly=24,daily=30" (vazio = manter tudo)
+        self.BACKUP_RETENTION = os.environ.get("BACKUP_RETENTION", "").strip()
+        try:
+            self.BACKUP_RETENTION_INTERVAL = int(os.environ.get("BACKUP_RETENTION_INTERVAL", "3600"))
+        except Exception:
+            self.BACKUP_RETENTION_INTERVAL = 3600
+        try:
+            self.BACKUP_RETENTION_BATCH = max(1, int(os.environ.get("BACKUP_RETENTION_BATCH", "500")))
+        except Exception:
+            self.BACKUP_RETENTION_BATCH = 500
 
         # Comportamento do Diff
         self.DIFF_ALLOW_EDIT = _b("DIFF_ALLOW_EDIT", False)
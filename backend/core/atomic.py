@@ -0,0 +1,271 @@
+# backend/core/atomic.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+import json, os, stat, tempfile, threading, time, logging
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# lido uma vez: os.umask() só consulta trocando o valor, o que não é seguro entre threads
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+# janela de latências recentes para p50/p95 em /api/health
+_SAMPLES = 512
+
+
+def fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def copy_owner(fd: int, st: Optional[os.stat_result]) -> bool:
+    """
+    Passa dono/grupo do arquivo original para o temporário aberto em 'fd'
+    (o rename trocaria o dono de um arquivo montado do host por root:root).
+    False se não houver permissão: aí o chamador grava no lugar.
+    """
+    if st is None:
+        return True
+    try:
+        os.fchown(fd, st.st_uid, st.st_gid)
+        return True
+    except OSError:
+        return (st.st_uid, st.st_gid) == (os.geteuid(), os.getegid())
+
+
+class AtomicWriter:
+    """
+    Gravação atômica: temporário no mesmo diretório, fsync, rename por cima e
+    fsync do diretório. Leitores nunca veem conteúdo parcial e um crash no meio
+    deixa o arquivo antigo intacto.
+
+    ATOMIC_FSYNC controla a durabilidade:
+      - "always": fsync do arquivo e do diretório em toda gravação;
+      - "batch":  o rename acontece na hora, os fsyncs vão para um flusher que
+                  agrupa tudo a cada ATOMIC_FSYNC_INTERVAL ms (um fsync por
+                  diretório por lote). Gravações com durable=True (credenciais,
+                  configurações) continuam síncronas;
+      - "off":    sem fsync (o rename continua atômico para leitores).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending_files: Set[str] = set()
+        self._pending_dirs: Set[str] = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._latencies = [0.0] * _SAMPLES
+        self._n = 0
+        self._stats = {
+            "writes": 0,
+            "bytes": 0,
+            "errors": 0,
+            "fsyncs": 0,
+            "batches": 0,
+            "batched_files": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+        }
+
+    @property
+    def policy(self) -> str:
+        return getattr(settings, "ATOMIC_FSYNC", "always")
+
+    # ------------------------------- gravação -------------------------------
+
+    def write_bytes(self, path: Path, data: bytes, durable: Optional[bool] = None) -> None:
+        """
+        Substitui 'path' por 'data' atomicamente (preserva modo, dono e
+        grupo do arquivo). durable=True força fsync imediato mesmo em modo
+        "batch". Sem permissão para manter o dono, grava no lugar (não
+        atômico, mas não muda o dono do arquivo).
+        """
+        path = Path(path)
+        t0 = time.perf_counter()
+        policy = self.policy
+        sync_now = policy == "always" or (policy == "batch" and durable)
+        try:
+            try:
+                st = path.stat()
+                mode = stat.S_IMODE(st.st_mode)
+            except FileNotFoundError:
+                st = None
+                mode = 0o666 & ~_UMASK  # mesmo modo que open() daria (mkstemp cria com 0600)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+            if not copy_owner(fd, st):
+                os.close(fd)
+                os.unlink(tmp_name)
+                self._write_in_place(path, data, sync_now)
+                if not sync_now and policy == "batch":
+                    self._defer(path)
+                self._record(time.perf_counter() - t0, len(data), 1 if sync_now else 0)
+                return
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                # depois do chown: fchown limpa setuid/setgid
+                os.fchmod(fd, mode)
+                if sync_now:
+                    os.fsync(fd)
+            except BaseException:
+                os.close(fd)
+                os.unlink(tmp_name)
+                raise
+            os.close(fd)
+            try:
+                os.replace(tmp_name, path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+            if sync_now:
+                fsync_dir(path.parent)
+            elif policy == "batch":
+                self._defer(path)
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        self._record(time.perf_counter() - t0, len(data), 2 if sync_now else 0)
+
+    @staticmethod
+    def _write_in_place(path: Path, data: bytes, sync: bool) -> None:
+        with open(path, "r+b") as f:
+            f.write(data)
+            f.truncate()
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def write_text(self, path: Path, text: str, encoding: str = "utf-8", durable: Optional[bool] = None) -> None:
+        self.write_bytes(path, text.encode(encoding), durable=durable)
+
+    def write_json(self, path: Path, data: Any, durable: Optional[bool] = None, **kwargs) -> None:
+        """json.dump com os mesmos padrões dos arquivos de configuração (indent=2, UTF-8)."""
+        kwargs.setdefault("indent", 2)
+        kwargs.setdefault("ensure_ascii", False)
+        self.write_text(path, json.dumps(data, **kwargs), durable=durable)
+
+    def sync_later(self, path: Path) -> None:
+        """Arquivo gravado por outro caminho (ex.: rename próprio): fsync conforme a política."""
+        policy = self.policy
+        if policy == "always":
+            self._fsync_file(str(path))
+            fsync_dir(Path(path).parent)
+        elif policy == "batch":
+            self._defer(Path(path))
+
+    # ------------------------------- lote -------------------------------
+
+    def _defer(self, path: Path) -> None:
+        with self._lock:
+            self._pending_files.add(str(path))
+            self._pending_dirs.add(str(path.parent))
+        self._ensure_flusher()
+        self._wake.set()
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="atomic-fsync", daemon=True)
+            self._thread.start()
+
+    def _fsync_file(self, name: str) -> bool:
+        try:
+            fd = os.open(name, os.O_RDONLY)
+        except OSError:
+            return False  # já substituído/removido: o próximo lote cuida
+        try:
+            os.fsync(fd)
+            return True
+        except OSError as e:
+            logger.warning("fsync failed for %s: %s", name, e)
+            return False
+        finally:
+            os.close(fd)
+
+    def flush(self) -> int:
+        """Executa os fsyncs pendentes agora. Retorna quantos arquivos foram sincronizados."""
+        with self._lock:
+            files, self._pending_files = self._pending_files, set()
+            dirs, self._pending_dirs = self._pending_dirs, set()
+        if not files and not dirs:
+            return 0
+        synced = sum(1 for name in files if self._fsync_file(name))
+        for d in dirs:
+            fsync_dir(Path(d))
+        with self._lock:
+            self._stats["fsyncs"] += synced + len(dirs)
+            self._stats["batches"] += 1
+            self._stats["batched_files"] += len(files)
+        return synced
+
+    def _run(self) -> None:
+        interval = max(10, getattr(settings, "ATOMIC_FSYNC_INTERVAL", 1000)) / 1000.0
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            # agrupa tudo o que chegar dentro da janela
+            self._stop.wait(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Batched fsync failed: %s", e)
+
+    def stop(self) -> None:
+        """Shutdown: para o flusher e sincroniza o que estiver pendente."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.flush()
+
+    # ------------------------------- métricas -------------------------------
+
+    def _record(self, seconds: float, size: int, fsyncs: int) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            s = self._stats
+            s["writes"] += 1
+            s["bytes"] += size
+            s["fsyncs"] += fsyncs
+            s["total_ms"] += ms
+            if ms > s["max_ms"]:
+                s["max_ms"] = ms
+            self._latencies[self._n % _SAMPLES] = ms
+            self._n += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            recent = sorted(self._latencies[:min(self._n, _SAMPLES)])
+            pending = len(self._pending_files)
+        s["policy"] = self.policy
+        s["pending"] = pending
+        s["avg_ms"] = round(s["total_ms"] / s["writes"], 3) if s["writes"] else 0.0
+        s["p50_ms"] = round(recent[len(recent) // 2], 3) if recent else 0.0
+        s["p95_ms"] = round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3) if recent else 0.0
+        s["total_ms"] = round(s["total_ms"], 3)
+        s["max_ms"] = round(s["max_ms"], 3)
+        return s
+
+
+# Instância global
+atomic = AtomicWriter()
@@ -0,0 +1,434 @@
+# backend/core/backups.py
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import difflib, gzip, hashlib, os, tempfile, threading, time, logging
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+from ..config import settings
+from .state_store import state
+from .atomic import atomic
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
+BACKUP_ROOT = BASE_DIR / ".backups"
+
+# blobs endereçados por conteúdo: .backups/.blobs/ab/abcdef…[.delta]<.zst|.gz>
+BLOB_DIR = BACKUP_ROOT / ".blobs"
+
+CHUNK = 1024 * 1024
+
+DELTA_MAGIC = b"CEDELTA1\n"
+DELTA_TAG = ".delta"
+
+
+def _use_zstd() -> bool:
+    return zstandard is not None and getattr(settings, "BACKUP_COMPRESSION", "zstd") == "zstd"
+
+
+def _blob_file(blob: str) -> Path:
+    return BLOB_DIR / blob
+
+
+def _existing_blob(digest: str, tag: str = "") -> Optional[str]:
+    """Blob já armazenado com esse digest (com qualquer codec), ou None."""
+    for sfx in (".zst", ".gz"):
+        blob = f"{digest[:2]}/{digest}{tag}{sfx}"
+        if _blob_file(blob).exists():
+            return blob
+    return None
+
+
+def _open_compressor(raw):
+    if _use_zstd():
+        return ".zst", zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return ".gz", gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+
+
+def _compress_to_temp(src: Path) -> Tuple[str, int, Path, str]:
+    """
+    Lê 'src' uma única vez, calculando o sha256 e comprimindo para um temporário
+    dentro de BLOB_DIR. Retorna (digest, tamanho original, temporário, sufixo).
+    """
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=BLOB_DIR, prefix=".incoming-")
+    tmp = Path(tmp_name)
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as raw, src.open("rb") as fin:
+            suffix, out = _open_compressor(raw)
+            with out:
+                while True:
+                    chunk = fin.read(CHUNK)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return h.hexdigest(), size, tmp, suffix
+
+
+def _link_temp(tmp: Path, digest: str, suffix: str, tag: str = "") -> str:
+    """Move o temporário para o nome definitivo, ou descarta se o conteúdo já existe."""
+    existing = _existing_blob(digest, tag)
+    if existing:
+        tmp.unlink(missing_ok=True)
+        return existing
+    blob = f"{digest[:2]}/{digest}{tag}{suffix}"
+    target = _blob_file(blob)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, target)
+    atomic.sync_later(target)
+    return blob
+
+
+def _bytes_to_temp(data: bytes) -> Tuple[str, Path, str]:
+    """Comprime 'data' para um temporário em BLOB_DIR: (digest, temporário, sufixo)."""
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=BLOB_DIR, prefix=".incoming-")
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            suffix, out = _open_compressor(raw)
+            with out:
+                out.write(data)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return hashlib.sha256(data).hexdigest(), tmp, suffix
+
+
+def _store_bytes(data: bytes, tag: str = "") -> str:
+    """Grava 'data' (já em memória) como blob deduplicado. Chamar dentro de state.transaction()."""
+    existing = _existing_blob(hashlib.sha256(data).hexdigest(), tag)
+    if existing:
+        return existing
+    digest, tmp, suffix = _bytes_to_temp(data)
+    try:
+        return _link_temp(tmp, digest, suffix, tag)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def read_blob(blob: str) -> bytes:
+    path = _blob_file(blob)
+    data = path.read_bytes()
+    if blob.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read %s" % blob)
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=2**31)
+    return gzip.decompress(data)
+
+
+def blob_disk_size(blob: str) -> int:
+    """Tamanho comprimido do blob em disco."""
+    return _blob_file(blob).stat().st_size
+
+
+def _drop_blob(blob: str) -> None:
+    try:
+        _blob_file(blob).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Failed to remove backup blob %s: %s", blob, e)
+
+
+def _collect(blobs: Iterable[Optional[str]]) -> None:
+    """
+    Apaga os blobs que ficaram sem referência. Chamar depois do COMMIT que
+    removeu as linhas (um ROLLBACK nunca deixa o índice apontando para blob
+    apagado); a recontagem numa transação curta serializa com o
+    check-and-link de um backup novo que deduplique no mesmo blob.
+    """
+    blobs = {b for b in blobs if b}
+    if not blobs:
+        return
+    with state.transaction():
+        for blob in blobs:
+            if state.blob_refs(blob) == 0:
+                _drop_blob(blob)
+
+
+# ------------------------------- deltas por linha -------------------------------
+#
+# Formato (bytes, sem depender de encoding):
+#   CEDELTA1\n
+#   C <início> <qtd>\n      copia linhas da versão base
+#   I <bytes>\n<dados>      insere bytes literais
+#
+
+def encode_delta(base: bytes, new: bytes) -> bytes:
+    a = base.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    out = [DELTA_MAGIC]
+    sm = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag == "equal":
+            out.append(b"C %d %d\n" % (i1, i2 - i1))
+        elif j2 > j1:
+            chunk = b"".join(b[j1:j2])
+            out.append(b"I %d\n" % len(chunk))
+            out.append(chunk)
+    return b"".join(out)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    if not delta.startswith(DELTA_MAGIC):
+        raise ValueError("invalid backup delta")
+    lines = base.splitlines(keepends=True)
+    out = []
+    pos = len(DELTA_MAGIC)
+    end = len(delta)
+    while pos < end:
+        nl = delta.index(b"\n", pos)
+        head = delta[pos:nl].split()
+        pos = nl + 1
+        if head[0] == b"C":
+            start, count = int(head[1]), int(head[2])
+            out.extend(lines[start:start + count])
+        elif head[0] == b"I":
+            n = int(head[1])
+            out.append(delta[pos:pos + n])
+            pos += n
+        else:
+            raise ValueError("invalid backup delta")
+    return b"".join(out)
+
+
+# ------------------------------- reconstrução -------------------------------
+
+class _ContentCache:
+    """
+    LRU de versões reconstruídas, limitada em bytes, por processo (cada worker
+    tem a sua). A chave é o id do backup: ids nunca são reaproveitados e o
+    conteúdo de um id não muda (um rebase só troca a forma de armazenar), então
+    o que outro worker grava ou remove nunca deixa uma entrada errada aqui.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[int, bytes]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: int) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key: int, data: bytes) -> None:
+        limit = getattr(settings, "BACKUP_CACHE_BYTES", 32 * 1024 * 1024)
+        if len(data) > limit // 4:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = data
+            self._bytes += len(data)
+            while self._bytes > limit and self._items:
+                _, dropped = self._items.popitem(last=False)
+                self._bytes -= len(dropped)
+
+    def discard(self, key: int) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+
+
+_cache = _ContentCache()
+
+
+def _materialize(backup_id: int) -> bytes:
+    """
+    Conteúdo completo do backup: sobe a cadeia até um keyframe (ou uma versão em
+    cache) e aplica os deltas. O custo é limitado por BACKUP_KEYFRAME_INTERVAL.
+    """
+    data = _cache.get(backup_id)
+    if data is not None:
+        return data
+    chain: List[str] = []
+    cur = backup_id
+    while True:
+        hit = _cache.get(cur)
+        if hit is not None:
+            data = hit
+            break
+        node = state.backup_node(cur)
+        if node is None or not node[0]:
+            raise FileNotFoundError("backup %s is not stored as a blob" % cur)
+        blob, base, _depth = node
+        if base is None:
+            data = read_blob(blob)
+            break
+        chain.append(blob)
+        cur = base
+    for blob in reversed(chain):
+        data = apply_delta(data, read_blob(blob))
+    _cache.put(backup_id, data)
+    return data
+
+
+def _delta_mode() -> bool:
+    return getattr(settings, "BACKUP_MODE", "blob") == "delta"
+
+
+def _plan_version(file_rel: str, data: bytes) -> Tuple[bytes, str, Optional[int], int]:
+    """
+    (conteúdo a gravar, tag, base, depth) para uma nova versão em modo delta.
+    Vira keyframe quando a cadeia chegaria a BACKUP_KEYFRAME_INTERVAL, quando não
+    há versão anterior em blob ou quando o delta não compensa (mais da metade do
+    arquivo). Pode rodar fora de transação: a reconstrução e o difflib são a
+    parte cara.
+    """
+    interval = getattr(settings, "BACKUP_KEYFRAME_INTERVAL", 10)
+    latest = state.latest_backup(file_rel)
+    if latest and latest[2] and latest[3] + 1 < interval:
+        try:
+            delta = encode_delta(_materialize(latest[0]), data)
+        except (OSError, ValueError) as e:
+            # base removida/rebaseada por outro worker no meio: grava keyframe
+            logger.debug("Delta base for %s unavailable: %s", file_rel, e)
+        else:
+            if len(delta) < max(256, len(data) // 2):
+                return delta, DELTA_TAG, latest[0], latest[3] + 1
+    return data, "", None, 0
+
+
+def _store_version(file_rel: str, data: bytes) -> Tuple[str, Optional[int], int]:
+    """(blob, base, depth) da nova versão, calculada e gravada dentro da transação."""
+    payload, tag, base, depth = _plan_version(file_rel, data)
+    return _store_bytes(payload, tag), base, depth
+
+
+def _delete_row(backup_rel: str, row: tuple) -> List[str]:
+    """
+    Remove um backup em blob. Quem usava esse backup como base é refeito contra a
+    base dele (ou vira keyframe), para a cadeia nunca ficar quebrada. Retorna os
+    blobs que podem ter ficado sem referência (para _collect() após o commit).
+    """
+    released = [row[1]]
+    backup_id, base, depth = row[4], row[5], row[6] or 0
+    dependents = state.backup_dependents(backup_id)
+    if dependents:
+        base_data = _materialize(base) if base is not None else None
+        for dep_id, dep_blob in dependents:
+            data = _materialize(dep_id)
+            if base_data is None:
+                new_blob, new_base, new_depth = _store_bytes(data), None, 0
+            else:
+                new_blob, new_base, new_depth = _store_bytes(encode_delta(base_data, data), DELTA_TAG), base, depth
+            state.rebase_backup(dep_id, new_blob, new_base, new_depth)
+            if dep_blob != new_blob:
+                released.append(dep_blob)
+    state.remove_backup(backup_rel)
+    _cache.discard(backup_id)
+    return released
+
+
+# ------------------------------- API usada pelas rotas -------------------------------
+
+def create_backup(file_rel: str, backup_rel: str, src: Path) -> dict:
+    """
+    Guarda o conteúdo de 'src' como blob (deduplicado por sha256) ou, em
+    BACKUP_MODE=delta, como delta por linhas contra o backup anterior, e indexa
+    'backup_rel' apontando para ele. O caminho do backup é só um nome lógico.
+    """
+    released: List[str] = []
+    if _delta_mode():
+        data = src.read_bytes()
+        # delta e compressão fora da transação: o lock de escrita só cobre a troca no índice
+        payload, tag, base, depth = _plan_version(file_rel, data)
+        digest, tmp, suffix = _bytes_to_temp(payload)
+        try:
+            with state.transaction():
+                # mesmo nome reaproveitado (dois backups no mesmo segundo): substitui
+                row = state.get_backup(backup_rel)
+                if row and row[1]:
+                    released = _delete_row(backup_rel, row)
+                latest = state.latest_backup(file_rel)
+                if base is None or (latest and latest[0] == base and latest[2] and latest[3] == depth - 1):
+                    blob = _link_temp(tmp, digest, suffix, tag)
+                else:
+                    # outro backup do arquivo entrou (ou a base saiu) no meio: refaz contra o atual
+                    blob, base, depth = _store_version(file_rel, data)
+                state.add_backup(file_rel, backup_rel, blob=blob, size=len(data),
+                                 created=time.time(), base=base, depth=depth)
+                _cache.put(state.get_backup(backup_rel)[4], data)
+        finally:
+            tmp.unlink(missing_ok=True)
+        _collect(released)
+        return {"blob": blob, "size": len(data), "delta": base is not None}
+
+    digest, size, tmp, suffix = _compress_to_temp(src)
+    # check-and-link dentro da transação: serializa com delete/GC de outros workers
+    try:
+        with state.transaction():
+            row = state.get_backup(backup_rel)
+            if row and row[1]:
+                released = _delete_row(backup_rel, row)
+            blob = _link_temp(tmp, digest, suffix)
+            state.add_backup(file_rel, backup_rel, blob=blob, size=size, created=time.time())
+    finally:
+        tmp.unlink(missing_ok=True)
+    _collect(released)
+    return {"blob": blob, "size": size, "delta": False}
+
+
+def read_backup(backup_rel: str) -> Optional[Tuple[bytes, float]]:
+    """(conteúdo, criado em) de um backup em blob; None se for cópia física antiga ou desconhecido."""
+    row = state.get_backup(backup_rel)
+    if not row or not row[1]:
+        return None
+    return _materialize(row[4]), row[3] or 0.0
+
+
+def restore_backup(backup_rel: str, dst: Path) -> bool:
+    """Restaura o backup em 'dst'. False se não for backup em blob (o chamador usa o arquivo físico)."""
+    found = read_backup(backup_rel)
+    if found is None:
+        return False
+    atomic.write_bytes(dst, found[0], durable=True)
+    return True
+
+
+def delete_backup(backup_rel: str) -> bool:
+    """Remove o backup do índice e o blob se ninguém mais o referencia. False se não indexado em blob."""
+    return bool(delete_backups([backup_rel]))
+
+
+def delete_backups(backup_rels: Iterable[str]) -> List[str]:
+    """
+    Remove vários backups em blob numa única transação (curta: chamadores em
+    lote passam poucos por vez) e apaga os blobs órfãos depois do commit.
+    Retorna os que estavam indexados em blob e foram removidos.
+    """
+    removed: List[str] = []
+    released: List[str] = []
+    with state.transaction():
+        for backup_rel in backup_rels:
+            row = state.get_backup(backup_rel)
+            if not row or not row[1]:
+                continue
+            released.extend(_delete_row(backup_rel, row))
+            removed.append(backup_rel)
+    _collect(released)
+    return removed
+
+
+def forget_file(file_rel: str) -> None:
+    """Arquivo apagado do workspace: limpa estado e blobs órfãos (a cadeia inteira vai junto)."""
+    _collect(state.forget_file(file_rel))
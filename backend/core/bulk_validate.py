@@ -0,0 +1,164 @@
+# backend/core/bulk_validate.py
+from __future__ import annotations
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import json, time, logging
+
+from .state_store import state
+from .validators import validators, supported, fits
+from . import file_io, schemas
+
+logger = logging.getLogger(__name__)
+
+# resultados gravados no banco a cada N arquivos (uma transação por lote)
+SAVE_BATCH = 200
+
+
+def _line(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def stream_validate(root_rel: str, files: Iterable[Tuple[str, Path]],
+                    describe: Callable[[dict], str], force: bool = False) -> Iterator[str]:
+    """
+    Valida em lote os arquivos com validador registrado e gera NDJSON: uma linha
+    por arquivo ({"type": "file", ...}) e uma de resumo no fim.
+
+    Incremental: (mtime, tamanho) iguais ao da última execução reaproveitam o
+    resultado sem ler o arquivo; se só o mtime mudou, o hash decide. O que muda
+    vai para o pool de validadores, que lê direto do disco (incremental nos
+    arquivos grandes, ver validators.use_stream). O schema associado entra na
+    identidade do resultado guardado: trocar ou editar o schema revalida os
+    arquivos que o usam. 'describe' traduz o
+    resultado em mensagem (i18n fica na rota).
+    """
+    t0 = time.perf_counter()
+    known = state.validations_under(root_rel)
+    schema_for = schemas.resolver()
+    seen = set()
+    pending: List[tuple] = []
+    meta = {}
+    counts = {"files": 0, "validated": 0, "skipped": 0, "passed": 0, "failed": 0,
+              "timed_out": 0, "too_large": 0}
+
+    def emit(rel: str, result: dict, skipped: bool, good_at: Optional[float]) -> str:
+        counts["skipped" if skipped else "validated"] += 1
+        counts["passed" if result["success"] else "failed"] += 1
+        if result.get("timed_out"):
+            counts["timed_out"] += 1
+        return _line({
+            "type": "file",
+            "path": rel,
+            "success": result["success"],
+            "message": describe(result),
+            "errors": result.get("errors", []),
+            "skipped": skipped,
+            "cached": result.get("cached", False),
+            "timed_out": result.get("timed_out", False),
+            "streamed": result.get("streamed", False),
+            "schema": result.get("schema"),
+            "last_good": good_at,
+        })
+
+    def flush() -> None:
+        if pending:
+            try:
+                state.save_validations(pending)
+            except Exception as e:
+                logger.warning("Failed to save validation results: %s", e)
+            pending.clear()
+
+    def jobs():
+        """Arquivos que precisam de validação; os inalterados saem direto em 'ready'."""
+        for rel, path in files:
+            if not supported(path.suffix):
+                continue
+            seen.add(rel)
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            counts["files"] += 1
+            row = known.get(rel)
+            schema = schema_for(rel)
+            # coluna 'hash' = sha256 do conteúdo + "|" + versão do schema, se houver
+            suffix = "|" + schemas.token(schema) if schema else ""
+            if not fits(path.suffix, st.st_size):
+                counts["too_large"] += 1
+                ready.append(_line({"type": "file", "path": rel, "success": False, "skipped": True,
+                                    "too_large": True, "errors": [], "message": describe(
+                                        {"success": False, "key": "errors.file_too_large"}),
+                                    "last_good": row[7] if row else None}))
+                continue
+            if (row and not force and row[0] == st.st_mtime_ns and row[1] == st.st_size
+                    and _suffix(row[2]) == suffix):
+                ready.append(emit(rel, _stored(row), True, row[7]))
+                continue
+            try:
+                digest = file_io.content_hash(path, st)
+            except OSError:
+                continue
+            if row and not force and row[2] == digest + suffix:
+                # só o mtime mudou (touch, checkout): mesmo resultado
+                pending.append((rel, st.st_mtime_ns, st.st_size, digest + suffix, row[3], row[4], row[5]))
+                ready.append(emit(rel, _stored(row), True, row[7]))
+                continue
+            meta[rel] = (st.st_mtime_ns, st.st_size, digest + suffix, row[7] if row else None)
+            yield rel, path.suffix, str(path), digest, st.st_size, schema
+
+    ready: "deque[str]" = deque()
+    source = validators.validate_many(jobs())
+    for rel, result in source:
+        while ready:
+            yield ready.popleft()
+        mtime_ns, size, digest, good_at = meta.pop(rel)
+        now = time.time()
+        if not result.get("timed_out"):
+            # timeout não é resultado do conteúdo: não vira estado persistido
+            stored = {"key": result["key"], "errors": result.get("errors", []), "schema": result.get("schema")}
+            pending.append((rel, mtime_ns, size, digest, int(result["success"]), json.dumps(stored), now))
+            if result["success"]:
+                good_at = now
+        yield emit(rel, result, False, good_at)
+        if len(pending) >= SAVE_BATCH:
+            flush()
+    while ready:
+        yield ready.popleft()
+
+    # arquivos que não existem mais sob a pasta
+    gone = [p for p in known if p not in seen]
+    if gone:
+        try:
+            state.save_validations(pending, drop=gone)
+            pending.clear()
+        except Exception as e:
+            logger.warning("Failed to save validation results: %s", e)
+    flush()
+
+    yield _line({
+        "type": "summary",
+        **counts,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    })
+
+
+def _stored(row: tuple) -> dict:
+    """Linha de 'validations' -> resultado no formato do pool."""
+    try:
+        data = json.loads(row[4] or "{}")
+    except ValueError:
+        data = {}
+    success = bool(row[3])
+    return {
+        "success": success,
+        "key": data.get("key") or ("validate.generic_ok" if success else "validate.error"),
+        "errors": data.get("errors", []),
+        "schema": data.get("schema"),
+    }
+
+
+def _suffix(stored_hash: Optional[str]) -> str:
+    """Parte do schema na coluna 'hash' ("" = validado sem schema)."""
+    digest, sep, tok = (stored_hash or "").partition("|")
+    return sep + tok
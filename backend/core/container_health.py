@@ -0,0 +1,215 @@
+# backend/core/container_health.py
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+import os, threading, time, logging
+
+from ..config import settings
+from .state_store import state
+from .docker_client import docker_client
+from .container_state import container_states
+
+logger = logging.getLogger(__name__)
+
+
+def docker_enabled() -> bool:
+    # Permite desativar checagens de Docker via env
+    if os.environ.get("DISABLE_DOCKER_CHECKS", "").lower() in ("1", "true", "yes", "on"):
+        return False
+    if container_states.ready:
+        return True
+    # cliente compartilhado: conexão reaproveitada, circuito aberto responde na hora
+    return docker_client.installed and docker_client.ping()
+
+
+def container_state(cname: str) -> Tuple[Optional[str], Optional[str]]:
+    """(status, health) do container; exceção se não encontrado/inacessível."""
+    if container_states.ready:
+        # tabela mantida pelo stream de eventos: sem ida ao daemon
+        hit = container_states.resolve(cname, exact=True)
+        if hit is None:
+            raise LookupError(cname)
+        return hit["status"], hit["health"]
+    c = docker_client.call(lambda client: client.containers.get(cname))
+    st = (getattr(c, "attrs", {}) or {}).get("State") or {}
+    return st.get("Status"), (st.get("Health") or {}).get("Status")
+
+
+def load_dynamic() -> Dict[str, str]:
+    try:
+        return state.containers_map()
+    except Exception as e:
+        logger.warning("Failed to read container associations: %s", e)
+    return {}
+
+
+def container_names() -> List[str]:
+    """Containers associados (settings + workspace + DEFAULT_CONTAINER)."""
+    names = set(dict(getattr(settings, "FILE_CONTAINERS", {})).values()) | set(load_dynamic().values())
+    default_c = os.environ.get("DEFAULT_CONTAINER")
+    if default_c:
+        names.add(default_c)
+    return sorted(names)
+
+
+def _entry(status=None, health=None, timed_out=False) -> dict:
+    ok = (status == "running") and (health in (None, "healthy"))
+    return {"ok": ok, "status": status, "health": health, "timed_out": timed_out}
+
+
+class ContainerHealth:
+    """
+    Inspeção dos containers associados para /api/health e /api/readyz.
+
+    - sweep(): inspeções em paralelo (HEALTH_SWEEP_WORKERS threads) com prazo
+      total HEALTH_SWEEP_DEADLINE; o que não voltou a tempo sai com
+      timed_out=True e status/health nulos (resultado parcial). Inspeção
+      ainda em andamento de um sweep anterior é reaproveitada, não repetida.
+    - com HEALTH_REFRESH_INTERVAL > 0 uma thread refaz o sweep em segundo
+      plano e as rotas respondem o último snapshot com a idade dele.
+    Com a tabela de eventos pronta não há ida ao daemon: responde inline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._snapshot: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"sweeps": 0, "inspections": 0, "timed_out": 0, "refreshes": 0,
+                       "last_duration_ms": None}
+
+    @staticmethod
+    def _interval() -> float:
+        return max(0.0, getattr(settings, "HEALTH_REFRESH_INTERVAL", 0.0))
+
+    @staticmethod
+    def _deadline() -> float:
+        return max(0.1, getattr(settings, "HEALTH_SWEEP_DEADLINE", 5.0))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=max(1, getattr(settings, "HEALTH_SWEEP_WORKERS", 8)),
+                    thread_name_prefix="health-sweep",
+                )
+            return self._pool
+
+    # ------------------------------- ciclo de vida -------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None or self._interval() <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._inflight.clear()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Background health refresh failed: %s", e)
+            self._stop.wait(self._interval())
+
+    # ------------------------------- inspeção -------------------------------
+
+    def _submit(self, cname: str) -> Future:
+        pool = self._executor()
+        with self._lock:
+            fut = self._inflight.get(cname)
+            if fut is not None and not fut.done():
+                return fut
+            fut = pool.submit(container_state, cname)
+            self._inflight[cname] = fut
+            self._stats["inspections"] += 1
+        fut.add_done_callback(lambda f, n=cname: self._forget(n, f))
+        return fut
+
+    def _forget(self, cname: str, fut: Future) -> None:
+        with self._lock:
+            if self._inflight.get(cname) is fut:
+                del self._inflight[cname]
+
+    def sweep(self, names: Iterable[str], deadline: Optional[float] = None) -> Dict[str, dict]:
+        """nome -> {"ok", "status", "health", "timed_out"} dentro do prazo total."""
+        names = list(dict.fromkeys(names))
+        t0 = time.perf_counter()
+        out: Dict[str, dict] = {}
+        if container_states.ready:
+            for cname in names:
+                try:
+                    out[cname] = _entry(*container_state(cname))
+                except Exception:
+                    out[cname] = _entry()
+        elif names:
+            futures = {cname: self._submit(cname) for cname in names}
+            wait(futures.values(), timeout=self._deadline() if deadline is None else deadline)
+            late = 0
+            for cname, fut in futures.items():
+                if not fut.done():
+                    # segue rodando (limitada pelo timeout do cliente); o próximo sweep reaproveita
+                    late += 1
+                    out[cname] = _entry(timed_out=True)
+                    continue
+                try:
+                    out[cname] = _entry(*fut.result())
+                except Exception as e:
+                    logger.debug("Container inspect failed (%s): %s", cname, e)
+                    out[cname] = _entry()
+            if late:
+                logger.warning("Health sweep deadline hit: %d of %d containers pending", late, len(names))
+        with self._lock:
+            self._stats["sweeps"] += 1
+            self._stats["timed_out"] += sum(1 for e in out.values() if e["timed_out"])
+            self._stats["last_duration_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return out
+
+    # ------------------------------- snapshot -------------------------------
+
+    @property
+    def background(self) -> bool:
+        return self._thread is not None
+
+    def refresh(self) -> dict:
+        available = docker_enabled()
+        containers = self.sweep(container_names()) if available else {}
+        snap = {"available": available, "containers": containers, "taken_at": time.time()}
+        with self._lock:
+            self._snapshot = snap
+            self._stats["refreshes"] += 1
+        return snap
+
+    def snapshot(self) -> Optional[dict]:
+        """Último snapshot do refresh em segundo plano (com "age" em segundos), ou None."""
+        with self._lock:
+            snap = self._snapshot
+        if snap is None or not self.background:
+            return None
+        return {**snap, "age": round(time.time() - snap["taken_at"], 1)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["pending"] = sum(1 for f in self._inflight.values() if not f.done())
+        s["deadline"] = self._deadline()
+        s["background"] = self.background
+        s["refresh_interval"] = self._interval()
+        return s
+
+
+# Instância global
+container_health = ContainerHealth()
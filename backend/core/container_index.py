@@ -0,0 +1,134 @@
+# backend/core/container_index.py
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+import re, time
+
+# rótulos do Compose usados na resolução por serviço
+COMPOSE_PROJECT = "com.docker.compose.project"
+COMPOSE_SERVICE = "com.docker.compose.service"
+
+# tamanho mínimo de prefixo de ID aceito (evita "a" casar com metade dos IDs)
+MIN_ID_PREFIX = 4
+
+
+# "Up 5 minutes (healthy)", "Up 2 seconds (health: starting)"
+_HEALTH_IN_STATUS = re.compile(r"\((?:health: )?(healthy|unhealthy|starting)\)")
+
+
+def health_from_status(status: str) -> Optional[str]:
+    m = _HEALTH_IN_STATUS.search(status or "")
+    return m.group(1) if m else None
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def entry_from_row(row: dict) -> dict:
+    """Linha da listagem de baixo nível (client.api.containers) -> entrada do índice."""
+    cid = row.get("Id") or ""
+    names = [n.lstrip("/") for n in (row.get("Names") or []) if n]
+    labels = row.get("Labels") or {}
+    return {
+        "id": cid,
+        "name": names[0] if names else cid[:12],
+        "status": (row.get("State") or "").lower() or None,
+        "health": health_from_status(row.get("Status") or ""),
+        "project": labels.get(COMPOSE_PROJECT),
+        "service": labels.get(COMPOSE_SERVICE),
+        "updated": time.time(),
+    }
+
+
+class ContainerIndex:
+    """
+    Índices para resolver uma referência de container sem varrer a lista:
+    nome exato, IDs ordenados (prefixo por bisect), serviço/projeto do
+    Compose e trigramas dos nomes (substring). Imutável: quem mantém a
+    tabela reconstrói quando nomes/containers mudam.
+
+    resolve() devolve a entrada com "match" (motivo) e "ambiguous" (os
+    outros nomes que casaram no mesmo nível; vazio = única).
+    """
+
+    def __init__(self, entries: Iterable[dict]):
+        self._entries: Dict[str, dict] = {e["id"]: e for e in entries if e.get("id")}
+        self._ids: List[str] = sorted(self._entries)
+        self._names: Dict[str, List[str]] = {}
+        self._services: Dict[str, List[str]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        for cid, e in self._entries.items():
+            name = e["name"].lower()
+            self._names.setdefault(name, []).append(cid)
+            for gram in _grams(name):
+                self._grams.setdefault(gram, set()).add(cid)
+            service = (e.get("service") or "").lower()
+            if service:
+                self._services.setdefault(service, []).append(cid)
+                project = (e.get("project") or "").lower()
+                if project:
+                    for sep in ("-", "_"):
+                        self._services.setdefault(f"{project}{sep}{service}", []).append(cid)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "ContainerIndex":
+        return cls(entry_from_row(r) for r in rows or [])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _id_prefix(self, ref: str) -> List[str]:
+        out = []
+        i = bisect_left(self._ids, ref)
+        while i < len(self._ids) and self._ids[i].startswith(ref):
+            out.append(self._ids[i])
+            i += 1
+        return out
+
+    def _substring(self, ref: str) -> List[str]:
+        if len(ref) >= 3:
+            # candidatos = interseção das listas de trigramas; confirma no nome
+            sets = sorted((self._grams.get(g, set()) for g in _grams(ref)), key=len)
+            ids = set.intersection(*sets) if sets else set()
+        else:
+            ids = self._entries.keys()
+        return [cid for cid in ids if ref in self._entries[cid]["name"].lower()]
+
+    def _pick(self, ids: List[str], reason: str) -> dict:
+        ordered = sorted(ids, key=lambda cid: self._entries[cid]["name"])
+        hit = dict(self._entries[ordered[0]])
+        hit["match"] = reason
+        hit["ambiguous"] = [self._entries[cid]["name"] for cid in ordered[1:]]
+        return hit
+
+    def resolve(self, ref: str, exact: bool = False) -> Optional[dict]:
+        """
+        Ordem do daemon (ID completo, nome, prefixo de ID) e depois as
+        conveniências: sufixo do Compose (-1/_1), serviço do Compose
+        ("web" ou "projeto-web") e substring do nome. Com 'exact' para no
+        prefixo de ID, como containers.get().
+        """
+        ref = (ref or "").strip().lstrip("/")
+        if not ref:
+            return None
+        rlow = ref.lower()
+        if ref in self._entries:
+            return self._pick([ref], "id")
+        if rlow in self._names:
+            return self._pick(self._names[rlow], "name")
+        if len(rlow) >= MIN_ID_PREFIX:
+            ids = self._id_prefix(rlow)
+            if ids:
+                return self._pick(ids, "id_prefix")
+        if exact:
+            return None
+        ids = self._names.get(f"{rlow}-1", []) + self._names.get(f"{rlow}_1", [])
+        if ids:
+            return self._pick(ids, "compose_suffix")
+        if rlow in self._services:
+            return self._pick(self._services[rlow], "compose_service")
+        ids = self._substring(rlow)
+        if ids:
+            return self._pick(ids, "substring")
+        return None
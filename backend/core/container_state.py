@@ -0,0 +1,181 @@
+# backend/core/container_state.py
+from __future__ import annotations
+from typing import Dict, List, Optional
+import os, threading, time, logging
+
+from ..config import settings
+from .docker_client import docker_client
+from .container_index import ContainerIndex, entry_from_row, COMPOSE_PROJECT, COMPOSE_SERVICE
+
+logger = logging.getLogger(__name__)
+
+# ação do evento -> status do container
+_ACTION_STATUS = {
+    "create": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+    "stop": "exited",
+}
+
+
+class ContainerStateCache:
+    """
+    Tabela em memória (id -> nome, status, health) alimentada pela API de
+    eventos do Docker: uma listagem inicial e depois start/die/health_status/
+    rename/destroy... pelo stream, numa thread por worker. Rotas de status e
+    health respondem daqui enquanto 'ready'; com o stream caído (daemon
+    reiniciando, circuito aberto) 'ready' fica falso e elas voltam a consultar
+    o daemon até a próxima listagem.
+
+    A resolução de nomes usa um ContainerIndex sobre a mesma tabela,
+    reconstruído só quando containers entram, saem ou mudam de nome (status e
+    health são atualizados nas próprias entradas).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id: Dict[str, dict] = {}
+        self._index: Optional[ContainerIndex] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stream = None
+        self.ready = False
+        self._stats = {"seeds": 0, "events": 0, "stream_errors": 0, "index_builds": 0,
+                       "last_event": None, "seeded_at": None}
+
+    # ------------------------------- ciclo de vida -------------------------------
+
+    @staticmethod
+    def enabled() -> bool:
+        if os.environ.get("DISABLE_DOCKER_CHECKS", "").lower() in ("1", "true", "yes", "on"):
+            return False
+        return docker_client.installed and getattr(settings, "DOCKER_EVENTS", True)
+
+    def start(self) -> None:
+        if self._thread is not None or not self.enabled():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="docker-events", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._close_stream()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.ready = False
+
+    def _close_stream(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.close()  # desbloqueia a leitura na thread de eventos
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                since = int(time.time())
+                self._seed(docker_client.call(lambda client: client.api.containers(all=True)))
+                # eventos desde antes da listagem: o que aconteceu no meio é reaplicado
+                self._stream = docker_client.call(
+                    lambda client: client.api.events(since=since, decode=True, filters={"type": "container"}),
+                    retry=False,
+                )
+                self.ready = True
+                backoff = 1.0
+                for event in self._stream:
+                    if self._stop.is_set():
+                        break
+                    self._apply(event)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self._stats["stream_errors"] += 1
+                logger.debug("Docker events stream interrupted: %s", e)
+            self.ready = False
+            self._close_stream()
+            # stream terminou (daemon reiniciou, socket caiu): lista de novo depois de esperar
+            self._stop.wait(backoff)
+            backoff = min(30.0, backoff * 2)
+
+    # ------------------------------- atualização -------------------------------
+
+    def _seed(self, rows: List[dict]) -> None:
+        table = {}
+        for row in rows or []:
+            entry = entry_from_row(row)
+            table[entry["id"]] = entry
+        with self._lock:
+            self._by_id = table
+            self._index = None
+        self._stats["seeds"] += 1
+        self._stats["seeded_at"] = time.time()
+
+    def _apply(self, event: dict) -> None:
+        action = event.get("Action") or event.get("status") or ""
+        actor = event.get("Actor") or {}
+        cid = actor.get("ID") or event.get("id") or ""
+        attrs = actor.get("Attributes") or {}
+        if not cid:
+            return
+        self._stats["events"] += 1
+        self._stats["last_event"] = time.time()
+        with self._lock:
+            if action == "destroy":
+                if self._by_id.pop(cid, None) is not None:
+                    self._index = None
+                return
+            entry = self._by_id.get(cid)
+            if entry is None:
+                # os atributos do evento trazem os rótulos do container
+                entry = self._by_id[cid] = {"id": cid, "name": attrs.get("name") or cid[:12],
+                                            "status": None, "health": None,
+                                            "project": attrs.get(COMPOSE_PROJECT),
+                                            "service": attrs.get(COMPOSE_SERVICE)}
+                self._index = None
+            name = (attrs.get("name") or "").lstrip("/")
+            if name and name != entry["name"]:
+                entry["name"] = name  # rename traz o nome novo aqui
+                self._index = None
+            if action.startswith("health_status"):
+                # "health_status: healthy"
+                entry["health"] = action.partition(":")[2].strip() or None
+            elif action in _ACTION_STATUS:
+                entry["status"] = _ACTION_STATUS[action]
+                if action in ("start", "restart") and entry["health"] is not None:
+                    # healthcheck recomeça do zero a cada start
+                    entry["health"] = "starting"
+            entry["updated"] = time.time()
+
+    # ------------------------------- consulta -------------------------------
+
+    def index(self) -> ContainerIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = ContainerIndex(self._by_id.values())
+                self._stats["index_builds"] += 1
+            return self._index
+
+    def resolve(self, ref: str, exact: bool = False) -> Optional[dict]:
+        """ContainerIndex.resolve() sobre a tabela atual (cópia da entrada)."""
+        return self.index().resolve(ref, exact)
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["containers"] = len(self._by_id)
+        s["ready"] = self.ready
+        if s["last_event"]:
+            s["last_event_age"] = round(time.time() - s["last_event"], 1)
+        return s
+
+
+# Instância global
+container_states = ContainerStateCache()
@@ -0,0 +1,119 @@
+# backend/core/content_search.py
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+import json, re, time, logging
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tamanho do prefixo usado para detectar binários (mesma heurística do git/grep)
+SNIFF_BYTES = 8192
+MAX_LINE_PREVIEW = 200
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, "CONTENT_SEARCH_WORKERS", 4),
+            thread_name_prefix="content-search",
+        )
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def compile_pattern(q: str, regex: bool = False, case: bool = False) -> "re.Pattern":
+    """Compila a consulta (literal ou regex). Lança re.error para regex inválida."""
+    flags = 0 if case else re.IGNORECASE
+    return re.compile(q if regex else re.escape(q), flags)
+
+
+def scan_file(path: Path, rel: str, pattern: "re.Pattern", max_per_file: int) -> Optional[dict]:
+    """Procura 'pattern' linha a linha; ignora binários e arquivos grandes demais."""
+    try:
+        st = path.stat()
+        if st.st_size > getattr(settings, "CONTENT_SEARCH_MAX_BYTES", 20 * 1024 * 1024):
+            return None
+        with path.open("rb") as fb:
+            if b"\0" in fb.read(SNIFF_BYTES):
+                return None
+            fb.seek(0)
+            matches = []
+            for lineno, raw in enumerate(fb, 1):
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                for m in pattern.finditer(line):
+                    matches.append({
+                        "line": lineno,
+                        "col": m.start() + 1,
+                        "text": line[:MAX_LINE_PREVIEW],
+                    })
+                    if len(matches) >= max_per_file:
+                        return {"path": rel, "matches": matches, "truncated": True}
+    except OSError as e:
+        logger.debug("Content search skipped %s: %s", rel, e)
+        return None
+    if not matches:
+        return None
+    return {"path": rel, "matches": matches, "truncated": False}
+
+
+def stream_search(files: Iterable[Tuple[str, Path]], pattern: "re.Pattern",
+                  max_per_file: int = 20, max_files: int = 1000) -> Iterator[str]:
+    """
+    Gera NDJSON: uma linha por arquivo com ocorrências, na ordem em que terminam,
+    e uma linha final de resumo. Mantém no máximo ~4x workers tarefas em voo
+    para não enfileirar o workspace inteiro de uma vez.
+    """
+    t0 = time.perf_counter()
+    pool = _executor()
+    window = 4 * max(1, getattr(settings, "CONTENT_SEARCH_WORKERS", 4))
+    it = iter(files)
+    inflight = set()
+    scanned = matched = total = 0
+    truncated = False
+    try:
+        while True:
+            while len(inflight) < window:
+                nxt = next(it, None)
+                if nxt is None:
+                    break
+                rel, path = nxt
+                inflight.add(pool.submit(scan_file, path, rel, pattern, max_per_file))
+            if not inflight:
+                break
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                scanned += 1
+                res = fut.result()
+                if not res:
+                    continue
+                matched += 1
+                total += len(res["matches"])
+                yield json.dumps({"type": "match", **res}, ensure_ascii=False) + "\n"
+            if matched >= max_files:
+                truncated = True
+                break
+    finally:
+        # cliente desconectou ou limite atingido: descarta o que ainda não rodou
+        for fut in inflight:
+            fut.cancel()
+
+    yield json.dumps({
+        "type": "summary",
+        "files_scanned": scanned,
+        "files_matched": matched,
+        "matches": total,
+        "truncated": truncated,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }) + "\n"
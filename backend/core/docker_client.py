@@ -0,0 +1,194 @@
+# backend/core/docker_client.py
+from __future__ import annotations
+from typing import Any, Callable, TypeVar
+import threading, time, logging
+
+try:
+    import docker
+    from docker.errors import APIError, DockerException
+except Exception:
+    docker = None
+    APIError = DockerException = None
+
+try:
+    import requests
+except Exception:
+    requests = None
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DockerUnavailable(Exception):
+    """SDK ausente, daemon inacessível ou circuito aberto."""
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """
+    Falha de transporte (socket, timeout, daemon fora do ar), que conta para
+    o circuito. Respostas do daemon (APIError: 404, 409, 500...) não contam.
+    """
+    if APIError is not None and isinstance(exc, APIError):
+        return False
+    if requests is not None and isinstance(exc, (requests.exceptions.ConnectionError,
+                                                  requests.exceptions.Timeout)):
+        return True
+    if DockerException is not None and isinstance(exc, DockerException):
+        # ex.: "Error while fetching server API version" ao criar o cliente
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError, OSError))
+
+
+class DockerClientManager:
+    """
+    Um DockerClient por processo, reaproveitado entre requisições (o pool de
+    conexões keep-alive do requests evita abrir o socket a cada chamada).
+
+    - timeout HTTP = DOCKER_TIMEOUT; pool com DOCKER_POOL_SIZE conexões
+    - falha de transporte descarta o cliente: a próxima chamada reconecta
+      (daemon reiniciado); chamadas idempotentes tentam de novo uma vez
+    - circuito: DOCKER_BREAKER_THRESHOLD falhas seguidas abrem o circuito
+      por DOCKER_BREAKER_COOLDOWN segundos (chamadas falham na hora); depois
+      uma chamada de teste fecha ou reabre
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._failures = 0
+        self._open_until = 0.0
+        self._stats = {"calls": 0, "errors": 0, "failures": 0, "connects": 0,
+                       "rejected": 0, "latency_ms_total": 0.0, "latency_ms_max": 0.0}
+
+    @property
+    def installed(self) -> bool:
+        return docker is not None
+
+    def _connect(self):
+        client = docker.from_env(
+            timeout=getattr(settings, "DOCKER_TIMEOUT", 3),
+            max_pool_size=max(1, getattr(settings, "DOCKER_POOL_SIZE", 10)),
+        )
+        with self._lock:
+            self._stats["connects"] += 1
+        return client
+
+    def _get(self):
+        if docker is None:
+            raise DockerUnavailable("docker SDK not installed")
+        with self._lock:
+            if self._failures >= self._threshold():
+                now = time.monotonic()
+                if now < self._open_until:
+                    self._stats["rejected"] += 1
+                    raise DockerUnavailable("circuit open")
+                # meio-aberto: só esta chamada testa; as outras seguem recusadas até o resultado
+                self._open_until = now + getattr(settings, "DOCKER_BREAKER_COOLDOWN", 15.0)
+            client = self._client
+        if client is None:
+            client = self._connect()
+            with self._lock:
+                if self._client is None:
+                    self._client = client
+                else:
+                    # outra thread conectou antes: fica com a dela
+                    client.close()
+                    client = self._client
+        return client
+
+    @staticmethod
+    def _threshold() -> int:
+        return max(1, getattr(settings, "DOCKER_BREAKER_THRESHOLD", 3))
+
+    def _succeeded(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["latency_ms_total"] += elapsed_ms
+            self._stats["latency_ms_max"] = max(self._stats["latency_ms_max"], elapsed_ms)
+            if self._failures >= self._threshold():
+                logger.info("Docker reachable again, closing circuit")
+            self._failures = 0
+
+    def _failed(self, client, elapsed_ms: float, exc: BaseException) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["errors"] += 1
+            self._stats["failures"] += 1
+            self._stats["latency_ms_total"] += elapsed_ms
+            self._stats["latency_ms_max"] = max(self._stats["latency_ms_max"], elapsed_ms)
+            self._failures += 1
+            if self._failures >= self._threshold():
+                if self._failures == self._threshold():
+                    logger.warning("Docker unavailable (%s), opening circuit", exc)
+                self._open_until = time.monotonic() + getattr(settings, "DOCKER_BREAKER_COOLDOWN", 15.0)
+            stale = client is not None and self._client is client
+            if stale:
+                self._client = None
+        if stale:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def call(self, fn: Callable[[Any], T], retry: bool = True) -> T:
+        """
+        Executa fn(client). DockerUnavailable se o SDK falta, o circuito está
+        aberto ou o daemon não responde; erros da API (NotFound etc.) sobem
+        como vieram. retry=False para operações que não devem repetir.
+        """
+        for attempt in (1, 2):
+            t0 = time.perf_counter()
+            client = None
+            try:
+                client = self._get()
+                result = fn(client)
+            except DockerUnavailable:
+                raise
+            except Exception as e:
+                elapsed = (time.perf_counter() - t0) * 1000
+                if not is_connection_error(e):
+                    self._succeeded(elapsed)
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    raise
+                self._failed(client, elapsed, e)
+                if retry and attempt == 1 and self._failures < self._threshold():
+                    continue
+                raise DockerUnavailable(str(e)) from e
+            self._succeeded((time.perf_counter() - t0) * 1000)
+            return result
+        raise DockerUnavailable("unreachable")
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.call(lambda client: client.ping()))
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["connected"] = self._client is not None
+            s["circuit_open"] = self._failures >= self._threshold() and time.monotonic() < self._open_until
+            s["consecutive_failures"] = self._failures
+        total = s.pop("latency_ms_total")
+        s["latency_ms_avg"] = round(total / s["calls"], 2) if s["calls"] else None
+        s["latency_ms_max"] = round(s["latency_ms_max"], 2)
+        s["installed"] = docker is not None
+        return s
+
+
+# Instância global
+docker_client = DockerClientManager()
@@ -0,0 +1,185 @@
+# backend/core/docker_jobs.py
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+import asyncio, threading, time, logging
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DockerBusy(Exception):
+    """Fila do executor cheia: a operação nem chegou a ser enfileirada."""
+
+
+class ContainerBusy(Exception):
+    """Limite de operações simultâneas no mesmo container atingido."""
+
+
+class DockerTimeout(Exception):
+    """A operação passou do prazo (a thread pode seguir rodando até o SDK desistir)."""
+
+
+class DockerJobs:
+    """
+    Executor dedicado para as chamadas bloqueantes ao Docker feitas pelas
+    rotas async (SDK e CONTAINER_RESTART_CMD), para que um restart lento não
+    pare o event loop do worker.
+
+    - DOCKER_WORKERS threads; até DOCKER_QUEUE_MAX operações esperando (além
+      disso DockerBusy na hora, em vez de acumular requisições)
+    - até DOCKER_CONTAINER_CONCURRENCY operações por container (ContainerBusy);
+      a vaga só é liberada quando a thread termina de fato, mesmo após timeout
+    - prazo por chamada (DockerTimeout); leituras iguais em andamento são
+      compartilhadas (vários pollings do mesmo container = uma ida ao daemon)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._queued = 0
+        self._running = 0
+        self._per_key: Dict[str, int] = {}
+        self._shared: Dict[str, "asyncio.Future"] = {}
+        self._stats = {"submitted": 0, "completed": 0, "timeouts": 0, "rejected": 0,
+                       "container_busy": 0, "shared": 0, "wait_ms_max": 0.0}
+
+    @staticmethod
+    def _workers() -> int:
+        return max(1, getattr(settings, "DOCKER_WORKERS", 4))
+
+    @staticmethod
+    def _queue_max() -> int:
+        return max(0, getattr(settings, "DOCKER_QUEUE_MAX", 32))
+
+    @staticmethod
+    def _key_limit() -> int:
+        return max(1, getattr(settings, "DOCKER_CONTAINER_CONCURRENCY", 1))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers(), thread_name_prefix="docker-ops")
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------- limites -------------------------------
+
+    def _acquire(self, key: Optional[str]) -> None:
+        with self._lock:
+            if self._queued >= self._queue_max() and self._running >= self._workers():
+                self._stats["rejected"] += 1
+                raise DockerBusy("docker queue full")
+            if key is not None:
+                if self._per_key.get(key, 0) >= self._key_limit():
+                    self._stats["container_busy"] += 1
+                    raise ContainerBusy(key)
+                self._per_key[key] = self._per_key.get(key, 0) + 1
+            self._queued += 1
+            self._stats["submitted"] += 1
+
+    def _release_key(self, key: Optional[str]) -> None:
+        if key is None:
+            return
+        with self._lock:
+            n = self._per_key.get(key, 0) - 1
+            if n > 0:
+                self._per_key[key] = n
+            else:
+                self._per_key.pop(key, None)
+
+    def _unqueue(self, key: Optional[str]) -> None:
+        with self._lock:
+            self._queued -= 1
+        self._release_key(key)
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        """Reserva a vaga do container para trabalho que não passa pelo executor (subprocesso async)."""
+        with self._lock:
+            if self._per_key.get(key, 0) >= self._key_limit():
+                self._stats["container_busy"] += 1
+                raise ContainerBusy(key)
+            self._per_key[key] = self._per_key.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self._release_key(key)
+
+    # ------------------------------- execução -------------------------------
+
+    def _wrap(self, fn: Callable[[], T], key: Optional[str], queued_at: float) -> Callable[[], T]:
+        def job() -> T:
+            waited = (time.perf_counter() - queued_at) * 1000
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited)
+            try:
+                return fn()
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._stats["completed"] += 1
+                self._release_key(key)
+        return job
+
+    async def run(self, fn: Callable[[], T], timeout: Optional[float] = None,
+                  key: Optional[str] = None) -> T:
+        """
+        Executa fn() numa thread do executor e espera até 'timeout' segundos.
+        'key' (ex.: nome do container) aplica o limite por container.
+        """
+        self._acquire(key)
+        try:
+            fut = self._executor().submit(self._wrap(fn, key, time.perf_counter()))
+        except Exception:
+            self._unqueue(key)
+            raise
+        # cancelada ainda na fila (timeout, shutdown): job() nunca roda, então a
+        # vaga na fila e a do container são devolvidas aqui
+        fut.add_done_callback(lambda f: self._unqueue(key) if f.cancelled() else None)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+        except asyncio.TimeoutError:
+            # ainda na fila: cancela; já rodando: segue até o timeout do próprio SDK
+            fut.cancel()
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise DockerTimeout(f"docker call exceeded {timeout}s")
+
+    async def shared(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Junta chamadas iguais em andamento: quem chega depois espera o mesmo resultado."""
+        fut = self._shared.get(key)
+        if fut is not None:
+            with self._lock:
+                self._stats["shared"] += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.ensure_future(factory())
+        self._shared[key] = fut
+        fut.add_done_callback(lambda _f: self._shared.pop(key, None))
+        return await asyncio.shield(fut)
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["queued"] = self._queued
+            s["running"] = self._running
+            s["busy_containers"] = sorted(self._per_key)
+        s["workers"] = self._workers()
+        s["queue_max"] = self._queue_max()
+        s["wait_ms_max"] = round(s["wait_ms_max"], 2)
+        return s
+
+
+# Instância global
+docker_jobs = DockerJobs()
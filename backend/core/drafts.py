@@ -0,0 +1,423 @@
+# backend/core/drafts.py
+from __future__ import annotations
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import os, stat, threading, time, logging
+
+from ..config import settings
+from .state_store import state
+from .atomic import atomic
+from . import file_io
+
+logger = logging.getLogger(__name__)
+
+# um rascunho alterado sem parar ainda é gravado a cada MAX_DELAY_FACTOR × atraso
+MAX_DELAY_FACTOR = 5
+
+# marcas de "rascunho descartado" (mtime = quando), vistas pelos outros workers
+TOMBSTONES = ".discarded"
+
+# identifica a versão do rascunho em disco (muda a cada rename, inclusive de outro worker)
+_Version = Tuple[int, int, int]
+
+
+def _version(st: os.stat_result) -> _Version:
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _stat(p: Path) -> Optional[os.stat_result]:
+    """stat do arquivo regular em 'p'; None se não existir (ou não for arquivo)."""
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+
+class _Draft:
+    __slots__ = ("data", "etag", "version", "pending", "changed", "since", "changed_ns")
+
+    def __init__(self, data: bytes, etag: str, version: Optional[_Version]):
+        self.data = data
+        self.etag = etag
+        self.version = version  # versão em disco que este conteúdo substitui (None = não havia)
+        self.pending = False    # alterado na memória e ainda não gravado
+        self.changed = 0.0      # última alteração (monotonic)
+        self.since = 0.0        # primeira alteração ainda não gravada (monotonic)
+        self.changed_ns = 0     # última alteração (relógio de parede, comparável entre workers)
+
+
+class DraftBuffer:
+    """
+    Rascunhos do autosave em memória, com gravação diferida (write-behind).
+
+    PUT/PATCH /api/temp só atualizam o buffer do worker; o flusher grava no
+    disco depois de DRAFT_FLUSH_DELAY ms sem novas alterações (ou no máximo
+    MAX_DELAY_FACTOR × esse atraso para quem digita sem parar) e aplica as
+    mudanças do mapa dirty numa única transação por lote. O buffer é um LRU
+    limitado por DRAFT_BUFFER_BYTES: entradas já gravadas saem da memória e as
+    pendentes são gravadas antes de sair. No shutdown tudo é gravado.
+
+    Entre workers do gunicorn o disco é a referência:
+    - o arquivo gravado leva como mtime a hora da alteração (não a do flush);
+    - get() confere o cache com um stat (mtime, tamanho, inode): entrada limpa
+      de outra versão é relida; entrada pendente só perde para uma versão em
+      disco mais nova que ela (ou para um descarte posterior);
+    - o flush compara e grava sob file_io.write_lock(): um rascunho que outro
+      worker gravou ou descartou depois da nossa última alteração não é
+      sobrescrito (nem volta a ficar dirty);
+    - o descarte deixa uma marca em TEMP_DIR/.discarded com a hora dele
+      (apagada no próximo flush do mesmo rascunho ou quando fica velha).
+    Um rascunho pendente em outro worker só aparece aqui depois do flush dele.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Draft]" = OrderedDict()
+        self._dirty: Dict[str, bool] = {}
+        self._bytes = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._urgent = False
+        self._thread: Optional[threading.Thread] = None
+        self._pruned = time.monotonic()
+        self._stats = {"puts": 0, "hits": 0, "misses": 0, "flushes": 0, "written": 0,
+                       "superseded": 0, "evicted": 0, "errors": 0}
+
+    @property
+    def delay(self) -> float:
+        return max(0, getattr(settings, "DRAFT_FLUSH_DELAY", 2000)) / 1000.0
+
+    @property
+    def limit(self) -> int:
+        return max(0, getattr(settings, "DRAFT_BUFFER_BYTES", 64 * 1024 * 1024))
+
+    @staticmethod
+    def etag_of(data: bytes) -> str:
+        return file_io.etag_of(sha256(data).hexdigest())
+
+    def _path(self, rel: str) -> Path:
+        return self.root / rel.lstrip("/")
+
+    def _tombstone(self, rel: str) -> Path:
+        return self.root / TOMBSTONES / rel.lstrip("/")
+
+    def _superseded(self, rel: str, d: _Draft, st: Optional[os.stat_result]) -> bool:
+        """True se outro worker gravou ou descartou o rascunho depois da última alteração de 'd'."""
+        tomb = _stat(self._tombstone(rel))
+        if tomb is not None and tomb.st_mtime_ns > d.changed_ns:
+            return True
+        if st is None:
+            # sumiu do disco depois que o vimos: apagado/movido
+            return d.version is not None
+        return _version(st) != d.version and st.st_mtime_ns > d.changed_ns
+
+    # ------------------------------- leitura -------------------------------
+
+    def get(self, rel: str) -> Optional[Tuple[bytes, str]]:
+        """(conteúdo, etag) do rascunho, do buffer se ainda valer, senão do disco. None se não existir."""
+        p = self._path(rel)
+        st = _stat(p)
+        with self._lock:
+            d = self._entries.get(rel)
+        if d is not None:
+            if d.pending:
+                fresh = not self._superseded(rel, d, st)
+            else:
+                fresh = st is not None and _version(st) == d.version
+            with self._lock:
+                if self._entries.get(rel) is d:
+                    if fresh:
+                        self._entries.move_to_end(rel)
+                        self._stats["hits"] += 1
+                        return d.data, d.etag
+                    self._pop(rel)
+                    if d.pending:
+                        self._stats["superseded"] += 1
+        with self._lock:
+            self._stats["misses"] += 1
+        if st is None:
+            return None
+        try:
+            data = p.read_bytes()
+            version = _version(p.stat())
+        except OSError:
+            return None
+        etag = self.etag_of(data)
+        # volta para o buffer já "limpo" (igual ao disco)
+        with self._lock:
+            if rel not in self._entries:
+                self._insert(rel, _Draft(data, etag, version))
+                self._evict()
+        return data, etag
+
+    # ------------------------------- escrita -------------------------------
+
+    def put(self, rel: str, data: bytes) -> str:
+        """Guarda o rascunho na memória, marca dirty e agenda a gravação. Retorna o ETag."""
+        p = self._path(rel)
+        if p.is_dir():
+            raise IsADirectoryError(str(p))
+        st = _stat(p)
+        etag = self.etag_of(data)
+        now = time.monotonic()
+        with self._lock:
+            old = self._pop(rel)
+            d = _Draft(data, etag, _version(st) if st is not None else None)
+            d.since = old.since if old is not None and old.pending else now
+            d.pending = True
+            d.changed = now
+            d.changed_ns = time.time_ns()
+            self._insert(rel, d)
+            self._dirty[rel] = True
+            self._stats["puts"] += 1
+            if self._bytes > self.limit:
+                self._evict()
+                self._urgent = self._bytes > self.limit
+        self._schedule()
+        return etag
+
+    def mark(self, rel: str, is_dirty: bool) -> None:
+        """Altera o mapa dirty; vai para o banco junto com o próximo lote."""
+        with self._lock:
+            self._dirty[rel] = is_dirty
+        self._schedule()
+
+    def discard(self, rel: str) -> None:
+        """Remove o rascunho (memória e disco), deixa a marca de descarte e limpa o dirty."""
+        tomb = self._tombstone(rel)
+        with file_io.write_lock():
+            with self._lock:
+                self._pop(rel)
+                self._dirty[rel] = False
+            p = self._path(rel)
+            if p.is_file():
+                p.unlink()
+            try:
+                tomb.parent.mkdir(parents=True, exist_ok=True)
+                tomb.touch()
+                # mesmo relógio de changed_ns (o do sistema de arquivos pode ser mais grosso)
+                now_ns = time.time_ns()
+                os.utime(tomb, ns=(now_ns, now_ns))
+            except OSError as e:
+                logger.warning("Failed to record discarded draft %s: %s", rel, e)
+        self._schedule()
+
+    def release(self, prefix: str) -> None:
+        """
+        Grava o que estiver pendente e solta da memória 'prefix' (arquivo) e
+        tudo sob 'prefix/': usado antes de mover/renomear os rascunhos no disco.
+        """
+        self.flush()
+        prefix = prefix.strip("/")
+        with self._lock:
+            for rel in list(self._entries):
+                if (rel == prefix or rel.startswith(prefix + "/")) and not self._entries[rel].pending:
+                    self._pop(rel)
+
+    def dirty_map(self) -> Dict[str, bool]:
+        """Mapa dirty do banco com as mudanças ainda não gravadas deste worker por cima."""
+        try:
+            current = state.dirty_map()
+        except Exception as e:
+            logger.warning("Failed to read dirty map: %s", e)
+            current = {}
+        with self._lock:
+            overlay = dict(self._dirty)
+        for rel, is_dirty in overlay.items():
+            if is_dirty:
+                current[rel] = True
+            else:
+                current.pop(rel, None)
+        return current
+
+    # ------------------------------- LRU -------------------------------
+
+    def _insert(self, rel: str, d: _Draft) -> None:
+        self._entries[rel] = d
+        self._bytes += len(d.data)
+
+    def _pop(self, rel: str) -> Optional[_Draft]:
+        d = self._entries.pop(rel, None)
+        if d is not None:
+            self._bytes -= len(d.data)
+        return d
+
+    def _evict(self) -> None:
+        """Solta os rascunhos menos usados já gravados até caber no limite (chamar com _lock)."""
+        if self._bytes <= self.limit:
+            return
+        for rel in list(self._entries):
+            if self._bytes <= self.limit:
+                break
+            if self._entries[rel].pending:
+                continue  # o flusher grava primeiro
+            self._pop(rel)
+            self._stats["evicted"] += 1
+
+    # ------------------------------- flush -------------------------------
+
+    def _schedule(self) -> None:
+        self._ensure_flusher()
+        self._wake.set()
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="draft-flush", daemon=True)
+            self._thread.start()
+
+    def _write(self, rel: str, d: _Draft) -> Optional[bool]:
+        """
+        Grava 'd' se ainda for a versão mais nova entre os workers (chamar com
+        file_io.write_lock). True = gravado, False = superado, None = erro.
+        """
+        p = self._path(rel)
+        try:
+            if p.is_dir():
+                raise IsADirectoryError(str(p))
+            if self._superseded(rel, d, _stat(p)):
+                return False
+            p.parent.mkdir(parents=True, exist_ok=True)
+            atomic.write_bytes(p, d.data)
+            # mtime = hora da alteração: é o que os outros workers comparam
+            os.utime(p, ns=(d.changed_ns, d.changed_ns))
+            version = _version(p.stat())
+            tomb = self._tombstone(rel)
+            if tomb.exists():
+                tomb.unlink()
+        except Exception as e:
+            logger.warning("Failed to write draft %s: %s", rel, e)
+            return None
+        d.version = version
+        return True
+
+    def flush(self, force: bool = True) -> int:
+        """
+        Grava os rascunhos pendentes e aplica o mapa dirty numa transação.
+        force=False respeita o debounce. Retorna quantos rascunhos foram gravados.
+        """
+        now = time.monotonic()
+        delay = self.delay
+        with self._lock:
+            urgent, self._urgent = self._urgent, False
+            due = [
+                (rel, d) for rel, d in self._entries.items()
+                if d.pending and (force or urgent or now - d.changed >= delay
+                                  or now - d.since >= delay * MAX_DELAY_FACTOR)
+            ]
+
+        written = 0
+        for rel, d in due:
+            # compara e grava sob o lock entre workers (o outro pode gravar/descartar o mesmo rascunho)
+            with file_io.write_lock():
+                with self._lock:
+                    if self._entries.get(rel) is not d:
+                        continue  # substituído ou apagado enquanto esperava
+                ok = self._write(rel, d)
+            with self._lock:
+                current = self._entries.get(rel) is d
+                if ok:
+                    written += 1
+                    if current:
+                        d.pending = False
+                    continue
+                # superado por outro worker (não volta a ficar dirty por nós) ou erro:
+                # não fica tentando para sempre, descarta da memória
+                if current:
+                    self._pop(rel)
+                    if self._dirty.get(rel) is True:
+                        del self._dirty[rel]
+                self._stats["superseded" if ok is False else "errors"] += 1
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if dirty:
+            try:
+                with state.transaction():
+                    for rel, is_dirty in dirty.items():
+                        state.set_dirty(rel, is_dirty)
+            except Exception as e:
+                logger.warning("Failed to update dirty map: %s", e)
+                with self._lock:
+                    self._stats["errors"] += 1
+                    # devolve o que não entrou, sem sobrescrever mudanças mais novas
+                    for rel, is_dirty in dirty.items():
+                        self._dirty.setdefault(rel, is_dirty)
+
+        with self._lock:
+            if written or dirty:
+                self._stats["flushes"] += 1
+                self._stats["written"] += written
+            self._evict()
+        return written
+
+    def _prune(self) -> None:
+        """Apaga marcas de descarte que nenhum rascunho pendente (de nenhum worker) pode ser mais velho."""
+        horizon = max(60.0, self.delay * MAX_DELAY_FACTOR * 10)
+        now = time.monotonic()
+        if now - self._pruned < horizon:
+            return
+        self._pruned = now
+        cutoff = time.time() - horizon
+        for dirpath, _dirs, files in os.walk(self.root / TOMBSTONES):
+            for name in files:
+                tomb = os.path.join(dirpath, name)
+                try:
+                    if os.stat(tomb).st_mtime < cutoff:
+                        os.unlink(tomb)
+                except OSError:
+                    pass
+
+    def _has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._dirty) or any(d.pending for d in self._entries.values())
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            while not self._stop.is_set() and self._has_pending():
+                with self._lock:
+                    urgent = self._urgent
+                if not urgent:
+                    # debounce: espera o atraso (ou até alguém acordar por urgência/parada)
+                    self._stop.wait(max(0.05, self.delay / 2))
+                try:
+                    self.flush(force=False)
+                except Exception as e:
+                    logger.warning("Draft flush failed: %s", e)
+            self._prune()
+
+    def stop(self) -> None:
+        """Shutdown: para o flusher e grava tudo o que estiver pendente."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.flush()
+
+    # ------------------------------- métricas -------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["entries"] = len(self._entries)
+            s["bytes"] = self._bytes
+            s["pending"] = sum(1 for d in self._entries.values() if d.pending)
+            s["pending_dirty"] = len(self._dirty)
+        s["limit_bytes"] = self.limit
+        s["flush_delay_ms"] = int(self.delay * 1000)
+        return s
+
+
+# Instância global
+drafts = DraftBuffer(Path(settings.TEMP_DIR).resolve())
@@ -0,0 +1,381 @@
+# backend/core/file_io.py
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+import codecs, hashlib, os, stat, tempfile, threading
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+from ..config import settings
+from .atomic import atomic, fsync_dir, copy_owner
+
+# Prefixo lido para decidir se o arquivo é texto UTF-8
+SNIFF_BYTES = 64 * 1024
+CHUNK = 256 * 1024
+
+
+def sniff_utf8(path: Path, limit: int = SNIFF_BYTES) -> bool:
+    """
+    Heurística barata: o prefixo não tem NUL e decodifica como UTF-8 (um
+    caractere multibyte cortado no fim do prefixo é aceito).
+    """
+    with path.open("rb") as fb:
+        head = fb.read(limit)
+    return sniff_utf8_bytes(head)
+
+
+def sniff_utf8_bytes(head: bytes) -> bool:
+    if b"\0" in head:
+        return False
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta 'Range: bytes=...' para um único intervalo; retorna (início, fim)
+    inclusivos. None = ignorar o cabeçalho (ausente, outra unidade ou vários
+    intervalos — servimos o arquivo inteiro, como a RFC 9110 permite).
+    Lança ValueError se o intervalo não for satisfazível (416).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None  # sintaxe inválida: ignora o cabeçalho
+    if start is None:
+        # sufixo: últimos N bytes
+        if not end or size == 0:
+            raise ValueError("unsatisfiable range")
+        return max(0, size - end), size - 1
+    if end is None:
+        end = size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def iter_range(path: Path, start: int, end: int, chunk: int = CHUNK) -> Iterator[bytes]:
+    """Lê [start, end] com pread, sem carregar o arquivo na memória."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        pos = start
+        while pos <= end:
+            data = os.pread(fd, min(chunk, end - pos + 1), pos)
+            if not data:
+                break
+            pos += len(data)
+            yield data
+    finally:
+        os.close(fd)
+
+
+# ------------------------------- hash / ETag -------------------------------
+
+_HASH_CACHE_SIZE = 4096
+
+_hash_lock = threading.Lock()
+_hash_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
+
+def _hash_key(path: Path, st: os.stat_result) -> tuple:
+    return (str(path), st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def remember_hash(path: Path, st: os.stat_result, digest: str) -> None:
+    key = _hash_key(path, st)
+    with _hash_lock:
+        _hash_cache[key] = digest
+        _hash_cache.move_to_end(key)
+        while len(_hash_cache) > _HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+
+
+def content_hash(path: Path, st: Optional[os.stat_result] = None) -> str:
+    """
+    sha256 do conteúdo, em cache por (caminho, mtime_ns, tamanho, inode): só
+    relê o arquivo quando ele mudou em disco.
+    """
+    st = st or path.stat()
+    key = _hash_key(path, st)
+    with _hash_lock:
+        digest = _hash_cache.get(key)
+        if digest is not None:
+            _hash_cache.move_to_end(key)
+            return digest
+    h = hashlib.sha256()
+    with path.open("rb") as fb:
+        while True:
+            chunk = fb.read(CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    digest = h.hexdigest()
+    remember_hash(path, st, digest)
+    return digest
+
+
+def etag_of(digest: str) -> str:
+    return '"%s"' % digest[:40]
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """
+    If-Match / If-None-Match: lista separada por vírgula ou '*'. Comparação
+    forte por padrão (If-Match: um W/ nunca autoriza gravação, RFC 9110
+    §13.1.1); weak=True aceita W/ (If-None-Match no 304).
+    """
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if weak and tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def write_lock():
+    """
+    Serializa check-and-write (If-Match + gravação) entre threads e workers:
+    lock de thread + flock num arquivo sob STATE_DIR.
+    """
+    lock_path = Path(settings.STATE_DIR).resolve() / "write.lock"
+    with _write_lock:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+# ------------------------------- janelas -------------------------------
+
+# checkpoint de offset a cada LINE_STEP linhas (≈ 8 bytes por 1024 linhas)
+LINE_STEP = 1024
+_LINE_CACHE_SIZE = 16
+
+_line_lock = threading.Lock()
+_line_cache: "OrderedDict[tuple, Tuple[array, int]]" = OrderedDict()
+
+
+def version_of(st: os.stat_result) -> str:
+    """Identifica uma versão do arquivo em disco (muda a cada escrita/rename)."""
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}-{st.st_ino:x}"
+
+
+def _line_index(path: Path, st: os.stat_result) -> Tuple[array, int]:
+    """
+    (checkpoints, total de linhas). checkpoints[k] = offset da linha k*LINE_STEP.
+    Montado numa varredura em blocos e guardado por (caminho, versão).
+    """
+    key = (str(path), st.st_mtime_ns, st.st_size, st.st_ino)
+    with _line_lock:
+        hit = _line_cache.get(key)
+        if hit is not None:
+            _line_cache.move_to_end(key)
+            return hit
+
+    marks = array("Q", [0])
+    lines = 0
+    pos = 0
+    last = b"\n"
+    with path.open("rb") as fb:
+        while True:
+            chunk = fb.read(CHUNK)
+            if not chunk:
+                break
+            i = chunk.find(b"\n")
+            while i >= 0:
+                lines += 1
+                if lines % LINE_STEP == 0:
+                    marks.append(pos + i + 1)
+                i = chunk.find(b"\n", i + 1)
+            pos += len(chunk)
+            last = chunk[-1:]
+    if pos and last != b"\n":
+        lines += 1  # última linha sem quebra
+
+    with _line_lock:
+        _line_cache[key] = (marks, lines)
+        while len(_line_cache) > _LINE_CACHE_SIZE:
+            _line_cache.popitem(last=False)
+    return marks, lines
+
+
+def _line_offset(path: Path, marks: array, line: int, size: int) -> int:
+    """Offset do início da linha 'line' (0-based), partindo do checkpoint mais próximo."""
+    k = min(line // LINE_STEP, len(marks) - 1)
+    pos = marks[k]
+    todo = line - k * LINE_STEP
+    if todo == 0:
+        return pos
+    with path.open("rb") as fb:
+        fb.seek(pos)
+        while pos < size:
+            chunk = fb.read(CHUNK)
+            if not chunk:
+                break
+            i = -1
+            while todo:
+                i = chunk.find(b"\n", i + 1)
+                if i < 0:
+                    break
+                todo -= 1
+            if not todo:
+                return pos + i + 1
+            pos += len(chunk)
+    return size
+
+
+def line_range(path: Path, st: os.stat_result, line: int, count: int) -> Tuple[int, int, int]:
+    """
+    Converte linhas [line, line+count) (1-based) em (início, fim) em bytes.
+    Retorna (início, fim, total de linhas do arquivo).
+    """
+    marks, total = _line_index(path, st)
+    first = max(0, line - 1)
+    start = _line_offset(path, marks, first, st.st_size)
+    end = _line_offset(path, marks, first + count, st.st_size) if count > 0 else start
+    return start, end, total
+
+
+def _char_boundary(fd: int, pos: int, size: int) -> int:
+    """Avança 'pos' para fora de continuações UTF-8 (10xxxxxx), no máximo 3 bytes."""
+    if pos <= 0 or pos >= size:
+        return max(0, min(pos, size))
+    head = os.pread(fd, 4, pos)
+    n = 0
+    while n < len(head) and n < 3 and (head[n] & 0xC0) == 0x80:
+        n += 1
+    return pos + n
+
+
+def read_window(path: Path, start: int, end: int) -> Tuple[bytes, int, int]:
+    """
+    Bytes de [start, end) com as bordas ajustadas para não cortar um caractere
+    UTF-8 ao meio. Retorna (dados, início, fim) efetivos.
+    """
+    size = path.stat().st_size
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        start = _char_boundary(fd, start, size)
+        end = max(start, _char_boundary(fd, min(end, size), size))
+        return os.pread(fd, end - start, start), start, end
+    finally:
+        os.close(fd)
+
+
+# ------------------------------- splice -------------------------------
+
+BLOCK = 4096
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """
+    Copia [offset, offset+count) de src para a posição atual de dst. Usa
+    copy_file_range (reflink/cópia no kernel quando o FS suporta) e cai para
+    pread/write se não houver.
+    """
+    copy = getattr(os, "copy_file_range", None)
+    while count > 0:
+        n = 0
+        if copy is not None:
+            try:
+                n = copy(src_fd, dst_fd, count, offset)
+            except OSError:
+                copy = None
+                n = 0
+        if n == 0:
+            data = os.pread(src_fd, min(CHUNK, count), offset)
+            if not data:
+                break
+            n = os.write(dst_fd, data)
+        offset += n
+        count -= n
+
+
+def splice(path: Path, start: int, end: int, data: bytes) -> str:
+    """
+    Substitui [start, end) por 'data'.
+
+    - mesmo tamanho e dentro de um único bloco de 4 KiB: pwrite no lugar,
+      sem temporário (não é atômico contra crash: um pwrite interrompido
+      pode deixar o bloco pela metade);
+    - caso contrário: temporário no mesmo diretório com prefixo + novo trecho +
+      sufixo (prefixo/sufixo via copy_file_range), fsync e rename atômico,
+      com o dono/grupo do original;
+    - sem permissão para manter o dono: monta o arquivo inteiro e grava com
+      atomic.write_bytes, na mesma política do PUT (no lugar, não atômico,
+      mas sem trocar o dono). Aqui memória e latência passam a escalar com o
+      tamanho do arquivo, não com o do trecho.
+
+    Retorna "inplace" ou "rewrite".
+    """
+    st = path.stat()
+    if len(data) == end - start and data and start // BLOCK == (end - 1) // BLOCK:
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            os.pwrite(fd, data, start)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return "inplace"
+
+    tmp_fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".splice")
+    if not copy_owner(tmp_fd, st):
+        os.close(tmp_fd)
+        os.unlink(tmp_name)
+        with open(path, "rb") as fh:
+            whole = fh.read()
+        atomic.write_bytes(path, whole[:start] + data + whole[end:], durable=True)
+        return "rewrite"
+    try:
+        src_fd = os.open(path, os.O_RDONLY)
+        try:
+            _copy_range(src_fd, tmp_fd, 0, start)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(tmp_fd, view):]
+            _copy_range(src_fd, tmp_fd, end, st.st_size - end)
+        finally:
+            os.close(src_fd)
+        os.fchmod(tmp_fd, stat.S_IMODE(st.st_mode))
+        os.fsync(tmp_fd)
+    except BaseException:
+        os.close(tmp_fd)
+        os.unlink(tmp_name)
+        raise
+    os.close(tmp_fd)
+    try:
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    fsync_dir(path.parent)
+    return "rewrite"
@@ -0,0 +1,245 @@
+# backend/core/retention.py
+from __future__ import annotations
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import re, threading, time, logging
+
+from ..config import settings
+from .state_store import state
+from . import backups
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
+
+# unidade -> (duração em segundos, formato do balde no fuso configurado)
+_UNITS = {
+    "hourly": (3600, "%Y-%m-%d %H"),
+    "daily": (86400, "%Y-%m-%d"),
+    "weekly": (7 * 86400, "%G-W%V"),
+    "monthly": (31 * 86400, "%Y-%m"),
+}
+
+# nomes gerados por /api/backup: backup---<stem>---YYYY-mm-dd---HH-MM-SS<suffix>
+_NAME_TS = re.compile(r"---(\d{4}-\d{2}-\d{2})---(\d{2}-\d{2}-\d{2})")
+
+MAX_REPORT_ITEMS = 200
+
+# backups removidos por transação (cada uma segura o lock de escrita do SQLite)
+TXN_BATCH = 25
+
+
+def parse_policy(text: str) -> Dict[str, int]:
+    """
+    "last=10,hourly=24,daily=30" -> {"last": 10, "hourly": 24, "daily": 30}.
+    hourly/daily/weekly/monthly = quantas horas/dias/semanas/meses para trás
+    manter um backup (o mais recente) por período. Lança ValueError se inválida.
+    """
+    policy: Dict[str, int] = {}
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        key = key.strip().lower()
+        if not sep or (key != "last" and key not in _UNITS):
+            raise ValueError(f"invalid retention rule: {part!r}")
+        n = int(value)
+        if n < 0:
+            raise ValueError(f"invalid retention rule: {part!r}")
+        policy[key] = n
+    if not policy:
+        raise ValueError("empty retention policy")
+    return policy
+
+
+def _timestamp(backup: str, created: Optional[float]) -> float:
+    if created:
+        return created
+    # backups antigos (cópia física) não têm 'created': usa o nome, depois o mtime
+    m = _NAME_TS.search(backup)
+    if m:
+        try:
+            dt = datetime.strptime(f"{m.group(1)} {m.group(2)}", "%Y-%m-%d %H-%M-%S")
+            return dt.replace(tzinfo=settings.TZ).timestamp()
+        except ValueError:
+            pass
+    try:
+        return (BASE_DIR / backup).stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _keep_ids(rows: List[tuple], policy: Dict[str, int], now: float) -> set:
+    """rows = backups de um arquivo, do mais novo para o mais antigo: (id, ts)."""
+    keep = {rows[0][0]}  # o mais recente nunca expira
+    keep.update(bid for bid, _ in rows[:policy.get("last", 0)])
+    for unit, (span, fmt) in _UNITS.items():
+        n = policy.get(unit, 0)
+        if not n:
+            continue
+        cutoff = now - n * span
+        seen = set()
+        for bid, ts in rows:
+            if ts < cutoff:
+                break
+            bucket = datetime.fromtimestamp(ts, settings.TZ).strftime(fmt)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(bid)
+    return keep
+
+
+def plan(policy: Dict[str, int], now: Optional[float] = None) -> dict:
+    """
+    Calcula o que a política removeria, sem alterar nada.
+    'bytes_reclaimed' soma os arquivos físicos e os blobs que ficariam sem
+    referência; em BACKUP_MODE=delta os rebases podem gravar alguns bytes novos.
+    """
+    now = time.time() if now is None else now
+    by_file: Dict[str, List[tuple]] = {}
+    stale = []
+    for bid, file, backup, blob, size, created in state.all_backups():
+        if not blob and not (BASE_DIR / backup).is_file():
+            # entrada do índice antigo cujo arquivo já não existe
+            stale.append((bid, backup, None))
+            continue
+        by_file.setdefault(file, []).append((bid, backup, blob, _timestamp(backup, created)))
+
+    expired = []
+    for rows in by_file.values():
+        rows.sort(key=lambda r: (r[3], r[0]), reverse=True)
+        keep = _keep_ids([(r[0], r[3]) for r in rows], policy, now)
+        expired.extend((bid, backup, blob) for bid, backup, blob, _ in rows if bid not in keep)
+
+    refs = state.blob_ref_counts()
+    dropping: Dict[str, int] = {}
+    reclaimed = 0
+    for _, backup, blob in expired:
+        if blob:
+            dropping[blob] = dropping.get(blob, 0) + 1
+        else:
+            try:
+                reclaimed += (BASE_DIR / backup).stat().st_size
+            except OSError:
+                pass
+    for blob, n in dropping.items():
+        if n >= refs.get(blob, 0):
+            try:
+                reclaimed += backups.blob_disk_size(blob)
+            except OSError:
+                pass
+
+    # mais novos primeiro: em cadeias de delta o rebase dos dependentes grava deltas, não keyframes
+    expired.sort(key=lambda r: r[0], reverse=True)
+    return {
+        "policy": policy,
+        "files": len(by_file),
+        "backups": sum(len(r) for r in by_file.values()),
+        "expired": len(expired),
+        "stale": len(stale),
+        "bytes_reclaimed": reclaimed,
+        "items": [backup for _, backup, _ in (stale + expired)[:MAX_REPORT_ITEMS]],
+        "_delete": stale + expired,
+    }
+
+
+def _delete_chunk(items: List[tuple]) -> int:
+    """Remove um lote curto: linhas numa transação, arquivos/blobs depois do commit."""
+    deleted = len(backups.delete_backups([backup for _, backup, blob in items if blob]))
+    physical = [backup for _, backup, blob in items if not blob]
+    if physical:
+        with state.transaction():
+            # o plano foi feito fora da transação: só o que ainda está indexado
+            physical = [b for b in physical if state.get_backup(b) is not None]
+            for backup in physical:
+                state.remove_backup(backup)
+        for backup in physical:
+            try:
+                (BASE_DIR / backup).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Retention could not remove %s: %s", backup, e)
+        deleted += len(physical)
+    return deleted
+
+
+def sweep(policy: Dict[str, int], batch: Optional[int] = None, dry_run: bool = False) -> dict:
+    """
+    Aplica a política. O plano é calculado fora de transação e a remoção vai em
+    transações curtas de TXN_BATCH backups (backups e saves dos workers não
+    esperam a varredura inteira); no máximo 'batch' backups por vez, o resto
+    fica para a próxima.
+    """
+    batch = batch or getattr(settings, "BACKUP_RETENTION_BATCH", 500)
+    t0 = time.perf_counter()
+    report = plan(policy)
+    todo = report.pop("_delete")
+    deleted = 0
+    if not dry_run:
+        work = todo[:batch]
+        for i in range(0, len(work), TXN_BATCH):
+            deleted += _delete_chunk(work[i:i + TXN_BATCH])
+    report["dry_run"] = dry_run
+    report["deleted"] = deleted
+    report["remaining"] = len(todo) - deleted
+    report["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return report
+
+
+class RetentionWorker:
+    """Varre os backups a cada BACKUP_RETENTION_INTERVAL segundos (só se houver política)."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[dict] = None
+
+    def policy(self) -> Optional[Dict[str, int]]:
+        text = getattr(settings, "BACKUP_RETENTION", "")
+        if not text:
+            return None
+        try:
+            return parse_policy(text)
+        except ValueError as e:
+            logger.warning("Ignoring BACKUP_RETENTION: %s", e)
+            return None
+
+    def start(self) -> None:
+        if self._thread is not None or self.policy() is None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="backup-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self) -> None:
+        interval = max(60, getattr(settings, "BACKUP_RETENTION_INTERVAL", 3600))
+        # primeira varredura logo após o startup, fora do caminho crítico
+        delay = min(60, interval)
+        while not self._stop.wait(delay):
+            delay = interval
+            policy = self.policy()
+            if policy is None:
+                continue
+            try:
+                report = sweep(policy)
+                self.last_report = {k: v for k, v in report.items() if k != "items"}
+                if report["deleted"]:
+                    logger.info("Backup retention removed %d backups (%d bytes)",
+                                report["deleted"], report["bytes_reclaimed"])
+                if report["remaining"]:
+                    delay = 1  # ainda há lote pendente
+            except Exception as e:
+                logger.warning("Backup retention sweep failed: %s", e)
+
+
+# Instância global
+retention = RetentionWorker()
@@ -0,0 +1,105 @@
+# backend/core/schemas.py
+from __future__ import annotations
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+from ..config import settings
+from .state_store import state
+
+logger = logging.getLogger(__name__)
+
+# Associação arquivo -> JSON Schema. Fontes, em ordem de prioridade:
+#   1) caminho exato salvo pela API (tabela 'schemas')
+#   2) glob salvo pela API
+#   3) globs de VALIDATE_SCHEMAS (env)
+# Glob sem '/' casa com o nome do arquivo em qualquer pasta; com '/', com o
+# caminho relativo inteiro.
+
+# Formatos cujo documento pode ser checado contra um schema
+SCHEMA_EXTS = {".json", ".yaml", ".yml", ".toml"}
+
+_BASE = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
+
+# (schema como configurado, caminho absoluto, mtime_ns, tamanho): o par
+# mtime/tamanho identifica a versão do schema nos caches de resultado e de
+# schemas compilados, que se invalidam sozinhos quando o arquivo muda
+SchemaRef = Tuple[str, str, int, int]
+
+
+def is_glob(pattern: str) -> bool:
+    return any(ch in pattern for ch in "*?[")
+
+
+def _matches(pattern: str, rel: str) -> bool:
+    if "/" not in pattern:
+        return fnmatchcase(rel.rsplit("/", 1)[-1], pattern)
+    return fnmatchcase(rel, pattern.strip("/"))
+
+
+def schema_path(schema: str) -> Path:
+    """Schema relativo ao workspace (ou absoluto)."""
+    p = Path(schema)
+    return p if p.is_absolute() else (_BASE / schema.lstrip("/")).resolve()
+
+
+def _stored() -> Dict[str, str]:
+    try:
+        return state.schemas_map()
+    except Exception as e:
+        logger.warning("Failed to read schema associations: %s", e)
+        return {}
+
+
+def association(rel: str, stored: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(schema, origem: "file" | "glob" | "env") do arquivo, ou (None, None)."""
+    rel = rel.strip("/")
+    stored = _stored() if stored is None else stored
+    if rel in stored:
+        return stored[rel], "file"
+    for pattern, schema in stored.items():
+        if is_glob(pattern) and _matches(pattern, rel):
+            return schema, "glob"
+    for pattern, schema in getattr(settings, "VALIDATE_SCHEMAS", {}).items():
+        if _matches(pattern, rel):
+            return schema, "env"
+    return None, None
+
+
+def resolver() -> Callable[[str], Optional[SchemaRef]]:
+    """
+    resolve() para muitos arquivos (validação em lote): lê as associações
+    uma vez e faz um stat por schema, não por arquivo.
+    """
+    stored = _stored()
+    refs: Dict[str, Optional[SchemaRef]] = {}
+
+    def resolve_one(rel: str) -> Optional[SchemaRef]:
+        if Path(rel).suffix.lower() not in SCHEMA_EXTS:
+            return None
+        schema, _source = association(rel, stored)
+        if not schema:
+            return None
+        if schema not in refs:
+            p = schema_path(schema)
+            try:
+                st = p.stat()
+                refs[schema] = (schema, str(p), st.st_mtime_ns, st.st_size)
+            except OSError:
+                # configurado mas ausente: tamanho -1, a validação acusa
+                refs[schema] = (schema, str(p), 0, -1)
+        return refs[schema]
+    return resolve_one
+
+
+def resolve(rel: str) -> Optional[SchemaRef]:
+    """Schema aplicável ao arquivo, já com a versão em disco; None se não há."""
+    return resolver()(rel)
+
+
+def token(ref: Optional[SchemaRef]) -> str:
+    """Identidade do schema para chaves de cache ("" = sem schema)."""
+    if ref is None:
+        return ""
+    return f"{ref[0]}@{ref[2]}:{ref[3]}"
@@ -0,0 +1,241 @@
+# backend/core/search_index.py
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+import heapq, threading
+
+from .workspace_index import workspace_index
+
+
+def _grams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _subsequence_at(needle: str, hay: str) -> int:
+    """Posição inicial se 'needle' aparece em ordem (não contígua) em 'hay'; -1 se não."""
+    pos = -1
+    start = -1
+    for ch in needle:
+        pos = hay.find(ch, pos + 1)
+        if pos < 0:
+            return -1
+        if start < 0:
+            start = pos
+    return start
+
+
+class PathSearchIndex:
+    """
+    Índice de trigramas sobre os caminhos relativos do workspace.
+
+    Cada caminho recebe um id crescente (nunca reaproveitado), então as listas
+    de postings (array de uint32) ficam ordenadas e permitem busca binária.
+    Remoções viram tombstones; a compactação reconstrói os postings quando
+    os tombstones passam da metade.
+    """
+
+    CACHE_SIZE = 32
+    TOP_K = 1000
+    # acima disso a subsequência fuzzy não varre o índice inteiro
+    FUZZY_SCAN_LIMIT = 20000
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids: Dict[str, int] = {}
+        self._paths: List[Optional[str]] = []
+        self._lower: List[Optional[str]] = []
+        self._is_dir: List[bool] = []
+        self._name_at: List[int] = []
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+        self._generation = 0
+        self._cache: "OrderedDict[tuple, Tuple[int, List[int]]]" = OrderedDict()
+
+    # ------------------------------- manutenção -------------------------------
+
+    def on_change(self, rel: str, is_dir: bool, added: bool) -> None:
+        """Listener do WorkspaceIndex."""
+        if added:
+            self.add(rel, is_dir)
+        else:
+            self.remove(rel)
+
+    def add(self, rel: str, is_dir: bool) -> None:
+        with self._lock:
+            if rel in self._ids:
+                self._is_dir[self._ids[rel]] = is_dir
+                return
+            i = len(self._paths)
+            low = rel.lower()
+            self._ids[rel] = i
+            self._paths.append(rel)
+            self._lower.append(low)
+            self._is_dir.append(is_dir)
+            self._name_at.append(rel.rfind("/") + 1)
+            for g in _grams(low):
+                post = self._postings.get(g)
+                if post is None:
+                    post = self._postings[g] = array("I")
+                post.append(i)
+            self._generation += 1
+
+    def remove(self, rel: str) -> None:
+        with self._lock:
+            i = self._ids.pop(rel, None)
+            if i is None:
+                return
+            self._paths[i] = None
+            self._lower[i] = None
+            self._dead += 1
+            self._generation += 1
+            if self._dead > 1024 and self._dead * 2 > len(self._paths):
+                self._compact()
+
+    def _compact(self) -> None:
+        live = [(p, self._is_dir[i]) for i, p in enumerate(self._paths) if p is not None]
+        self._ids, self._paths, self._lower, self._is_dir, self._name_at = {}, [], [], [], []
+        self._postings, self._dead = {}, 0
+        self._cache.clear()
+        for p, d in live:
+            self.add(p, d)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "paths": len(self._ids),
+                "tombstones": self._dead,
+                "trigrams": len(self._postings),
+                "generation": self._generation,
+            }
+
+    # ------------------------------- consulta -------------------------------
+
+    def _candidates(self, q: str, fuzzy: bool) -> List[int]:
+        grams = _grams(q)
+        if not grams:
+            # consultas de 1–2 caracteres: varredura linear sobre strings já minúsculas
+            return [i for i, low in enumerate(self._lower) if low is not None and q in low]
+
+        posts = sorted((self._postings.get(g, array("I")) for g in grams), key=len)
+        if not fuzzy:
+            if not posts[0]:
+                return []
+            out = []
+            rest = posts[1:]
+            for i in posts[0]:
+                for other in rest:
+                    k = bisect_left(other, i)
+                    if k == len(other) or other[k] != i:
+                        break
+                else:
+                    out.append(i)
+            return out
+
+        # fuzzy: pelo menos metade dos trigramas em comum
+        need = max(1, (len(grams) + 1) // 2)
+        counts: Counter = Counter()
+        for post in posts:
+            counts.update(post)
+        return [i for i, n in counts.items() if n >= need]
+
+    def _subsequence_candidates(self, q: str, seen: set, missing: int) -> List[int]:
+        """
+        Complemento fuzzy quando poucos caminhos dividem metade dos trigramas
+        (ex.: erro de digitação curto): subsequência testada primeiro só em quem
+        tem algum trigrama em comum; a varredura do índice inteiro só acontece
+        se ainda faltar resultado e o índice tiver até FUZZY_SCAN_LIMIT caminhos.
+        """
+        lowers = self._lower
+        shared = set()
+        for g in _grams(q):
+            shared.update(self._postings.get(g, ()))
+        shared -= seen
+        out = [i for i in shared if lowers[i] is not None and _subsequence_at(q, lowers[i]) >= 0]
+        if len(out) >= missing or len(self._ids) > self.FUZZY_SCAN_LIMIT:
+            return out
+        seen = seen | shared
+        out.extend(
+            i for i, low in enumerate(lowers)
+            if low is not None and i not in seen and _subsequence_at(q, low) >= 0
+        )
+        return out
+
+    def _score(self, cands, q: str, prefix: str, fuzzy: bool) -> List[tuple]:
+        """
+        Calcula a chave de ranking (menor = melhor):
+        0 nome exato, 1 prefixo do nome, 2 substring do nome, 3 substring do caminho,
+        4/5 subsequência no nome/caminho (fuzzy), 6 só trigramas em comum (fuzzy).
+        """
+        lowers, paths, starts = self._lower, self._paths, self._name_at
+        lq = len(q)
+        out = []
+        append = out.append
+        for i in cands:
+            low = lowers[i]
+            if low is None or (prefix and not paths[i].startswith(prefix)):
+                continue
+            ns = starts[i]
+            pos = low.find(q, ns)
+            if pos >= 0:
+                if pos == ns:
+                    cls = 0 if len(low) - ns == lq else 1
+                else:
+                    cls = 2
+                pos -= ns
+            else:
+                pos = low.find(q)
+                if pos >= 0:
+                    cls = 3
+                elif not fuzzy:
+                    continue
+                else:
+                    pos = _subsequence_at(q, low[ns:])
+                    cls = 4
+                    if pos < 0:
+                        pos = _subsequence_at(q, low)
+                        cls = 5 if pos >= 0 else 6
+            append((cls, pos, len(low), low, i))
+        return out
+
+    def search(self, q: str, root: str = "", fuzzy: bool = False,
+               offset: int = 0, limit: int = 100) -> Tuple[List[Tuple[str, bool]], int]:
+        """
+        Retorna ([(rel_path, is_dir)], total) já ranqueado.
+        Guarda em cache (consulta, geração do índice) -> (total, top-K ids), então as
+        páginas seguintes custam só o fatiamento. Para consultas muito amplas só o
+        top-K é ordenado (heap); páginas além dele reordenam com K maior.
+        """
+        q = q.lower()
+        root = root.strip("/")
+        prefix = root + "/" if root else ""
+        want = offset + limit
+        with self._lock:
+            key = (q, prefix, fuzzy, self._generation)
+            cached = self._cache.get(key)
+            if cached is None or len(cached[1]) < min(want, cached[0]):
+                cands = self._candidates(q, fuzzy)
+                if fuzzy and len(cands) < want:
+                    cands = list(cands) + self._subsequence_candidates(q, set(cands), want - len(cands))
+                scored = self._score(cands, q, prefix, fuzzy)
+                top_k = max(self.TOP_K, want)
+                if len(scored) > top_k:
+                    top = heapq.nsmallest(top_k, scored)
+                else:
+                    top = sorted(scored)
+                cached = (len(scored), [s[-1] for s in top])
+                self._cache[key] = cached
+                while len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+
+            total, ranked = cached
+            page = ranked[offset:want]
+            return [(self._paths[i], self._is_dir[i]) for i in page], total
+
+
+# Instância global, alimentada pelas criações/remoções do índice da árvore
+search_index = PathSearchIndex()
+workspace_index.add_listener(search_index.on_change)
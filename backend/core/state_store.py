@@ -0,0 +1,401 @@
+# backend/core/state_store.py
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import json, sqlite3, threading, logging
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS backups (
+    id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    file   TEXT NOT NULL,
+    backup TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS backups_file ON backups(file);
+CREATE TABLE IF NOT EXISTS dirty (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS containers (
+    path      TEXT PRIMARY KEY,
+    container TEXT NOT NULL
+);
+"""
+
+# Migrações incrementais: versão -> comandos (aplicadas em ordem, uma vez)
+_MIGRATIONS = {
+    # backups em blobs endereçados por conteúdo
+    2: [
+        "ALTER TABLE backups ADD COLUMN blob TEXT",
+        "ALTER TABLE backups ADD COLUMN size INTEGER",
+        "ALTER TABLE backups ADD COLUMN created REAL",
+        "CREATE INDEX IF NOT EXISTS backups_blob ON backups(blob)",
+    ],
+    # cadeias de delta: base = id do backup anterior, depth = distância até o keyframe
+    3: [
+        "ALTER TABLE backups ADD COLUMN base INTEGER",
+        "ALTER TABLE backups ADD COLUMN depth INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS backups_base ON backups(base)",
+    ],
+    # validação em lote: último resultado por arquivo + último conteúdo válido
+    4: [
+        """CREATE TABLE IF NOT EXISTS validations (
+            path      TEXT PRIMARY KEY,
+            mtime_ns  INTEGER,
+            size      INTEGER,
+            hash      TEXT,
+            success   INTEGER NOT NULL,
+            result    TEXT,
+            checked   REAL,
+            good_hash TEXT,
+            good_at   REAL
+        )""",
+    ],
+    # JSON Schema por arquivo ou glob (caminho do schema relativo ao workspace)
+    5: [
+        """CREATE TABLE IF NOT EXISTS schemas (
+            pattern TEXT PRIMARY KEY,
+            schema  TEXT NOT NULL
+        )""",
+    ],
+}
+
+
+class StateStore:
+    """
+    Estado do app em SQLite (modo WAL) sob STATE_DIR.
+
+    Substitui os JSON laterais (.backups/index.json, .tmp/.dirty.json e
+    .file_containers.json): cada mudança vira um UPDATE/INSERT de uma linha em
+    vez de reescrever o arquivo inteiro, e as transações tornam o estado seguro
+    entre workers do gunicorn. Uma conexão por thread.
+    """
+
+    def __init__(self, db_path: Path, legacy: Dict[str, Path]):
+        self.db_path = db_path
+        self.legacy = legacy
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    # ------------------------------- conexão -------------------------------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._ensure_schema()
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: autocommit; transações explícitas via transaction()
+        conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = self._open()
+            try:
+                conn.executescript(_SCHEMA)
+                self._migrate_json(conn)
+                self._migrate_schema(conn)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE ... COMMIT (rollback em erro). Reentrante por thread."""
+        conn = self._conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------- migração -------------------------------
+
+    def _migrate_json(self, conn: sqlite3.Connection) -> None:
+        """Importa os JSON antigos uma única vez (os arquivos são mantidos intactos)."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return
+
+            def _read(key: str) -> dict:
+                p = self.legacy.get(key)
+                try:
+                    if p and p.exists():
+                        data = json.loads(p.read_text(encoding="utf-8") or "{}")
+                        return data if isinstance(data, dict) else {}
+                except Exception as e:
+                    logger.warning("Failed to migrate %s: %s", p, e)
+                return {}
+
+            for file, backups in _read("index").items():
+                for b in backups or []:
+                    conn.execute("INSERT OR IGNORE INTO backups(file, backup) VALUES (?, ?)", (file, b))
+            conn.executemany(
+                "INSERT OR IGNORE INTO dirty(path) VALUES (?)",
+                [(p,) for p, v in _read("dirty").items() if v],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO containers(path, container) VALUES (?, ?)",
+                [(p, c) for p, c in _read("containers").items() if isinstance(c, str) and c],
+            )
+            conn.execute("INSERT INTO meta(key, value) VALUES ('schema_version', '1')")
+            conn.execute("COMMIT")
+            logger.info("State store initialized at %s", self.db_path)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            current = int(row[0]) if row else 1
+            for version in range(current + 1, SCHEMA_VERSION + 1):
+                for stmt in _MIGRATIONS.get(version, []):
+                    conn.execute(stmt)
+            if current < SCHEMA_VERSION:
+                conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'schema_version'", (str(SCHEMA_VERSION),)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ------------------------------- dirty -------------------------------
+
+    def dirty_map(self) -> Dict[str, bool]:
+        return {p: True for (p,) in self._conn().execute("SELECT path FROM dirty")}
+
+    def is_dirty(self, path: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM dirty WHERE path = ?", (path,)).fetchone() is not None
+
+    def set_dirty(self, path: str, is_dirty: bool) -> None:
+        if is_dirty:
+            self._conn().execute("INSERT OR IGNORE INTO dirty(path) VALUES (?)", (path,))
+        else:
+            self._conn().execute("DELETE FROM dirty WHERE path = ?", (path,))
+
+    # ------------------------------- containers -------------------------------
+
+    def containers_map(self) -> Dict[str, str]:
+        return dict(self._conn().execute("SELECT path, container FROM containers"))
+
+    def get_container(self, path: str) -> Optional[str]:
+        row = self._conn().execute("SELECT container FROM containers WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def set_container(self, path: str, container: str) -> None:
+        self._conn().execute(
+            "INSERT INTO containers(path, container) VALUES (?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET container = excluded.container",
+            (path, container),
+        )
+
+    def delete_container(self, path: str) -> None:
+        self._conn().execute("DELETE FROM containers WHERE path = ?", (path,))
+
+    # ------------------------------- schemas -------------------------------
+
+    def schemas_map(self) -> Dict[str, str]:
+        """caminho ou glob -> schema."""
+        return dict(self._conn().execute("SELECT pattern, schema FROM schemas"))
+
+    def set_schema(self, pattern: str, schema: str) -> None:
+        self._conn().execute(
+            "INSERT INTO schemas(pattern, schema) VALUES (?, ?) "
+            "ON CONFLICT(pattern) DO UPDATE SET schema = excluded.schema",
+            (pattern, schema),
+        )
+
+    def delete_schema(self, pattern: str) -> None:
+        self._conn().execute("DELETE FROM schemas WHERE pattern = ?", (pattern,))
+
+    # ------------------------------- backups -------------------------------
+
+    def list_backups(self, file: str) -> List[Tuple[str, Optional[str]]]:
+        """[(caminho do backup, blob)] em ordem de criação; blob None = cópia física antiga."""
+        return self._conn().execute(
+            "SELECT backup, blob FROM backups WHERE file = ? ORDER BY id", (file,)
+        ).fetchall()
+
+    def get_backup(self, backup: str) -> Optional[tuple]:
+        """
+        (arquivo de origem, blob, tamanho, criado em, id, base, depth) do backup,
+        ou None se não indexado. base != None indica que o blob é um delta.
+        """
+        return self._conn().execute(
+            "SELECT file, blob, size, created, id, base, depth FROM backups WHERE backup = ?", (backup,)
+        ).fetchone()
+
+    def backup_node(self, backup_id: int) -> Optional[tuple]:
+        """(blob, base, depth) pelo id; usado para percorrer cadeias de delta."""
+        return self._conn().execute(
+            "SELECT blob, base, depth FROM backups WHERE id = ?", (backup_id,)
+        ).fetchone()
+
+    def latest_backup(self, file: str) -> Optional[tuple]:
+        """(id, backup, blob, depth) do backup mais recente do arquivo."""
+        return self._conn().execute(
+            "SELECT id, backup, blob, depth FROM backups WHERE file = ? ORDER BY id DESC LIMIT 1", (file,)
+        ).fetchone()
+
+    def backup_dependents(self, backup_id: int) -> List[Tuple[int, str]]:
+        """[(id, blob)] dos deltas construídos diretamente sobre 'backup_id'."""
+        return self._conn().execute(
+            "SELECT id, blob FROM backups WHERE base = ?", (backup_id,)
+        ).fetchall()
+
+    def add_backup(self, file: str, backup: str, blob: Optional[str] = None,
+                   size: Optional[int] = None, created: Optional[float] = None,
+                   base: Optional[int] = None, depth: int = 0) -> None:
+        # mesmo nome (dois backups no mesmo segundo) sobrescreve, como o copy2 fazia
+        self._conn().execute(
+            "INSERT INTO backups(file, backup, blob, size, created, base, depth) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(backup) DO UPDATE SET file = excluded.file, blob = excluded.blob, "
+            "size = excluded.size, created = excluded.created, base = excluded.base, depth = excluded.depth",
+            (file, backup, blob, size, created, base, depth),
+        )
+
+    def rebase_backup(self, backup_id: int, blob: str, base: Optional[int], depth: int) -> None:
+        """Troca o blob/base de um backup (quando a base dele é apagada)."""
+        self._conn().execute(
+            "UPDATE backups SET blob = ?, base = ?, depth = ? WHERE id = ?", (blob, base, depth, backup_id)
+        )
+
+    def remove_backup(self, backup: str) -> None:
+        self._conn().execute("DELETE FROM backups WHERE backup = ?", (backup,))
+
+    def all_backups(self) -> List[tuple]:
+        """[(id, arquivo, backup, blob, tamanho, criado em)] de todos os backups."""
+        return self._conn().execute(
+            "SELECT id, file, backup, blob, size, created FROM backups ORDER BY id"
+        ).fetchall()
+
+    def blob_ref_counts(self) -> Dict[str, int]:
+        return dict(self._conn().execute(
+            "SELECT blob, COUNT(*) FROM backups WHERE blob IS NOT NULL GROUP BY blob"
+        ))
+
+    def blob_refs(self, blob: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM backups WHERE blob = ?", (blob,)).fetchone()[0]
+
+    def forget_file(self, path: str) -> List[str]:
+        """
+        Arquivo apagado: remove índice de backups, dirty, associações de container
+        e de schema e resultado de validação.
+        Retorna os blobs que ficaram sem nenhuma referência.
+        """
+        with self.transaction() as conn:
+            blobs = [b for (b,) in conn.execute(
+                "SELECT DISTINCT blob FROM backups WHERE file = ? AND blob IS NOT NULL", (path,)
+            )]
+            conn.execute("DELETE FROM backups WHERE file = ?", (path,))
+            conn.execute("DELETE FROM dirty WHERE path = ?", (path,))
+            conn.execute("DELETE FROM containers WHERE path = ?", (path,))
+            conn.execute("DELETE FROM validations WHERE path = ?", (path,))
+            conn.execute("DELETE FROM schemas WHERE pattern = ?", (path,))
+            return [b for b in blobs if self.blob_refs(b) == 0]
+
+    # ------------------------------- validações -------------------------------
+
+    def validations_under(self, prefix: str) -> Dict[str, tuple]:
+        """path -> (mtime_ns, size, hash, success, result, checked, good_hash, good_at) sob 'prefix'."""
+        prefix = prefix.strip("/")
+        sql = ("SELECT path, mtime_ns, size, hash, success, result, checked, good_hash, good_at "
+               "FROM validations")
+        if prefix:
+            rows = self._conn().execute(
+                sql + " WHERE path = ? OR substr(path, 1, ?) = ?", (prefix, len(prefix) + 1, prefix + "/")
+            )
+        else:
+            rows = self._conn().execute(sql)
+        return {r[0]: tuple(r[1:]) for r in rows}
+
+    def save_validations(self, rows: List[tuple], drop: Optional[List[str]] = None) -> None:
+        """
+        rows = (path, mtime_ns, size, hash, success, result, checked), numa transação.
+        Resultado válido atualiza good_hash/good_at; inválido preserva o último válido.
+        'drop' = caminhos que não existem mais.
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO validations(path, mtime_ns, size, hash, success, result, checked, good_hash, good_at) "
+                "VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, CASE WHEN ?5 THEN ?4 END, CASE WHEN ?5 THEN ?7 END) "
+                "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size, "
+                "hash = excluded.hash, success = excluded.success, result = excluded.result, "
+                "checked = excluded.checked, "
+                "good_hash = COALESCE(excluded.good_hash, validations.good_hash), "
+                "good_at = COALESCE(excluded.good_at, validations.good_at)",
+                rows,
+            )
+            if drop:
+                conn.executemany("DELETE FROM validations WHERE path = ?", [(p,) for p in drop])
+
+    # ------------------------------- movimentação -------------------------------
+
+    def move_prefix(self, src: str, dst: str) -> None:
+        """
+        Renomeia 'src' (arquivo) ou tudo sob 'src/' (pasta) para 'dst' em todas
+        as tabelas por caminho, numa única transação. Usa substr() em vez de LIKE
+        para não depender de escapar '%' e '_' nos nomes.
+        """
+        src, dst = src.strip("/"), dst.strip("/")
+        n = len(src) + 1
+        with self.transaction() as conn:
+            for table, col in (("backups", "file"), ("dirty", "path"), ("containers", "path"),
+                               ("validations", "path"), ("schemas", "pattern")):
+                conn.execute(
+                    f"UPDATE OR REPLACE {table} SET {col} = ? || substr({col}, ?) "
+                    f"WHERE {col} = ? OR substr({col}, 1, ?) = ?",
+                    (dst, n, src, n, src + "/"),
+                )
+
+
+_data_dir = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
+
+# Instância global
+state = StateStore(
+    Path(settings.STATE_DIR).resolve() / "state.db",
+    legacy={
+        "index": _data_dir / ".backups" / "index.json",
+        "dirty": Path(settings.TEMP_DIR).resolve() / ".dirty.json",
+        "containers": _data_dir / ".file_containers.json",
+    },
+)
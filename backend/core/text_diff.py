@@ -0,0 +1,412 @@
+# backend/core/text_diff.py
+from __future__ import annotations
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+import re, threading, time
+
+from ..config import settings
+
+# Diff por linhas para o servidor.
+#
+# - prefixo/sufixo comuns são cortados antes de tudo (o caso típico: poucas
+#   linhas alteradas num arquivo grande);
+# - Myers guloso com trace (O((N+M)·D) tempo, O(D²) memória) enquanto D cabe
+#   em MAX_TRACE_D;
+# - acima disso, bissecção pela "middle snake" de Myers (espaço linear), que
+#   divide o problema e volta para o guloso nas partes pequenas;
+# - com o prazo (DIFF_TIMEOUT) estourado, o trecho restante é casado por
+#   patience diff (âncoras nas linhas únicas; heurístico, sem garantia de
+#   diff mínimo) e o resultado é marcado como não exato.
+
+MAX_TRACE_D = 500
+
+Opcode = Tuple[str, int, int, int, int]
+
+_LINES = re.compile(r"[^\n]*\n|[^\n]+")
+
+
+def split_lines(text: str) -> List[str]:
+    """Linhas com o "\n" final (só quebra em "\n", como diff/git)."""
+    return _LINES.findall(text)
+
+
+class _Ctx:
+    __slots__ = ("deadline", "exact")
+
+    def __init__(self, deadline: Optional[float]):
+        self.deadline = deadline
+        self.exact = True
+
+    def expired(self) -> bool:
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.exact = False
+            return True
+        return False
+
+
+def _greedy(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int,
+            out: list, ctx: _Ctx) -> bool:
+    """Myers guloso com backtracking. False se D passar de MAX_TRACE_D (ou o prazo acabar)."""
+    n, m = a1 - a0, b1 - b0
+    max_d = min(n + m, MAX_TRACE_D)
+    off = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace: List[List[int]] = []
+    for d in range(max_d + 1):
+        if d % 64 == 0 and ctx.expired():
+            return False
+        # V de d-1 para os k em [-d-1, d+1]; indexado por k + d + 1
+        trace.append(v[off - d - 1: off + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+                x = v[off + k + 1]
+            else:
+                x = v[off + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            v[off + k] = x
+            if x >= n and y >= m:
+                _backtrack(trace, n, m, a0, b0, out)
+                return True
+    return False
+
+
+def _backtrack(trace: List[List[int]], x: int, y: int, a0: int, b0: int, out: list) -> None:
+    for d in range(len(trace) - 1, -1, -1):
+        snap = trace[d]
+        k = x - y
+        if k == -d or (k != d and snap[k - 1 + d + 1] < snap[k + 1 + d + 1]):
+            pk = k + 1
+        else:
+            pk = k - 1
+        px = snap[pk + d + 1] if d else 0
+        py = px - pk if d else 0
+        run = min(x - px, y - py) if d else x
+        if run > 0:
+            out.append((a0 + x - run, b0 + y - run, run))
+        x, y = px, py
+
+
+def _bisect(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int,
+            out: list, ctx: _Ctx) -> None:
+    """Acha a middle snake (espaço linear) e resolve as duas metades."""
+    n, m = a1 - a0, b1 - b0
+    max_d = (n + m + 1) // 2
+    off = max_d + 1
+    size = 2 * max_d + 3
+    v1 = [-1] * size
+    v2 = [-1] * size
+    v1[off + 1] = 0
+    v2[off + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1s = k1e = k2s = k2e = 0
+    for d in range(max_d):
+        if ctx.expired():
+            _fallback(a, b, a0, a1, b0, b1, out)
+            return
+        for k1 in range(-d + k1s, d + 1 - k1e, 2):
+            i = off + k1
+            if k1 == -d or (k1 != d and v1[i - 1] < v1[i + 1]):
+                x1 = v1[i + 1]
+            else:
+                x1 = v1[i - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            v1[i] = x1
+            if x1 > n:
+                k1e += 2
+            elif y1 > m:
+                k1s += 2
+            elif front:
+                j = off + delta - k1
+                if 0 <= j < size and v2[j] != -1 and x1 >= n - v2[j]:
+                    _split(a, b, a0, a1, b0, b1, x1, y1, out, ctx)
+                    return
+        for k2 in range(-d + k2s, d + 1 - k2e, 2):
+            i = off + k2
+            if k2 == -d or (k2 != d and v2[i - 1] < v2[i + 1]):
+                x2 = v2[i + 1]
+            else:
+                x2 = v2[i - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - x2 - 1] == b[b1 - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[i] = x2
+            if x2 > n:
+                k2e += 2
+            elif y2 > m:
+                k2s += 2
+            elif not front:
+                j = off + delta - k2
+                if 0 <= j < size and v1[j] != -1:
+                    x1 = v1[j]
+                    y1 = x1 - (j - off)
+                    if x1 >= n - x2:
+                        _split(a, b, a0, a1, b0, b1, x1, y1, out, ctx)
+                        return
+
+
+def _fallback(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int, out: list) -> None:
+    """
+    Prazo estourado: patience diff em vez de um 'replace' do trecho inteiro.
+    Linhas que aparecem uma única vez em cada lado viram âncoras (maior
+    subsequência crescente, O(n log n)); os intervalos entre elas são cortados
+    por prefixo/sufixo comuns e repetem o processo. Sem âncora, fica 'replace'.
+    """
+    stack = [(a0, a1, b0, b1)]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            out.append((a0, b0, 1))
+            a0 += 1
+            b0 += 1
+        while a1 > a0 and b1 > b0 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+            out.append((a1, b1, 1))
+        if a0 == a1 or b0 == b1:
+            continue
+        seen_a = Counter(a[a0:a1])
+        seen_b = Counter(b[b0:b1])
+        at_b = {line: j for j, line in enumerate(b[b0:b1], b0) if seen_b[line] == 1}
+        pairs = [(i, at_b[line]) for i, line in enumerate(a[a0:a1], a0)
+                 if seen_a[line] == 1 and line in at_b]
+        anchors = _lis(pairs)
+        if not anchors:
+            continue
+        pi, pj = a0, b0
+        for i, j in anchors:
+            out.append((i, j, 1))
+            stack.append((pi, i, pj, j))
+            pi, pj = i + 1, j + 1
+        stack.append((pi, a1, pj, b1))
+
+
+def _lis(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Maior subsequência de 'pairs' (já em ordem de i) com j crescente."""
+    tails: List[int] = []
+    tail_at: List[int] = []
+    prev = [-1] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_at.append(n)
+        else:
+            tails[k] = j
+            tail_at[k] = n
+        prev[n] = tail_at[k - 1] if k else -1
+    seq = []
+    n = tail_at[-1] if tail_at else -1
+    while n >= 0:
+        seq.append(pairs[n])
+        n = prev[n]
+    seq.reverse()
+    return seq
+
+
+def _split(a, b, a0, a1, b0, b1, x, y, out, ctx) -> None:
+    _match(a, b, a0, a0 + x, b0, b0 + y, out, ctx)
+    _match(a, b, a0 + x, a1, b0 + y, b1, out, ctx)
+
+
+def _match(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int,
+           out: list, ctx: _Ctx) -> None:
+    """Acrescenta a 'out' os blocos (i, j, tamanho) iguais entre a[a0:a1] e b[b0:b1]."""
+    s = 0
+    while a0 + s < a1 and b0 + s < b1 and a[a0 + s] == b[b0 + s]:
+        s += 1
+    if s:
+        out.append((a0, b0, s))
+        a0 += s
+        b0 += s
+    e = 0
+    while a1 - e > a0 and b1 - e > b0 and a[a1 - e - 1] == b[b1 - e - 1]:
+        e += 1
+    a1 -= e
+    b1 -= e
+    # sem nenhuma linha em comum (ex.: arquivo reescrito) é 'replace' direto, sem busca O(D²)
+    if a0 < a1 and b0 < b1 and not set(a[a0:a1]).isdisjoint(b[b0:b1]):
+        if not _greedy(a, b, a0, a1, b0, b1, out, ctx):
+            _bisect(a, b, a0, a1, b0, b1, out, ctx)
+    if e:
+        out.append((a1, b1, e))
+
+
+def opcodes(a_lines: List[str], b_lines: List[str], timeout: Optional[float] = None) -> Tuple[List[Opcode], bool]:
+    """
+    Opcodes no formato do difflib ('equal'/'replace'/'delete'/'insert', i1, i2, j1, j2).
+    Retorna (opcodes, exato).
+    """
+    ids: Dict[str, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    ctx = _Ctx(time.monotonic() + timeout if timeout else None)
+    blocks: list = []
+    _match(a, b, 0, len(a), 0, len(b), blocks, ctx)
+    blocks.sort()
+
+    ops: List[Opcode] = []
+    i = j = 0
+    for bi, bj, n in blocks + [(len(a), len(b), 0)]:
+        if i < bi and j < bj:
+            ops.append(("replace", i, bi, j, bj))
+        elif i < bi:
+            ops.append(("delete", i, bi, j, bj))
+        elif j < bj:
+            ops.append(("insert", i, bi, j, bj))
+        if n:
+            if ops and ops[-1][0] == "equal":
+                ops[-1] = ("equal", ops[-1][1], bi + n, ops[-1][3], bj + n)
+            else:
+                ops.append(("equal", bi, bi + n, bj, bj + n))
+        i, j = bi + n, bj + n
+    return ops, ctx.exact
+
+
+def group(ops: List[Opcode], context: int = 3) -> List[List[Opcode]]:
+    """Hunks com 'context' linhas em volta (mesma regra de difflib.get_grouped_opcodes)."""
+    ops = list(ops)
+    if not ops or (len(ops) == 1 and ops[0][0] == "equal"):
+        return []
+    if ops[0][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[0]
+        ops[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if ops[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[-1]
+        ops[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    groups: List[List[Opcode]] = []
+    cur: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "equal" and i2 - i1 > 2 * context:
+            cur.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(cur)
+            cur = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        cur.append((tag, i1, i2, j1, j2))
+    if cur and not (len(cur) == 1 and cur[0][0] == "equal"):
+        groups.append(cur)
+    return groups
+
+
+def stats(ops: List[Opcode], a_total: int, b_total: int) -> dict:
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in ops:
+        if tag != "equal":
+            removed += i2 - i1
+            added += j2 - j1
+    return {
+        "old_lines": a_total,
+        "new_lines": b_total,
+        "added": added,
+        "removed": removed,
+        "unchanged": a_total - removed,
+    }
+
+
+def _body(line: str) -> Tuple[str, bool]:
+    return (line[:-1], True) if line.endswith("\n") else (line, False)
+
+
+def render(groups: List[List[Opcode]], a_lines: List[str], b_lines: List[str]) -> List[dict]:
+    """
+    Hunks em JSON: cabeçalho no formato do diff unificado e linhas [op, texto]
+    com op em " ", "-", "+" (e "\\" para "No newline at end of file").
+    """
+    hunks = []
+    for g in groups:
+        i1, i2, j1, j2 = g[0][1], g[-1][2], g[0][3], g[-1][4]
+        lines: List[list] = []
+
+        def emit(op: str, line: str) -> None:
+            text, nl = _body(line)
+            lines.append([op, text])
+            if not nl:
+                lines.append(["\\", "No newline at end of file"])
+
+        for tag, a1, a2, b1, b2 in g:
+            if tag == "equal":
+                for line in a_lines[a1:a2]:
+                    emit(" ", line)
+                continue
+            for line in a_lines[a1:a2]:
+                emit("-", line)
+            for line in b_lines[b1:b2]:
+                emit("+", line)
+        hunks.append({
+            "old_start": i1 + 1 if i2 > i1 else i1,
+            "old_lines": i2 - i1,
+            "new_start": j1 + 1 if j2 > j1 else j1,
+            "new_lines": j2 - j1,
+            "lines": lines,
+        })
+    return hunks
+
+
+# ------------------------------- cache -------------------------------
+
+class DiffCache:
+    """
+    Resultado por (hash esquerdo, hash direito, contexto): hunks como índices
+    de linhas + estatísticas. O texto das linhas não fica no cache; cada página
+    é montada a partir do conteúdo atual (que tem o mesmo hash).
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, Tuple[List[List[Opcode]], dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return hit
+
+    def put(self, key: tuple, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+cache = DiffCache(max(1, getattr(settings, "DIFF_CACHE_ENTRIES", 128)))
+
+
+def compute(a_hash: str, b_hash: str, a_lines: List[str], b_lines: List[str],
+            context: int = 3) -> Tuple[List[List[Opcode]], dict, bool]:
+    """(hunks, estatísticas, veio do cache) para o par de conteúdos."""
+    key = (a_hash, b_hash, context)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit[0], hit[1], True
+    t0 = time.perf_counter()
+    if a_hash == b_hash:
+        ops, exact = [("equal", 0, len(a_lines), 0, len(b_lines))] if a_lines else [], True
+    else:
+        ops, exact = opcodes(a_lines, b_lines, getattr(settings, "DIFF_TIMEOUT", 5.0) or None)
+    groups = group(ops, context)
+    st = stats(ops, len(a_lines), len(b_lines))
+    st["hunks"] = len(groups)
+    st["exact"] = exact
+    st["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    cache.put(key, (groups, st))
+    return groups, st, False
@@ -0,0 +1,158 @@
+# backend/core/text_patch.py
+from __future__ import annotations
+from typing import Iterable, List, Optional
+import re
+
+
+class PatchError(ValueError):
+    """Patch não se aplica ao conteúdo base (malformado ou contexto divergente)."""
+
+
+# ------------------------------- edições por intervalo -------------------------------
+#
+# Posições como no Monaco: linha e coluna 1-based, coluna em unidades UTF-16
+# (o que o JS enxerga em string.length). Linhas separadas só por "\n"; um "\r"
+# de CRLF conta como caractere da linha.
+
+_ASTRAL = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def _col_to_index(line: str, col: int) -> int:
+    """Coluna UTF-16 (1-based) -> índice Python na linha."""
+    units = col - 1
+    if units < 0:
+        raise PatchError("invalid column")
+    if not _ASTRAL.search(line):
+        if units > len(line):
+            raise PatchError("column out of range")
+        return units
+    i = 0
+    while units > 0:
+        if i >= len(line):
+            raise PatchError("column out of range")
+        units -= 2 if ord(line[i]) > 0xFFFF else 1
+        i += 1
+    if units < 0:
+        raise PatchError("column splits a surrogate pair")
+    return i
+
+
+def _line_starts(text: str) -> List[int]:
+    starts = [0]
+    i = text.find("\n")
+    while i >= 0:
+        starts.append(i + 1)
+        i = text.find("\n", i + 1)
+    return starts
+
+
+def _offset(text: str, starts: List[int], line: int, col: int) -> int:
+    if not 1 <= line <= len(starts):
+        raise PatchError("line out of range")
+    begin = starts[line - 1]
+    end = starts[line] - 1 if line < len(starts) else len(text)
+    return begin + _col_to_index(text[begin:end], col)
+
+
+def apply_edits(text: str, edits: Iterable[dict]) -> str:
+    """
+    Aplica edições em sequência; cada uma vê o resultado da anterior.
+    edit = {start_line, start_col, end_line, end_col, text}.
+    """
+    for e in edits:
+        starts = _line_starts(text)
+        a = _offset(text, starts, e["start_line"], e["start_col"])
+        b = _offset(text, starts, e["end_line"], e["end_col"])
+        if b < a:
+            raise PatchError("range end before start")
+        text = text[:a] + (e.get("text") or "") + text[b:]
+    return text
+
+
+# ------------------------------- unified diff -------------------------------
+
+_HUNK = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_LINES = re.compile(r"[^\n]*\n|[^\n]+")
+
+
+def _split_lines(text: str) -> List[str]:
+    """Como splitlines(keepends=True), mas só quebra em "\n" (igual ao diff/git)."""
+    return _LINES.findall(text)
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """
+    Aplica um diff unificado (saída de 'diff -u' / 'git diff', um arquivo).
+    Sem fuzz: cada linha de contexto e de remoção precisa bater exatamente
+    na posição indicada pelo hunk.
+    """
+    src = _split_lines(text)
+    out: List[str] = []
+    pos = 0  # próxima linha de 'src' ainda não copiada
+    lines = _split_lines(diff)
+    i = 0
+    seen_hunk = False
+    while i < len(lines):
+        m = _HUNK.match(lines[i])
+        if not m:
+            if seen_hunk and lines[i].strip():
+                raise PatchError("unexpected line outside hunk")
+            i += 1  # cabeçalhos ---/+++/diff/index
+            continue
+        seen_hunk = True
+        old_start, old_len = int(m.group(1)), int(m.group(2) or 1)
+        # hunk de inserção pura ("-N,0") refere-se à linha *após* N
+        start = old_start if old_len == 0 else old_start - 1
+        if start < pos or start > len(src):
+            raise PatchError("hunk out of order")
+        out.extend(src[pos:start])
+        pos = start
+        i += 1
+        last_added: Optional[int] = None
+        last_kind = ""
+        while i < len(lines) and not _HUNK.match(lines[i]):
+            line = lines[i]
+            kind, body = line[:1], line[1:]
+            if kind == "\\":
+                # "\ No newline at end of file": tira o \n da linha anterior
+                if last_kind == "+" and last_added is not None:
+                    out[last_added] = out[last_added].rstrip("\n")
+                i += 1
+                continue
+            if kind in (" ", "-"):
+                if pos >= len(src) or src[pos].rstrip("\n") != body.rstrip("\n"):
+                    raise PatchError("context mismatch")
+                if kind == " ":
+                    out.append(src[pos])
+                    last_added, last_kind = len(out) - 1, "+"
+                else:
+                    last_kind = "-"
+                pos += 1
+            elif kind == "+":
+                out.append(body if body.endswith("\n") else body + "\n")
+                last_added, last_kind = len(out) - 1, "+"
+            elif line.strip() == "":
+                # alguns geradores cortam o espaço das linhas de contexto vazias
+                if pos >= len(src) or src[pos].strip("\r\n") != "":
+                    raise PatchError("context mismatch")
+                out.append(src[pos])
+                last_added, last_kind = len(out) - 1, "+"
+                pos += 1
+            else:
+                raise PatchError("invalid hunk line")
+            i += 1
+    if not seen_hunk:
+        raise PatchError("no hunks")
+    out.extend(src[pos:])
+    return "".join(out)
+
+
+def apply_patch(text: str, diff: Optional[str] = None, edits: Optional[Iterable[dict]] = None) -> str:
+    """Diff unificado e/ou edições (nessa ordem). Lança PatchError se não se aplicar."""
+    if diff is None and edits is None:
+        raise PatchError("empty patch")
+    if diff is not None:
+        text = apply_unified_diff(text, diff)
+    if edits is not None:
+        text = apply_edits(text, edits)
+    return text
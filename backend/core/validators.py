@@ -0,0 +1,796 @@
+# backend/core/validators.py
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+from hashlib import sha256
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import configparser, csv, io, itertools, json, multiprocessing, re, threading, time, logging
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from pathlib import Path
+
+try:
+    import yaml
+except Exception:
+    yaml = None
+
+try:
+    import tomllib
+except Exception:
+    try:
+        import toml as tomllib  # mesmo loads(); erros sem posição estruturada
+    except Exception:
+        tomllib = None
+
+try:
+    import jsonschema  # schemas associados (opcional): sem ele só a sintaxe é checada
+except Exception:
+    jsonschema = None
+
+try:
+    import ijson  # JSON incremental (opcional): sem ele, .json grande é lido inteiro
+except Exception:
+    ijson = None
+
+try:
+    import resource
+except Exception:
+    resource = None
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Validadores por extensão. Cada um recebe (conteúdo, nome) e lança exceção se
+# inválido; _errors_from() transforma a exceção em erros com linha/coluna. Os de
+# formatos de dados devolvem o documento, usado na checagem contra JSON Schema.
+# Os parsers são importados uma vez com o módulo (o forkserver já o pré-carrega,
+# então cada processo do pool nasce com eles), não a cada chamada.
+
+Validator = Callable[[str, str], Any]
+
+_REGISTRY: Dict[str, Tuple[Validator, str]] = {}
+
+
+def register(*exts: str, ok: str):
+    """Decorador: associa o validador às extensões; 'ok' = chave i18n da mensagem de sucesso."""
+    def deco(fn: Validator) -> Validator:
+        for ext in exts:
+            _REGISTRY[ext.lower()] = (fn, ok)
+        return fn
+    return deco
+
+
+def supported(ext: str) -> bool:
+    return ext.lower() in _REGISTRY
+
+
+class EmptyContent(ValueError):
+    """Conteúdo vazio onde se espera texto (CSS, Markdown)."""
+
+
+if yaml is not None:
+    @register(".yaml", ".yml", ok="validate.yaml_ok")
+    def _yaml(content: str, name: str) -> Any:
+        return yaml.safe_load(content)
+
+
+@register(".json", ok="validate.json_ok")
+def _json(content: str, name: str) -> Any:
+    return json.loads(content)
+
+
+@register(".xml", ok="validate.xml_ok")
+def _xml(content: str, name: str) -> None:
+    ET.fromstring(content)
+
+
+@register(".html", ok="validate.html_ok")
+def _html(content: str, name: str) -> None:
+    parser = HTMLParser()
+    parser.feed(content)
+    parser.close()
+
+
+@register(".py", ok="validate.python_ok")
+def _python(content: str, name: str) -> None:
+    compile(content, name, "exec")
+
+
+@register(".ini", ok="validate.ini_ok")
+def _ini(content: str, name: str) -> None:
+    configparser.ConfigParser().read_string(content)
+
+
+@register(".css", ok="validate.css_ok")
+def _css(content: str, name: str) -> None:
+    if not content.strip():
+        raise EmptyContent()
+
+
+if tomllib is not None:
+    @register(".toml", ok="validate.toml_ok")
+    def _toml(content: str, name: str) -> Any:
+        return tomllib.loads(content)
+
+
+@register(".md", ok="validate.md_ok")
+def _markdown(content: str, name: str) -> None:
+    if not content.strip():
+        raise EmptyContent()
+
+
+def _check_csv(lines: Iterable[str]) -> None:
+    reader = csv.reader(lines)
+    try:
+        for _ in reader:
+            pass
+    except csv.Error as e:
+        e.lineno = reader.line_num
+        raise
+
+
+@register(".csv", ok="validate.csv_ok")
+def _csv(content: str, name: str) -> None:
+    _check_csv(io.StringIO(content))
+
+
+# ------------------------------- validação em fluxo -------------------------------
+# Arquivos grandes validados direto do disco (VALIDATE_STREAM_BYTES ou mais):
+# parsers incrementais que recebem o arquivo aberto em binário e nunca montam o
+# documento inteiro na memória. A mensagem de sucesso é a do validador normal.
+
+StreamValidator = Callable[[BinaryIO, str], None]
+
+_STREAMING: Dict[str, StreamValidator] = {}
+
+
+def register_stream(*exts: str):
+    """Decorador: validador incremental para as extensões (precisa de um register() equivalente)."""
+    def deco(fn: StreamValidator) -> StreamValidator:
+        for ext in exts:
+            _STREAMING[ext.lower()] = fn
+        return fn
+    return deco
+
+
+def streamable(ext: str) -> bool:
+    return ext.lower() in _STREAMING
+
+
+def _text(fb: BinaryIO) -> io.TextIOWrapper:
+    # decodifica em blocos; byte inválido vira UnicodeDecodeError (errors.not_utf8)
+    return io.TextIOWrapper(fb, encoding="utf-8", newline="")
+
+
+@register_stream(".xml")
+def _xml_stream(fb: BinaryIO, name: str) -> None:
+    # limpa a raiz a cada filho completo: memória limitada ao elemento corrente
+    root, depth = None, 0
+    for event, elem in ET.iterparse(fb, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = elem
+        else:
+            depth -= 1
+            if depth == 1:
+                root.clear()
+
+
+@register_stream(".csv")
+def _csv_stream(fb: BinaryIO, name: str) -> None:
+    _check_csv(_text(fb))
+
+
+if ijson is not None:
+    @register_stream(".json")
+    def _json_stream(fb: BinaryIO, name: str) -> None:
+        for _ in ijson.parse(fb):
+            pass
+
+
+if yaml is not None:
+    @register_stream(".yaml", ".yml")
+    def _yaml_stream(fb: BinaryIO, name: str) -> None:
+        # eventos do parser, sem construir objetos; repete as checagens do
+        # safe_load que não dependem do documento montado
+        from yaml.composer import ComposerError
+        from yaml.constructor import ConstructorError
+        constructors = yaml.SafeLoader.yaml_constructors
+        anchors = set()
+        first = None
+        for event in yaml.parse(_text(fb), Loader=yaml.SafeLoader):
+            if isinstance(event, yaml.DocumentStartEvent):
+                if first is not None:
+                    raise ComposerError("expected a single document in the stream", first,
+                                        "but found another document", event.start_mark)
+                first = event.start_mark
+            elif isinstance(event, yaml.AliasEvent):
+                if event.anchor not in anchors:
+                    raise ComposerError(None, None, "found undefined alias %r" % event.anchor,
+                                        event.start_mark)
+            elif isinstance(event, yaml.NodeEvent):
+                if event.anchor is not None:
+                    anchors.add(event.anchor)
+                tag = getattr(event, "tag", None)
+                if tag not in (None, "!") and tag not in constructors:
+                    raise ConstructorError(None, None, "could not determine a constructor for the tag %r" % tag,
+                                           event.start_mark)
+
+
+# ------------------------------- erros estruturados -------------------------------
+
+_AT_LINE_COL = re.compile(r"line (\d+),? col(?:umn)? (\d+)")
+_AT_LINE = re.compile(r"line (\d+)")
+
+
+def _error(message: str, line: Optional[int] = None, column: Optional[int] = None) -> dict:
+    return {"line": line, "column": column, "message": message}
+
+
+def _errors_from(exc: BaseException) -> List[dict]:
+    """Extrai linha/coluna (1-based) das exceções de cada parser."""
+    if yaml is not None and isinstance(exc, yaml.MarkedYAMLError):
+        mark = exc.problem_mark or exc.context_mark
+        msg = " ".join(p for p in (exc.context, exc.problem) if p) or str(exc)
+        if mark is None:
+            return [_error(msg)]
+        return [_error(msg, mark.line + 1, mark.column + 1)]
+    if isinstance(exc, json.JSONDecodeError):
+        return [_error(exc.msg, exc.lineno, exc.colno)]
+    if isinstance(exc, ET.ParseError):
+        line, col = getattr(exc, "position", (None, None))
+        msg = str(exc).split(":")[0]
+        return [_error(msg, line, col + 1 if col is not None else None)]
+    if isinstance(exc, SyntaxError):
+        return [_error(exc.msg or str(exc), exc.lineno, exc.offset)]
+    if isinstance(exc, configparser.Error) and getattr(exc, "lineno", None):
+        # MissingSectionHeaderError, DuplicateSectionError, DuplicateOptionError
+        return [_error(exc.message.splitlines()[0], exc.lineno)]
+    if isinstance(exc, configparser.ParsingError) and getattr(exc, "errors", None):
+        return [_error(f"parsing error: {line.strip()!r}", lineno) for lineno, line in exc.errors]
+    lineno = getattr(exc, "lineno", None)
+    if lineno is not None:
+        return [_error(str(exc), lineno, getattr(exc, "colno", None))]
+    msg = str(exc) or exc.__class__.__name__
+    # tomllib: "... (at line 3, column 5)"
+    m = _AT_LINE_COL.search(msg)
+    if m:
+        return [_error(msg, int(m.group(1)), int(m.group(2)))]
+    m = _AT_LINE.search(msg)
+    if m:
+        return [_error(msg, int(m.group(1)))]
+    return [_error(msg)]
+
+
+def _execute(call: Callable[[], None], ok: str) -> dict:
+    try:
+        call()
+    except OSError:
+        raise
+    except UnicodeDecodeError:
+        return {"success": False, "key": "errors.not_utf8", "errors": []}
+    except EmptyContent:
+        return {"success": False, "key": "validate.empty", "errors": []}
+    except MemoryError:
+        return {"success": False, "key": "validate.too_complex", "errors": []}
+    except RecursionError:
+        return {"success": False, "key": "validate.too_complex", "errors": []}
+    except Exception as e:
+        return {"success": False, "key": "validate.error", "errors": _errors_from(e)}
+    return {"success": True, "key": ok, "errors": []}
+
+
+# ------------------------------- JSON Schema -------------------------------
+# Roda no processo do pool, depois da sintaxe. schema = (nome, caminho absoluto,
+# mtime_ns, tamanho) como em schemas.resolve(); o validador compilado fica em
+# cache por processo com mtime/tamanho na chave, então editar o schema invalida.
+
+_COMPILED: "OrderedDict[tuple, Any]" = OrderedDict()
+
+# erros de schema devolvidos por arquivo (o resto só conta)
+MAX_SCHEMA_ERRORS = 50
+
+
+def _compiled(schema: tuple) -> Any:
+    _name, path, mtime_ns, size = schema
+    key = (path, mtime_ns, size)
+    hit = _COMPILED.get(key)
+    if hit is not None:
+        _COMPILED.move_to_end(key)
+        return hit
+    with open(path, "rb") as fb:
+        raw = fb.read().decode("utf-8")
+    if yaml is not None and Path(path).suffix.lower() in (".yaml", ".yml"):
+        doc = yaml.safe_load(raw)
+    else:
+        doc = json.loads(raw)
+    cls = jsonschema.validators.validator_for(doc)
+    cls.check_schema(doc)
+    checker = getattr(cls, "FORMAT_CHECKER", None)
+    compiled = cls(doc, format_checker=checker) if checker is not None else cls(doc)
+    _COMPILED[key] = compiled
+    while len(_COMPILED) > max(1, getattr(settings, "SCHEMA_CACHE_ENTRIES", 32)):
+        _COMPILED.popitem(last=False)
+    return compiled
+
+
+def _locate(ext: str, content: str) -> Callable[[list], Tuple[Optional[int], Optional[int]]]:
+    """Linha/coluna de um caminho do documento (YAML e JSON, via nós do composer)."""
+    root = None
+    if yaml is not None and ext in (".yaml", ".yml", ".json"):
+        try:
+            root = yaml.compose(content, Loader=yaml.SafeLoader)
+        except Exception:
+            root = None
+
+    def find(parts: list) -> Tuple[Optional[int], Optional[int]]:
+        if root is None:
+            return None, None
+        node = root
+        for part in parts:
+            child = None
+            if isinstance(node, yaml.MappingNode):
+                child = next((v for k, v in node.value if k.value == str(part)), None)
+            elif isinstance(node, yaml.SequenceNode) and isinstance(part, int) and part < len(node.value):
+                child = node.value[part]
+            if child is None:
+                break
+            node = child
+        return node.start_mark.line + 1, node.start_mark.column + 1
+    return find
+
+
+def check_schema(ext: str, content: str, data: Any, schema: tuple) -> dict:
+    """Documento já parseado contra o schema associado."""
+    name = schema[0]
+    if jsonschema is None:
+        return {"success": True, "key": "validate.schema_unavailable", "errors": [], "schema": name}
+    try:
+        validator = _compiled(schema)
+    except Exception as e:
+        # posição se refere ao arquivo do schema, não ao validado: vai só no texto
+        first = _errors_from(e)[0]
+        msg = getattr(e, "message", None) or first["message"]
+        if first["line"] and not isinstance(e, jsonschema.SchemaError):
+            msg += f" ({Path(schema[1]).name}, line {first['line']})"
+        return {"success": False, "key": "validate.schema_invalid", "schema": name, "errors": [_error(msg)]}
+    try:
+        found = sorted(validator.iter_errors(data), key=lambda err: list(map(str, err.absolute_path)))
+    except (MemoryError, RecursionError):
+        return {"success": False, "key": "validate.too_complex", "errors": [], "schema": name}
+    if not found:
+        return {"success": True, "key": "validate.schema_ok", "errors": [], "schema": name}
+    where = _locate(ext, content)
+    errors = []
+    for err in found[:MAX_SCHEMA_ERRORS]:
+        parts = list(err.absolute_path)
+        line, col = where(parts)
+        pointer = "/".join(map(str, parts)) or "(root)"
+        errors.append(_error(f"{pointer}: {err.message}", line, col))
+    return {"success": False, "key": "validate.schema_error", "errors": errors, "schema": name,
+            "total": len(found)}
+
+
+def run(ext: str, content: str, name: str, schema: Optional[tuple] = None) -> dict:
+    """Executa o validador (no processo do pool). Resultado serializável."""
+    ext = ext.lower()
+    entry = _REGISTRY.get(ext)
+    if entry is None:
+        return {"success": False, "key": "validate.empty" if not content.strip() else "validate.not_supported",
+                "errors": []}
+    fn, ok = entry
+    parsed = []
+    result = _execute(lambda: parsed.append(fn(content, name)), ok)
+    if schema is None or not result["success"] or not parsed:
+        return result
+    return check_schema(ext, content, parsed[0], schema)
+
+
+def run_path(ext: str, path: str, name: str, stream: bool = False, schema: Optional[tuple] = None) -> dict:
+    """
+    Como run(), lendo o arquivo no próprio processo do pool (sem trafegar o
+    conteúdo). Com stream=True usa o validador incremental da extensão, se houver
+    (só sintaxe: o documento não é montado, então não há checagem de schema).
+    """
+    ext = ext.lower()
+    fn = _STREAMING.get(ext) if stream else None
+    if fn is None or ext not in _REGISTRY:
+        try:
+            with open(path, "rb") as fb:
+                content = fb.read().decode("utf-8")
+        except UnicodeDecodeError:
+            return {"success": False, "key": "errors.not_utf8", "errors": []}
+        return run(ext, content, name, schema)
+
+    def call() -> None:
+        with open(path, "rb") as fb:
+            fn(fb, name)
+    return _execute(call, _REGISTRY[ext][1])
+
+
+def use_stream(ext: str, size: int) -> bool:
+    """Arquivo lido do disco que deve ir pelo validador incremental."""
+    return streamable(ext) and size >= getattr(settings, "VALIDATE_STREAM_BYTES", 8 * 1024 * 1024)
+
+
+def fits(ext: str, size: int) -> bool:
+    """Validável do disco: cabe na memória (FILE_INLINE_MAX_BYTES) ou tem validador incremental."""
+    return size <= getattr(settings, "FILE_INLINE_MAX_BYTES", 10 * 1024 * 1024) or streamable(ext)
+
+
+_TIMED_OUT = {"success": False, "key": "validate.timeout", "errors": []}
+_BROKEN = {"success": False, "key": "validate.too_complex", "errors": []}
+
+
+# ------------------------------- pool -------------------------------
+
+def _cache_key(ext: str, digest: str, stream: bool, schema: Optional[tuple] = None) -> tuple:
+    # o validador incremental não monta o documento (nem checa schema): resultado guardado à parte
+    if stream:
+        return (ext.lower(), digest, "stream")
+    return (ext.lower(), digest, schema) if schema else (ext.lower(), digest)
+
+
+def _timeout_for(stream: bool) -> float:
+    if stream:
+        return getattr(settings, "VALIDATE_STREAM_TIMEOUT", 120.0)
+    return getattr(settings, "VALIDATE_TIMEOUT", 5.0)
+
+
+# fila em que o processo avisa quando começa cada tarefa (definida em _worker_init)
+_STARTED = None
+
+
+def _worker_init(memory_mb: int, started=None) -> None:
+    global _STARTED
+    _STARTED = started
+    # limite de memória por processo: YAML patológico vira MemoryError, não OOM do host
+    if resource is not None and memory_mb > 0:
+        try:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            logger.debug("Could not limit validator memory: %s", e)
+
+
+def _tracked(token: int, fn: Callable, *args):
+    """Roda no processo do pool: avisa o início (o prazo conta daqui, não do envio)."""
+    if _STARTED is not None:
+        _STARTED.put((token, time.time()))
+    return fn(*args)
+
+
+class _TrackedPool:
+    """ProcessPoolExecutor cujas tarefas avisam quando começam a rodar."""
+
+    def __init__(self, workers: int):
+        try:
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload([__name__])
+        except ValueError:
+            ctx = multiprocessing.get_context("spawn")
+        self._queue = ctx.Queue()
+        self._lock = threading.Lock()
+        self._started: Dict[int, float] = {}
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_worker_init,
+            initargs=(getattr(settings, "VALIDATE_MEMORY_MB", 512), self._queue),
+        )
+
+    def submit(self, token: int, fn: Callable, *args):
+        return self.executor.submit(_tracked, token, fn, *args)
+
+    def started(self, token: int) -> Optional[float]:
+        """Quando a tarefa começou (time.time() do processo), ou None se ainda está na fila."""
+        with self._lock:
+            while True:
+                try:
+                    t, at = self._queue.get_nowait()
+                except Exception:
+                    break
+                self._started[t] = at
+            return self._started.get(token)
+
+    def forget(self, token: int) -> None:
+        with self._lock:
+            self._started.pop(token, None)
+
+    def kill(self) -> None:
+        # ProcessPoolExecutor não cancela tarefa em execução: só matando o processo
+        for proc in list((getattr(self.executor, "_processes", None) or {}).values()):
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._queue.close()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._queue.close()
+
+
+# sem aviso de início ainda (tarefa na fila): confere de novo depois disso
+_POLL = 0.25
+
+
+class ValidatorPool:
+    """
+    Validação isolada em ProcessPoolExecutors com VALIDATE_WORKERS processos
+    (0 = na própria thread, sem isolamento): um pool para o editor
+    (validate, validate_path) e outro para a validação em lote
+    (validate_many), para que um timeout de um não derrube as tarefas do
+    outro. O prazo de cada validação (VALIDATE_TIMEOUT, ou
+    VALIDATE_STREAM_TIMEOUT no modo incremental) conta a partir do momento
+    em que ela começa a rodar num processo, não do envio;
+    só quando a própria tarefa estoura o prazo o pool dela é encerrado e
+    recriado na próxima chamada. Resultados ficam em cache por (extensão,
+    sha256 do conteúdo).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _TrackedPool] = {}
+        self._tokens = itertools.count()
+        self._cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._stats = {"runs": 0, "streamed": 0, "cache_hits": 0, "timeouts": 0, "restarts": 0}
+
+    def _executor(self, kind: str = "interactive") -> Optional[_TrackedPool]:
+        workers = getattr(settings, "VALIDATE_WORKERS", 2)
+        if workers <= 0:
+            return None
+        with self._lock:
+            pool = self._pools.get(kind)
+            if pool is None:
+                pool = self._pools[kind] = _TrackedPool(workers)
+            return pool
+
+    def _kill(self, pool: _TrackedPool) -> None:
+        """Tarefa travada: encerra os processos do pool dela e descarta o pool."""
+        with self._lock:
+            for kind, current in list(self._pools.items()):
+                if current is pool:
+                    del self._pools[kind]
+                    self._stats["restarts"] += 1
+        pool.kill()
+
+    def _cache_get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+            return hit
+
+    def _cache_put(self, key: tuple, result: dict) -> None:
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > max(1, getattr(settings, "VALIDATE_CACHE_ENTRIES", 512)):
+                self._cache.popitem(last=False)
+
+    def _await(self, pool: _TrackedPool, future, token: int, timeout: float):
+        """
+        Resultado da tarefa, esperando até 'timeout' segundos a partir do início
+        dela. FutureTimeout só quando ela mesma estourou (travada).
+        """
+        try:
+            while True:
+                started = pool.started(token)
+                wait_for = _POLL if started is None else max(0.0, started + timeout - time.time())
+                try:
+                    return future.result(timeout=wait_for)
+                except FutureTimeout:
+                    if started is not None:
+                        raise
+        finally:
+            pool.forget(token)
+
+    def validate(self, ext: str, content: str, name: str = "<string>", schema: Optional[tuple] = None) -> dict:
+        """
+        {"success", "key" (i18n), "errors": [{"line", "column", "message"}],
+         "cached", "timed_out"} (+ "schema" quando checado contra um).
+        """
+        ext = ext.lower()
+        key = _cache_key(ext, sha256(content.encode("utf-8", "surrogatepass")).hexdigest(), False, schema)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return {**hit, "cached": True, "timed_out": False}
+
+        with self._lock:
+            self._stats["runs"] += 1
+        result, timed_out = self._interactive(getattr(settings, "VALIDATE_TIMEOUT", 5.0), run, ext, content, name, schema)
+        if timed_out:
+            return {**_TIMED_OUT, "cached": False, "timed_out": True}
+        if result is None:
+            return {**_BROKEN, "cached": False, "timed_out": False}
+        self._cache_put(key, result)
+        return {**result, "cached": False, "timed_out": False}
+
+    def _interactive(self, timeout: float, fn: Callable, *args) -> Tuple[Optional[dict], bool]:
+        """
+        fn(*args) no pool do editor: (resultado, estourou o prazo). Resultado
+        None sem timeout = pool quebrado também na segunda tentativa.
+        """
+        for _attempt in (1, 2):
+            pool = self._executor("interactive")
+            if pool is None:
+                return fn(*args), False
+            token = next(self._tokens)
+            future = pool.submit(token, fn, *args)
+            try:
+                return self._await(pool, future, token, timeout), False
+            except FutureTimeout:
+                self._kill(pool)
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                return None, True
+            except (BrokenProcessPool, CancelledError):
+                # pool derrubado pelo timeout de outra validação (ou processo morto): tenta uma vez num pool novo
+                self._kill(pool)
+        return None, False
+
+    def validate_many(self, jobs: Iterable[Tuple[Any, str, str, str, int, Optional[tuple]]]
+                      ) -> Iterator[Tuple[Any, dict]]:
+        """
+        Valida arquivos direto do disco, em paralelo, no pool de lote. jobs =
+        (tag, extensão, caminho, sha256 do conteúdo, tamanho, schema ou None);
+        gera (tag, resultado) na ordem em que terminam. Arquivos a partir de
+        VALIDATE_STREAM_BYTES vão pelo validador incremental ("streamed" no
+        resultado), com prazo VALIDATE_STREAM_TIMEOUT. O prazo conta do início
+        de cada arquivo no processo (outras varreduras podem dividir o pool).
+        Estourado, o pool é recriado; os outros arquivos que já rodavam voltam
+        para a fila uma vez, os que nem tinham começado voltam sem gastar a
+        nova tentativa.
+        """
+        it = iter(jobs)
+        retry: List[Tuple[tuple, int]] = []
+        # future -> (job, tentativa, token, prazo)
+        inflight: Dict[Any, Tuple[tuple, int, int, float]] = {}
+        pool: Optional[_TrackedPool] = None
+
+        def finished(job: tuple, result: dict, **flags) -> dict:
+            return {**result, "cached": False, "timed_out": False, "streamed": use_stream(job[1], job[4]), **flags}
+
+        try:
+            while True:
+                pool = self._executor("bulk")
+                window = max(1, getattr(settings, "VALIDATE_WORKERS", 2))
+                while len(inflight) < window:
+                    if retry:
+                        job, attempt = retry.pop()
+                    else:
+                        job, attempt = next(it, None), 1
+                        if job is None:
+                            break
+                    tag, ext, path, digest, size, schema = job
+                    stream = use_stream(ext, size)
+                    key = _cache_key(ext, digest, stream, schema)
+                    hit = self._cache_get(key)
+                    if hit is not None:
+                        yield tag, {**hit, "cached": True, "timed_out": False, "streamed": stream}
+                        continue
+                    with self._lock:
+                        self._stats["runs"] += 1
+                        if stream:
+                            self._stats["streamed"] += 1
+                    if pool is None:
+                        result = run_path(ext, path, Path(path).name, stream, schema)
+                        self._cache_put(key, result)
+                        yield tag, finished(job, result)
+                        continue
+                    token = next(self._tokens)
+                    future = pool.submit(token, run_path, ext, path, Path(path).name, stream, schema)
+                    inflight[future] = (job, attempt, token, _timeout_for(stream))
+                if not inflight:
+                    if retry:
+                        continue
+                    break
+
+                now = time.time()
+                starts = {f: pool.started(token) for f, (_, _, token, _) in inflight.items()}
+                deadlines = [starts[f] + limit for f, (_, _, _, limit) in inflight.items() if starts[f] is not None]
+                wait_for = min(deadlines) - now if deadlines else _POLL
+                if len(deadlines) < len(inflight):
+                    wait_for = min(wait_for, _POLL)
+                done, _ = wait(inflight, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+                if not done:
+                    now = time.time()
+                    hung = [f for f, (_, _, _, limit) in inflight.items()
+                            if starts[f] is not None and now - starts[f] >= limit]
+                    if not hung:
+                        continue  # só fila: ninguém travou
+                    # a tarefa estourou o prazo: derruba o pool, as outras voltam para a fila
+                    self._kill(pool)
+                    for future, (job, attempt, token, _limit) in inflight.items():
+                        pool.forget(token)
+                        if future in hung:
+                            with self._lock:
+                                self._stats["timeouts"] += 1
+                            yield job[0], finished(job, _TIMED_OUT, timed_out=True)
+                        elif starts[future] is None:
+                            retry.append((job, attempt))
+                        elif attempt < 2:
+                            retry.append((job, attempt + 1))
+                        else:
+                            yield job[0], finished(job, _BROKEN)
+                    inflight.clear()
+                    continue
+                for future in done:
+                    job, attempt, token, _ = inflight.pop(future)
+                    pool.forget(token)
+                    try:
+                        result = future.result()
+                    except (BrokenProcessPool, CancelledError):
+                        # pool derrubado por outra varredura (ou processo morto)
+                        self._kill(pool)
+                        if attempt < 2:
+                            retry.append((job, attempt + 1))
+                        else:
+                            yield job[0], finished(job, _BROKEN)
+                        continue
+                    except OSError as e:
+                        # arquivo sumiu/ilegível entre o stat e a leitura
+                        yield job[0], finished(job, {"success": False, "key": "validate.error", "errors": [
+                            {"line": None, "column": None, "message": str(e)}]})
+                        continue
+                    self._cache_put(_cache_key(job[1], job[3], use_stream(job[1], job[4]), job[5]), result)
+                    yield job[0], finished(job, result)
+        finally:
+            # cliente desconectou: descarta o que ainda não rodou
+            for future, (_, _, token, _) in inflight.items():
+                future.cancel()
+                if pool is not None:
+                    pool.forget(token)
+
+    def validate_path(self, ext: str, path: str, digest: str, size: int, schema: Optional[tuple] = None) -> dict:
+        """
+        Um arquivo do disco, no pool do editor (não espera atrás de uma
+        validação em lote). Mesmas regras de validate_many para cache,
+        modo incremental e prazo.
+        """
+        stream = use_stream(ext, size)
+        key = _cache_key(ext, digest, stream, schema)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return {**hit, "cached": True, "timed_out": False, "streamed": stream}
+        with self._lock:
+            self._stats["runs"] += 1
+            if stream:
+                self._stats["streamed"] += 1
+        try:
+            result, timed_out = self._interactive(_timeout_for(stream), run_path, ext, path, Path(path).name, stream, schema)
+        except OSError as e:
+            # arquivo sumiu/ilegível entre o stat e a leitura
+            return {"success": False, "key": "validate.error", "cached": False, "timed_out": False, "streamed": stream,
+                    "errors": [{"line": None, "column": None, "message": str(e)}]}
+        if timed_out:
+            return {**_TIMED_OUT, "cached": False, "timed_out": True, "streamed": stream}
+        if result is None:
+            return {**_BROKEN, "cached": False, "timed_out": False, "streamed": stream}
+        self._cache_put(key, result)
+        return {**result, "cached": False, "timed_out": False, "streamed": stream}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown()
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["cache_entries"] = len(self._cache)
+        s["workers"] = getattr(settings, "VALIDATE_WORKERS", 2)
+        s["extensions"] = sorted(_REGISTRY)
+        s["streaming"] = sorted(_STREAMING)
+        return s
+
+
+# Instância global
+validators = ValidatorPool()
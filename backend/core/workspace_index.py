@@ -0,0 +1,467 @@
+# backend/core/workspace_index.py
+from __future__ import annotations
+from pathlib import Path
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+import os, stat, threading, time, logging
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except Exception:
+    Observer = None
+    FileSystemEventHandler = object
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Arquivos/diretórios internos que não devem aparecer na árvore/busca
+EXCLUDE_NAMES = {".backups", ".tmp", ".state", ".file_containers.json"}
+
+# listener(rel_path, is_dir, added) — chamado a cada entrada criada/removida
+Listener = Callable[[str, bool, bool], None]
+
+
+class Entry(NamedTuple):
+    is_dir: bool
+    size: int
+    mtime: int
+
+
+# chave de ordenação estável da listagem: pastas primeiro, depois nome
+SortKey = Tuple[int, str, str]
+
+
+def sort_key(name: str, is_dir: bool) -> SortKey:
+    return (0 if is_dir else 1, name.lower(), name)
+
+
+def _join(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+
+def _parent(rel: str) -> str:
+    return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+
+class WorkspaceIndex:
+    """
+    Índice em memória da árvore do workspace.
+
+    Mapeia cada diretório (relativo à raiz, "" = raiz) para {nome: Entry}, com
+    tipo, tamanho e mtime vindos de um único stat por entrada (os.scandir).
+    A árvore é montada uma vez no start() e mantida atualizada por inotify
+    (watchdog) ou, na falta dele, por polling do mtime dos diretórios (nesse modo
+    tamanho/mtime de arquivos editados fora da API só mudam no próximo rescan da pasta).
+    As rotas também avisam mudanças via touch() para não depender do watcher.
+    """
+
+    def __init__(self, root: Path, exclude: Set[str] = EXCLUDE_NAMES,
+                 watch: str = "auto", poll_interval: float = 5.0):
+        self.root = root
+        self.exclude = set(exclude)
+        self.watch = watch
+        self.poll_interval = max(0.5, poll_interval)
+
+        self._dirs: Dict[str, Dict[str, Entry]] = {}
+        self._sorted: Dict[str, Tuple[Dict[str, Entry], List[Tuple[SortKey, str, Entry]]]] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Listener] = []
+
+        self._pending: Set[str] = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._ready = False
+        self.mode = "off"
+
+        # contadores expostos em /api/health
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "rebuilds": 0,
+            "last_rebuild_ms": 0.0,
+            "total_rebuild_ms": 0.0,
+            "refreshes": 0,
+            "events": 0,
+        }
+
+    # ------------------------------- ciclo de vida -------------------------------
+
+    def start(self) -> None:
+        """Inicia watcher e monta a árvore em background (não bloqueia o startup)."""
+        if self.watch == "off" or self._thread is not None:
+            return
+        self._stop.clear()
+        # watcher antes do build: eventos durante a varredura ficam em _pending
+        self.mode = "poll"
+        if self.watch in ("auto", "inotify") and Observer is not None and self.root.is_dir():
+            try:
+                obs = Observer()
+                obs.schedule(_Handler(self), str(self.root), recursive=True)
+                obs.daemon = True
+                obs.start()
+                self._observer = obs
+                self.mode = "inotify"
+            except Exception as e:
+                # ex.: fs.inotify.max_user_watches estourado
+                logger.warning("inotify unavailable, falling back to polling: %s", e)
+                self._observer = None
+
+        self._thread = threading.Thread(target=self._run, name="workspace-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+                self._observer.join(timeout=2)
+            except Exception:
+                pass
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._lock:
+            self._ready = False
+            self._dirs = {}
+            self._sorted = {}
+            self._mtimes = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def add_listener(self, fn: Listener) -> None:
+        self._listeners.append(fn)
+
+    # ------------------------------- consulta -------------------------------
+
+    def listdir(self, rel: str = "") -> Optional[Dict[str, Entry]]:
+        """
+        Retorna {nome: Entry} do diretório (sem internos) ou None se não for diretório.
+        Com o índice pronto, responde da memória; antes disso, varre o disco sem cachear.
+        """
+        rel = rel.strip("/")
+        if self._ready:
+            entries = self._dirs.get(rel)
+            if entries is not None:
+                self._stats["hits"] += 1
+                return entries
+        self._stats["misses"] += 1
+        scanned = self._scan(rel)
+        if scanned is None:
+            return None
+        entries, mtime = scanned
+        if self._ready and not self._is_excluded(rel):
+            with self._lock:
+                self._dirs[rel] = entries
+                self._mtimes[rel] = mtime
+        return entries
+
+    def walk(self, rel: str = "") -> Iterator[Tuple[str, str, bool]]:
+        """Percorre a subárvore (sem internos) gerando (rel_path, nome, is_dir)."""
+        stack = [rel.strip("/")]
+        while stack:
+            cur = stack.pop()
+            entries = self.listdir(cur)
+            if not entries:
+                continue
+            for name, entry in entries.items():
+                child = _join(cur, name)
+                yield child, name, entry.is_dir
+                if entry.is_dir:
+                    stack.append(child)
+
+    def page(self, rel: str = "", after: Optional[SortKey] = None,
+             limit: Optional[int] = None) -> Optional[Tuple[List[Tuple[str, Entry]], int, bool]]:
+        """
+        Listagem ordenada e paginada por chave (keyset): retorna ([(nome, Entry)], total, há_mais).
+        A ordenação fica em cache até o diretório mudar, então páginas seguintes
+        custam só a busca binária.
+        """
+        rel = rel.strip("/")
+        entries = self.listdir(rel)
+        if entries is None:
+            return None
+        cached = self._sorted.get(rel)
+        if cached is not None and cached[0] is entries:
+            ordered = cached[1]
+        else:
+            ordered = sorted((sort_key(n, e.is_dir), n, e) for n, e in entries.items())
+            if self._ready:
+                self._sorted[rel] = (entries, ordered)
+        start = bisect_right(ordered, after, key=lambda x: x[0]) if after else 0
+        end = len(ordered) if limit is None else start + limit
+        return [(n, e) for _, n, e in ordered[start:end]], len(ordered), end < len(ordered)
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = round(s["hits"] / lookups, 4) if lookups else None
+        s["mode"] = self.mode
+        s["ready"] = self._ready
+        s["dirs"] = len(self._dirs)
+        s["entries"] = sum(len(v) for v in list(self._dirs.values()))
+        return s
+
+    # ------------------------------- atualização -------------------------------
+
+    def touch(self, rel: str) -> None:
+        """
+        Avisa que 'rel' (arquivo ou pasta) mudou. Arquivo já conhecido e ainda
+        existente: só um novo stat dele; caso contrário reescaneia o pai.
+        """
+        rel = (rel or "").strip("/")
+        if not self._ready or self._is_excluded(rel):
+            return
+        if rel and self._restat(rel):
+            return
+        # sobe até o ancestral já indexado (mkdir -p / mv para pasta nova)
+        parent = _parent(rel)
+        while parent and parent not in self._dirs:
+            parent = _parent(parent)
+        self.refresh(parent)
+
+    def refresh(self, rel: str) -> None:
+        """Reescaneia um diretório, propagando criações/remoções para a subárvore."""
+        rel = rel.strip("/")
+        if self._is_excluded(rel):
+            return
+        with self._lock:
+            self._stats["refreshes"] += 1
+            old = self._dirs.get(rel)
+            scanned = self._scan(rel)
+            if scanned is None:
+                # diretório sumiu: remove ele e descendentes
+                if old is not None:
+                    self._drop_subtree(rel)
+                return
+            new, mtime = scanned
+            self._dirs[rel] = new
+            self._mtimes[rel] = mtime
+            if old is None:
+                # diretório ainda não conhecido: só registra (listeners vêem pelo pai)
+                return
+            for name, entry in old.items():
+                if name not in new or new[name].is_dir != entry.is_dir:
+                    child = _join(rel, name)
+                    if entry.is_dir:
+                        self._drop_subtree(child)
+                    self._emit(child, entry.is_dir, False)
+            for name, entry in new.items():
+                if name not in old or old[name].is_dir != entry.is_dir:
+                    child = _join(rel, name)
+                    self._emit(child, entry.is_dir, True)
+                    if entry.is_dir:
+                        self._build_subtree(child)
+
+    def rebuild(self) -> None:
+        """Varredura completa; substitui o índice e notifica apenas as diferenças."""
+        t0 = time.perf_counter()
+        dirs: Dict[str, Dict[str, Entry]] = {}
+        mtimes: Dict[str, int] = {}
+        stack = [""]
+        while stack:
+            cur = stack.pop()
+            scanned = self._scan(cur)
+            if scanned is None:
+                continue
+            entries, mtime = scanned
+            dirs[cur] = entries
+            mtimes[cur] = mtime
+            stack.extend(_join(cur, n) for n, e in entries.items() if e.is_dir)
+
+        with self._lock:
+            old_paths = self._all_paths(self._dirs)
+            new_paths = self._all_paths(dirs)
+            self._dirs = dirs
+            self._sorted = {}
+            self._mtimes = mtimes
+            self._ready = True
+            for p, is_dir in old_paths.items():
+                if new_paths.get(p) != is_dir:
+                    self._emit(p, is_dir, False)
+            for p, is_dir in new_paths.items():
+                if old_paths.get(p) != is_dir:
+                    self._emit(p, is_dir, True)
+
+        ms = (time.perf_counter() - t0) * 1000
+        self._stats["rebuilds"] += 1
+        self._stats["last_rebuild_ms"] = round(ms, 2)
+        self._stats["total_rebuild_ms"] = round(self._stats["total_rebuild_ms"] + ms, 2)
+        logger.info("Workspace index built: %d dirs in %.1f ms (%s)", len(dirs), ms, self.mode)
+
+    # ------------------------------- internos -------------------------------
+
+    def _is_excluded(self, rel: str) -> bool:
+        return any(part in self.exclude for part in rel.split("/") if part)
+
+    @staticmethod
+    def _entry(st: os.stat_result) -> Entry:
+        is_dir = stat.S_ISDIR(st.st_mode)
+        return Entry(is_dir, 0 if is_dir else st.st_size, int(st.st_mtime))
+
+    def _scan(self, rel: str) -> Optional[Tuple[Dict[str, Entry], int]]:
+        path = self.root / rel if rel else self.root
+        entries: Dict[str, Entry] = {}
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for e in it:
+                    if e.name in self.exclude:
+                        continue
+                    # um stat por entrada (segue symlinks, como Path.is_dir())
+                    try:
+                        entries[e.name] = self._entry(e.stat())
+                    except OSError:
+                        entries[e.name] = Entry(False, 0, 0)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except PermissionError:
+            return {}, 0
+        return entries, mtime
+
+    def _restat(self, rel: str) -> bool:
+        """Atualiza tamanho/mtime de um arquivo já indexado. False se precisar reescanear o pai."""
+        parent, name = _parent(rel), rel.rsplit("/", 1)[-1]
+        with self._lock:
+            entries = self._dirs.get(parent)
+            old = entries.get(name) if entries else None
+            if old is None or old.is_dir:
+                return False
+            try:
+                new = self._entry(os.stat(self.root / rel))
+            except OSError:
+                return False
+            if new.is_dir:
+                return False
+            if new != old:
+                # nunca muta o dict publicado: leitores podem estar iterando
+                entries = dict(entries)
+                entries[name] = new
+                self._dirs[parent] = entries
+            return True
+
+    def _build_subtree(self, rel: str) -> None:
+        stack = [rel]
+        while stack:
+            cur = stack.pop()
+            scanned = self._scan(cur)
+            if scanned is None:
+                continue
+            entries, mtime = scanned
+            self._dirs[cur] = entries
+            self._mtimes[cur] = mtime
+            for name, entry in entries.items():
+                child = _join(cur, name)
+                self._emit(child, entry.is_dir, True)
+                if entry.is_dir:
+                    stack.append(child)
+
+    def _drop_subtree(self, rel: str) -> None:
+        prefix = rel + "/"
+        for d in [d for d in self._dirs if d == rel or d.startswith(prefix)]:
+            entries = self._dirs.pop(d)
+            self._sorted.pop(d, None)
+            self._mtimes.pop(d, None)
+            for name, entry in entries.items():
+                self._emit(_join(d, name), entry.is_dir, False)
+
+    @staticmethod
+    def _all_paths(dirs: Dict[str, Dict[str, Entry]]) -> Dict[str, bool]:
+        out: Dict[str, bool] = {}
+        for d, entries in dirs.items():
+            for name, entry in entries.items():
+                out[_join(d, name)] = entry.is_dir
+        return out
+
+    def _emit(self, rel: str, is_dir: bool, added: bool) -> None:
+        for fn in self._listeners:
+            try:
+                fn(rel, is_dir, added)
+            except Exception:
+                logger.exception("Workspace index listener failed for %s", rel)
+
+    def _queue(self, abs_path: str) -> None:
+        """Chamado pelo watcher: enfileira o diretório afetado para reescanear."""
+        try:
+            rel = Path(abs_path).relative_to(self.root).as_posix()
+        except ValueError:
+            return
+        rel = "" if rel == "." else rel
+        if self._is_excluded(rel):
+            return
+        self._stats["events"] += 1
+        with self._lock:
+            self._pending.add(rel)
+        self._wake.set()
+
+    def _poll(self) -> None:
+        """Fallback sem inotify: um stat por diretório conhecido, reescaneia os alterados."""
+        changed = []
+        for d, mtime in list(self._mtimes.items()):
+            try:
+                cur = os.stat(self.root / d if d else self.root).st_mtime_ns
+            except OSError:
+                cur = None
+            if cur != mtime:
+                changed.append(d)
+        for d in changed:
+            self.refresh(d)
+
+    def _drain(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for rel in sorted(pending, key=len):
+            # evento pode ser de arquivo (novo stat ou reescaneia o pai) ou de pasta (reescaneia ela)
+            if rel in self._dirs:
+                self.refresh(rel)
+            if rel and not self._restat(rel):
+                self.refresh(_parent(rel))
+
+    def _run(self) -> None:
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Workspace index build failed")
+        while not self._stop.is_set():
+            woke = self._wake.wait(self.poll_interval)
+            if self._stop.is_set():
+                break
+            if woke:
+                # pequena janela para agrupar rajadas de eventos
+                time.sleep(0.1)
+                self._wake.clear()
+            try:
+                self._drain()
+                if self.mode == "poll" and not woke:
+                    self._poll()
+            except Exception:
+                logger.exception("Workspace index refresh failed")
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, index: WorkspaceIndex):
+        self.index = index
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed", "closed_no_write"):
+            return
+        self.index._queue(event.src_path)
+        dest = getattr(event, "dest_path", None)
+        if dest:
+            self.index._queue(dest)
+
+
+# Instância global (uma por worker)
+workspace_index = WorkspaceIndex(
+    Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve(),
+    watch=getattr(settings, "INDEX_WATCH", "auto"),
+    poll_interval=getattr(settings, "INDEX_POLL_INTERVAL", 5.0),
+)
@@ -7,6 +7,7 @@ from passlib.hash import bcrypt
 from ..core.templates import render_template
 from ..core.totp import verify_totp, generate_totp_uri
 from ..config import settings
+from ..core.atomic import atomic
 
 router = APIRouter()
 
@@ -166,8 +167,7 @@ async def setup_post(
             })
         user_data["totp_secret"] = secret
 
-    with USER_FILE.open("w", encoding="utf-8") as f:
-        json.dump(user_data, f, indent=2, ensure_ascii=False)
+    atomic.write_json(USER_FILE, user_data, durable=True)
 
     # limpa segredo temporário da sessão
     request.session.pop("reg_secret", None)
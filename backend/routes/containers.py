@@ -3,15 +3,15 @@ from fastapi import APIRouter, HTTPException, Header, Depends, Query
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from pathlib import Path
-from typing import Dict, Optional
-import json, logging, shlex, subprocess, re
-
-try:
-    import docker
-except Exception:
-    docker = None
+from typing import Any, Dict, Optional
+import asyncio, logging, shlex, re
 
 from ..config import settings
+from ..core.state_store import state
+from ..core.docker_client import docker_client, DockerUnavailable, is_connection_error
+from ..core.container_state import container_states
+from ..core.container_index import ContainerIndex
+from ..core.docker_jobs import docker_jobs, DockerBusy, ContainerBusy, DockerTimeout
 from .deps import require_user
 
 logger = logging.getLogger(__name__)
@@ -22,10 +22,6 @@ router = APIRouter(prefix="/api", tags=["containers"])
 # Raiz do workspace
 BASE_DIR = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
 
-# Arquivo de associações arquivo⇄container
-STORE_PATH = BASE_DIR / ".file_containers.json"
-STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
-
 # Comando para reiniciar containers
 RESTART_CMD = getattr(settings, "CONTAINER_RESTART_CMD", None)
 
@@ -42,20 +38,6 @@ def safe_data_path(rel: str) -> Path:
         raise HTTPException(400, detail="errors.path_outside_workspace")
     return p
 
-def _load_store() -> Dict[str, str]:
-    if STORE_PATH.exists():
-        try:
-            return json.loads(STORE_PATH.read_text(encoding="utf-8") or "{}")
-        except Exception as e:
-            logger.warning("Failed to read %s: %s", STORE_PATH, e)
-            return {}
-    return {}
-
-def _save_store(data: Dict[str, str]) -> None:
-    tmp = STORE_PATH.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(STORE_PATH)
-
 def _inspect_state(c):
     """Retorna (status, health) em minúsculas.
     status: running|restarting|exited|created|paused|dead|...
@@ -63,8 +45,9 @@ def _inspect_state(c):
     """
     try:
         c.reload()
-    except Exception:
-        pass
+    except Exception as e:
+        if is_connection_error(e):
+            raise
     st = (c.attrs or {}).get("State", {}) or {}
     status = str(st.get("Status") or "").lower()
     health = None
@@ -73,84 +56,83 @@ def _inspect_state(c):
         health = str(h.get("Status") or "").lower()
     return status, health
 
-def _container_names(c):
-    """Retorna possíveis nomes sem '/'. Evita iterar string por engano."""
-    names = set()
-    try:
-        if getattr(c, "name", None):
-            names.add(c.name.lstrip("/"))
-    except Exception:
-        pass
-    try:
-        nm = c.attrs.get("Name")
-        if isinstance(nm, str) and nm:
-            names.add(nm.lstrip("/"))
-    except Exception:
-        pass
-    return list(names) or [getattr(c, "name", "").lstrip("/")]
-
-
 def _resolve_container(dclient, ref: str):
-    """Resolve por ID (prefixo), nome exato e sufixos comuns do Compose."""
+    """
+    (container, match) pela referência, ou (None, None). Usa o índice da
+    tabela de eventos quando pronta; senão monta um índice de uma única
+    listagem. match = entrada com "match" (motivo: id, name, id_prefix,
+    compose_suffix, compose_service, substring) e "ambiguous" (outros nomes
+    que casaram no mesmo nível).
+    """
     if not ref:
-        return None
-    ref = ref.strip()
-
-    # 1) ID (prefixo conta)
+        return None, None
+    if container_states.ready:
+        index = container_states.index()
+    else:
+        index = ContainerIndex.from_rows(dclient.api.containers(all=True))
+    match = index.resolve(ref)
+    if match is None:
+        return None, None
     try:
-        # docker-py aceita ID completo; para prefixo, procure na lista
-        return dclient.containers.get(ref)
-    except Exception:
-        pass
-
-    # 2) varre todos (é O(n), mas lista é curta)
+        return dclient.containers.get(match["id"]), match
+    except Exception as e:
+        # daemon inacessível não é "não encontrado": sobe para o circuito do cliente
+        if is_connection_error(e):
+            raise
+        return None, None  # removido entre a listagem e o get
+
+def _busy_key(ref: str) -> str:
+    """Chave do limite por container: o ID quando a tabela de eventos resolve a referência."""
+    if container_states.ready:
+        hit = container_states.resolve(ref)
+        if hit:
+            return hit["id"]
+    return ref.strip().lstrip("/").lower()
+
+async def _run_restart_cmd(container_ref: str) -> None:
+    """CONTAINER_RESTART_CMD como subprocesso async, com prazo (mata o processo ao estourar)."""
+    cmd = RESTART_CMD.format(container=container_ref)
+    timeout = getattr(settings, "CONTAINER_RESTART_TIMEOUT", 60.0)
     try:
-        allc = dclient.containers.list(all=True)
-    except Exception:
-        allc = []
-    
-    rlow = ref.lower()
-    
-    # (a) nome exato
-    for c in allc:
-        for n in _container_names(c):
-            if n.lower() == rlow:
-                return c
-
-    # (b) sufixos comuns do compose
-    for c in allc:
-        for n in _container_names(c):
-            if n.lower() in (f"{rlow}-1", f"{rlow}_1"):
-                return c
-
-    # (c) substring como último recurso
-    for c in allc:
-        for n in _container_names(c):
-            if rlow in n.lower():
-                return c
-
-    return None
-
-def _do_restart(container_ref: str) -> str:
+        proc = await asyncio.create_subprocess_exec(
+            *shlex.split(cmd), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except OSError as e:
+        logger.warning("Restart failed (%s): %s", container_ref, e)
+        raise HTTPException(500, detail="errors.restart_failed")
+    try:
+        _out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        logger.warning("Restart command timed out after %ss (%s)", timeout, container_ref)
+        raise HTTPException(504, detail="errors.restart_timeout")
+    if proc.returncode != 0:
+        logger.warning("Restart failed (%s): exit %s: %s", container_ref, proc.returncode,
+                       (err or b"").decode("utf-8", "replace").strip()[:500])
+        raise HTTPException(500, detail="errors.restart_failed")
+
+async def _do_restart(container_ref: str):
+    """(nome real, match) do container reiniciado; match None com RESTART_CMD."""
     # 1) Comando externo configurado
     if RESTART_CMD:
-        cmd = RESTART_CMD.format(container=container_ref)
         try:
-            subprocess.run(shlex.split(cmd), check=True, capture_output=True)
-            return container_ref
-        except subprocess.CalledProcessError as e:
-            logger.warning("Restart failed (%s): %s", container_ref, e)
-            raise HTTPException(500, detail="errors.restart_failed")
-
-    # 2) Docker SDK
-    if docker is None:
+            with docker_jobs.hold(_busy_key(container_ref)):
+                await _run_restart_cmd(container_ref)
+        except ContainerBusy:
+            raise HTTPException(409, detail="errors.restart_in_progress")
+        return container_ref, None
+
+    # 2) Docker SDK (cliente compartilhado)
+    if not docker_client.installed:
         raise HTTPException(500, detail="errors.restart_not_configured")
 
-    try:
-        client = docker.from_env()
-        c = _resolve_container(client, container_ref)
+    def restart(client):
+        c, match = _resolve_container(client, container_ref)
         if not c:
-            raise HTTPException(404, detail="errors.container_not_found")
+            return None
+        if match["ambiguous"]:
+            # não reinicia "o primeiro que casou": o cliente precisa ser específico
+            return match
 
         # Inspeciona estado atual
         try:
@@ -165,18 +147,64 @@ def _do_restart(container_ref: str) -> str:
         else:
             c.start()
 
+        # estado logo após o restart (reload), sem outra resolução
         try:
-            c.reload()
+            status, health = _inspect_state(c)
         except Exception:
-            pass
+            status = health = None
+        return {**match, "name": c.name or container_ref, "status": status, "health": health}
 
-        return c.name or container_ref
+    try:
+        # sem retry: um restart que caiu no meio não deve ser repetido às cegas
+        match = await docker_jobs.run(
+            lambda: docker_client.call(restart, retry=False),
+            timeout=getattr(settings, "CONTAINER_RESTART_TIMEOUT", 60.0),
+            key=_busy_key(container_ref),
+        )
+        if not match:
+            raise HTTPException(404, detail="errors.container_not_found")
+        if match["ambiguous"]:
+            raise HTTPException(409, detail="errors.container_ambiguous")
+        return match["name"], match
     except HTTPException:
         raise
+    except ContainerBusy:
+        raise HTTPException(409, detail="errors.restart_in_progress")
+    except DockerBusy:
+        logger.warning("Docker queue full, rejecting restart (%s)", container_ref)
+        raise HTTPException(503, detail="errors.docker_busy")
+    except DockerTimeout:
+        logger.warning("Docker restart timed out (%s)", container_ref)
+        raise HTTPException(504, detail="errors.restart_timeout")
+    except DockerUnavailable as e:
+        logger.warning("Docker unavailable for restart (%s): %s", container_ref, e)
+        raise HTTPException(503, detail="errors.docker_unavailable")
     except Exception as e:
         logger.exception("Docker restart error: %s", e)
         raise HTTPException(500, detail="errors.restart_failed")
 
+def _find_state(client, ref: str):
+    """(nome, status, health, match) do container, ou None se não encontrado."""
+    c, match = _resolve_container(client, ref)
+    if not c:
+        return None
+    status, health = _inspect_state(c)
+    return c.name, status, health, match
+
+def _match_info(match: Optional[dict]) -> Dict[str, Any]:
+    """Como a referência foi resolvida (para o front avisar sobre ambiguidade)."""
+    if not match:
+        return {"match": None, "ambiguous": []}
+    return {"match": match["match"], "ambiguous": match["ambiguous"]}
+
+async def _find_state_async(ref: str):
+    """_find_state() no executor Docker; pollings simultâneos do mesmo container compartilham a ida ao daemon."""
+    return await docker_jobs.shared(
+        f"state:{ref}",
+        lambda: docker_jobs.run(lambda: docker_client.call(lambda client: _find_state(client, ref)),
+                                timeout=getattr(settings, "DOCKER_CALL_TIMEOUT", 10.0)),
+    )
+
 # ------------------------------- Schemas ------------------------------
 
 class AssocIn(BaseModel):
@@ -192,8 +220,7 @@ async def get_file_container(
     accept: str = Header(default="*/*"),
 ) -> Dict[str, Optional[str]]:
     block_browser(accept)
-    store = _load_store()
-    return {"path": path, "container": store.get(path)}
+    return {"path": path, "container": state.get_container(path)}
 
 @router.put("/file/container")
 async def put_file_container(
@@ -212,9 +239,7 @@ async def put_file_container(
         if not container:
             raise HTTPException(400, detail="errors.invalid_container")
 
-        store = _load_store()
-        store[body.path] = container
-        _save_store(store)
+        state.set_container(body.path, container)
         return {"ok": "true"}
     except HTTPException:
         raise
@@ -230,10 +255,7 @@ async def delete_file_container(
 ) -> Dict[str, str]:
     block_browser(accept)
     try:
-        store = _load_store()
-        if path in store:
-            del store[path]
-            _save_store(store)
+        state.delete_container(path)
         return {"ok": "true"}  # ← string, consistente com o PUT
     except HTTPException:
         raise
@@ -248,7 +270,7 @@ async def get_containers_map(
     accept: str = Header(default="*/*"),
 ) -> Dict[str, Dict[str, str]]:
     block_browser(accept)
-    return {"map": _load_store()}
+    return {"map": state.containers_map()}
 
 # Reiniciar container associado a um arquivo (ou pelo nome/ID)
 @router.post("/containers/restart")
@@ -263,8 +285,7 @@ async def restart_container(
     # 1) Descobrir o container a partir do path OU usar o nome/ID informado
     container_ref: Optional[str] = None
     if path:
-        store = _load_store()
-        container_ref = (store.get(path) or "").strip()
+        container_ref = (state.get_container(path) or "").strip()
         if not container_ref:
             raise HTTPException(404, detail="errors.container_not_found")
     elif container:
@@ -274,24 +295,28 @@ async def restart_container(
         raise HTTPException(400, detail="errors.invalid_container")
 
     # 2) Reiniciar via comando externo ou Docker SDK
-    real_name = _do_restart(container_ref)
+    real_name, match = await _do_restart(container_ref)
 
     # Inspecionar e responder 200 (ok) ou 202 (em progresso)
     status = health = None
-    try:
-        if docker is not None:
-            client = docker.from_env()
-            c = _resolve_container(client, real_name or container_ref)
-            if c:
-                status, health = _inspect_state(c)
-    except Exception:
-        pass
+    if match is not None:
+        status, health = match["status"], match["health"]
+    else:
+        # comando externo: inspeciona pelo nome, se houver SDK
+        try:
+            if docker_client.installed:
+                found = await _find_state_async(real_name or container_ref)
+                if found:
+                    _, status, health, match = found
+        except Exception:
+            pass
     
     payload = {
         "ok": True,
         "container": real_name or container_ref,
         "status": status,
         "health": health,
+        **_match_info(match),
     }
 
     # Estados transitórios → 202
@@ -316,32 +341,48 @@ async def container_status(
     container: Optional[str] = Query(None),
     user=Depends(require_user),
     accept: str = Header(default="*/*"),
-) -> Dict[str, Optional[str]]:
+) -> Dict[str, Any]:
     block_browser(accept)
 
     container_ref: Optional[str] = None
     if path:
-        store = _load_store()
-        container_ref = (store.get(path) or "").strip()
+        container_ref = (state.get_container(path) or "").strip()
     elif container:
         container_ref = container.strip()
 
     if not container_ref:
         raise HTTPException(400, detail="errors.invalid_container")
 
-    if docker is None:
+    if not docker_client.installed:
         # Sem SDK não há inspeção; devolve desconhecido (front continua tentando se quiser)
         return {"ok": True, "container": container_ref, "status": None, "health": None}
 
+    # Tabela alimentada pelos eventos do Docker: responde sem ir ao daemon
+    if container_states.ready:
+        hit = container_states.resolve(container_ref)
+        if not hit:
+            raise HTTPException(404, detail="errors.container_not_found")
+        return {"ok": True, "container": hit["name"], "status": hit["status"], "health": hit["health"],
+                **_match_info(hit)}
+
     try:
-        client = docker.from_env()
-        c = _resolve_container(client, container_ref)
-        if not c:
+        found = await _find_state_async(container_ref)
+        if not found:
             raise HTTPException(404, detail="errors.container_not_found")
-        status, health = _inspect_state(c)
-        return {"ok": True, "container": c.name, "status": status, "health": health}
+        name, status, health, match = found
+        return {"ok": True, "container": name, "status": status, "health": health, **_match_info(match)}
     except HTTPException:
         raise
+    except DockerBusy:
+        logger.warning("Docker queue full, rejecting status (%s)", container_ref)
+        raise HTTPException(503, detail="errors.docker_busy")
+    except DockerTimeout:
+        logger.warning("Docker status timed out (%s)", container_ref)
+        raise HTTPException(504, detail="errors.docker_timeout")
+    except DockerUnavailable as e:
+        # circuito aberto responde na hora: o polling não trava nem enche o log de tracebacks
+        logger.warning("Docker unavailable for status (%s): %s", container_ref, e)
+        raise HTTPException(503, detail="errors.docker_unavailable")
     except Exception:
         logger.exception("status failed for %s", container_ref)
         raise HTTPException(500, detail="errors.internal_error")
\ No newline at end of file
@@ -1,15 +1,32 @@
 # backend/routes/files.py
-from fastapi import APIRouter, HTTPException, Query, Request, Depends
+from fastapi import APIRouter, HTTPException, Query, Request, Depends, Response
+from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, List
+from collections import deque
 from datetime import datetime
-import shutil, json, logging
+from email.utils import formatdate
+from hashlib import md5, sha256
+import shutil, logging, re
 
 from ..i18n import t
 from ..core.context import get_current_lang
 from .deps import require_user, browser_blocker
 from ..config import settings
+from ..core.workspace_index import workspace_index, sort_key, EXCLUDE_NAMES
+from ..core.search_index import search_index
+from ..core import content_search
+from ..core import file_io
+from ..core.atomic import atomic
+from ..core.text_patch import apply_patch, PatchError
+from ..core import text_diff
+from ..core.validators import validators, supported as validator_supported, fits as validator_fits
+from ..core import bulk_validate
+from ..core import schemas
+from ..core.state_store import state
+from ..core import backups
+from ..core import retention
 from . import temp
 
 logger = logging.getLogger(__name__)
@@ -19,34 +36,8 @@ router = APIRouter(prefix="/api", tags=["files"])
 # Raiz do workspace (configurável; fallback para "meus_arquivos")
 BASE_DIR = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
 
-# Arquivos/diretórios internos que não devem aparecer na árvore/busca
-EXCLUDE_NAMES = {".backups", ".tmp", ".file_containers.json"}
-
-INDEX_FILE = BASE_DIR / ".backups" / "index.json"
-CONTAINERS_FILE = BASE_DIR / ".file_containers.json"
-
 # ------------------------------- Utilitários -------------------------------
 
-def load_index() -> Dict[str, Any]:
-    if INDEX_FILE.exists():
-        return json.loads(INDEX_FILE.read_text(encoding="utf-8") or "{}")
-    return {}
-
-def save_index(idx: Dict[str, Any]) -> None:
-    INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
-    INDEX_FILE.write_text(json.dumps(idx, indent=2, ensure_ascii=False), encoding="utf-8")
-
-def load_containers() -> Dict[str, str]:
-    if CONTAINERS_FILE.exists():
-        try:
-            return json.loads(CONTAINERS_FILE.read_text(encoding="utf-8") or "{}")
-        except Exception as e:
-            logger.warning("Failed to read .file_containers.json: %s", e)
-    return {}
-
-def save_containers(mapping: Dict[str, str]) -> None:
-    CONTAINERS_FILE.write_text(json.dumps(mapping, indent=2, ensure_ascii=False), encoding="utf-8")
-
 def safe_path(rel: str) -> Path:
     rel = (rel or "").lstrip("/")
     target = (BASE_DIR / rel).resolve()
@@ -63,38 +54,35 @@ def is_excluded_child(p: Path) -> bool:
         return False
     return any(part in EXCLUDE_NAMES for part in parts)
 
-def update_containers_on_move(src_rel: str, dst_rel: str, is_dir: bool) -> None:
-    mapping = load_containers()
-    changed = False
+# ------------------------------- Modelos -------------------------------
 
-    if not mapping:
-        return
+class SaveBody(BaseModel):
+    path: str
+    content: str
 
-    if not is_dir:
-        if src_rel in mapping:
-            mapping[dst_rel] = mapping.pop(src_rel)
-            changed = True
-    else:
-        # para diretórios, remapeia todas as entradas com esse prefixo
-        prefix = src_rel.rstrip("/") + "/"
-        updates = {}
-        for k, v in list(mapping.items()):
-            if k == src_rel or k.startswith(prefix):
-                new_k = k.replace(src_rel, dst_rel, 1)
-                updates[new_k] = v
-                del mapping[k]
-                changed = True
-        if updates:
-            mapping.update(updates)
-
-    if changed:
-        save_containers(mapping)
+class EditOp(BaseModel):
+    # posições no formato do Monaco: linha/coluna 1-based, coluna em unidades UTF-16
+    start_line: int
+    start_col: int
+    end_line: int
+    end_col: int
+    text: str = ""
 
-# ------------------------------- Modelos -------------------------------
+class PatchBody(BaseModel):
+    path: str
+    diff: Optional[str] = None
+    edits: Optional[List[EditOp]] = None
 
-class SaveBody(BaseModel):
+class SpliceBody(BaseModel):
     path: str
+    version: str
     content: str
+    # intervalo em bytes [start, end) ...
+    start: Optional[int] = None
+    end: Optional[int] = None
+    # ... ou em linhas [line, line + count), 1-based
+    line: Optional[int] = None
+    count: Optional[int] = None
 
 class MkdirBody(BaseModel):
     path: str
@@ -107,64 +95,372 @@ class CreateFileBody(BaseModel):
     path: str
     content: Optional[str] = ""
 
+class SchemaAssocBody(BaseModel):
+    # caminho do arquivo ou glob ("apps/*.yaml", "docker-compose*.yml")
+    path: str
+    # schema relativo ao workspace
+    schema_path: str
+
+class DiffSide(BaseModel):
+    # "file" (workspace), "backup" (caminho do backup), "draft" (rascunho em TEMP_DIR) ou "text"
+    kind: str
+    path: Optional[str] = None
+    text: Optional[str] = None
+
+class DiffBody(BaseModel):
+    left: DiffSide
+    right: DiffSide
+    context: int = 3
+    limit: int = 50
+    cursor: Optional[str] = None
+
 # =========================================================
 # Árvores e arquivos
 # =========================================================
 
+def _tree_items(rel: str, entries, dirty_map: Dict[str, bool]) -> list:
+    """Monta os itens de /api/tree a partir de [(nome, Entry)] já ordenados."""
+    items = []
+    for name, e in entries:
+        child = f"{rel}/{name}" if rel else name
+        items.append({
+            "name": name,
+            "is_dir": e.is_dir,
+            "type": "folder" if e.is_dir else "file",
+            "path": child,
+            "size": e.size,
+            "mtime": e.mtime,
+            "dirty": dirty_map.get(child, False),
+        })
+    return items
+
+def _parse_tree_cursor(cursor: Optional[str]):
+    """Cursor = chave do último item entregue: 'd/<nome>' (pasta) ou 'f/<nome>' (arquivo)."""
+    if not cursor:
+        return None
+    kind, sep, name = cursor.partition("/")
+    if not sep or kind not in ("d", "f") or not name:
+        raise ValueError(cursor)
+    return sort_key(name, kind == "d")
+
 @router.get("/tree")
 def list_dir(
     request: Request,
     path: str = Query("", description="caminho relativo ao workspace"),
+    depth: int = Query(1, ge=1, le=64, description="níveis a expandir (1 = só a pasta)"),
+    recursive: bool = Query(False, description="expande a subárvore inteira (respeita o limite)"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="itens por página (nível superior)"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
     lang: str = None,
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
     lang = lang or get_current_lang()
     p = safe_path(path)
-    if not p.exists():
-        raise HTTPException(404, detail=t(lang, "errors.path_not_found"))
-    if not p.is_dir():
+    rel = "" if p == BASE_DIR else str(p.relative_to(BASE_DIR))
+
+    try:
+        after = _parse_tree_cursor(cursor)
+    except ValueError:
+        raise HTTPException(400, detail=t(lang, "errors.invalid_cursor"))
+
+    # índice em memória (internos já vêm filtrados; ordenação estável em cache)
+    page = workspace_index.page(rel, after=after, limit=limit)
+    if page is None:
+        if not p.exists():
+            raise HTTPException(404, detail=t(lang, "errors.path_not_found"))
         raise HTTPException(400, detail=t(lang, "errors.not_dir"))
+    entries, total, has_more = page
 
+    # dirty map lido uma única vez para a resposta inteira
     dirty_map = temp.load_dirty()
+    items = _tree_items(rel, entries, dirty_map)
+    body = {"base": str(BASE_DIR), "path": path, "items": items}
+    if limit is not None:
+        last = items[-1] if items else None
+        body["total"] = total
+        body["next_cursor"] = (("d/" if last["is_dir"] else "f/") + last["name"]) if (has_more and last) else None
+
+    max_depth = 64 if recursive else depth
+    if max_depth == 1:
+        return body
+
+    # expansão em largura: com o limite atingido, as pastas mais profundas ficam
+    # sem "children" e o cliente volta a carregar sob demanda
+    cap = settings.TREE_MAX_ENTRIES
+    count = len(items)
+    truncated = False
+    queue = deque((it, 2) for it in items if it["is_dir"])
+    while queue:
+        node, level = queue.popleft()
+        sub, sub_total, _more = workspace_index.page(node["path"]) or ([], 0, False)
+        if count + sub_total > cap:
+            truncated = True
+            break
+        node["children"] = _tree_items(node["path"], sub, dirty_map)
+        count += sub_total
+        if level < max_depth:
+            queue.extend((it, level + 1) for it in node["children"] if it["is_dir"])
 
-    items = []
-    for e in sorted(p.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower())):
-        # oculta internos
-        if e.name in EXCLUDE_NAMES:
-            continue
-        items.append({
-            "name": e.name,
-            "is_dir": e.is_dir(),
-            "type": "folder" if e.is_dir() else "file",
-            "path": str(e.relative_to(BASE_DIR)),
-            "dirty": dirty_map.get(str(e.relative_to(BASE_DIR)), False),
-        })
-    return {"base": str(BASE_DIR), "path": path, "items": items}
+    body["count"] = count
+    body["truncated"] = truncated
+    return body
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 @router.get("/file")
 def read_file(
     request: Request,
+    response: Response,
     path: str = Query(...),
     lang: str = None,
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
+    """
+    Conteúdo em JSON com ETag forte (sha256 do conteúdo). Com If-None-Match
+    igual responde 304 sem corpo; Cache-Control: no-cache faz o navegador
+    sempre revalidar em vez de reusar às cegas.
+    """
     lang = lang or get_current_lang()
     f = safe_path(path)
+    if_none_match = request.headers.get("if-none-match")
+    response.headers["Cache-Control"] = "no-cache"
+
+    if not f.exists() and is_excluded_child(f):
+        # backups em blob não existem como arquivo: o caminho é só um nome lógico
+        found = backups.read_backup(str(f.relative_to(BASE_DIR)))
+        if found is not None:
+            data, created = found
+            etag = file_io.etag_of(sha256(data).hexdigest())
+            if file_io.etag_matches(if_none_match, etag, weak=True):
+                return _not_modified(etag)
+            try:
+                text = data.decode("utf-8")
+            except UnicodeDecodeError:
+                raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
+            response.headers["ETag"] = etag
+            return {"path": path, "content": text, "mtime": int(created), "size": len(data), "etag": etag}
     if not f.exists() or not f.is_file():
         raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+
+    st = f.stat()
+    if st.st_size > settings.FILE_INLINE_MAX_BYTES:
+        # grande demais para ir inteiro no JSON: o cliente pagina via /api/file/raw
+        raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+    if if_none_match:
+        # hash em cache por (mtime, tamanho, inode): revalidação não relê o arquivo
+        etag = file_io.etag_of(file_io.content_hash(f, st))
+        if file_io.etag_matches(if_none_match, etag, weak=True):
+            return _not_modified(etag)
+    # binários são recusados pelo prefixo, sem ler o arquivo todo
+    if not file_io.sniff_utf8(f):
+        raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
+    data = f.read_bytes()
     try:
-        text = f.read_text(encoding="utf-8")
+        text = data.decode("utf-8")
     except UnicodeDecodeError:
         raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
 
+    digest = sha256(data).hexdigest()
+    if f.stat() == st:
+        # só guarda se ninguém gravou entre o stat e a leitura
+        file_io.remember_hash(f, st, digest)
+    etag = file_io.etag_of(digest)
+    response.headers["ETag"] = etag
+    return {
+        "path": path,
+        "content": text,
+        "mtime": int(st.st_mtime),
+        "size": st.st_size,
+        "etag": etag,
+    }
+
+def _range_response(request: Request, total: int, media_type: str, headers: Dict[str, str], lang: str,
+                    full, part):
+    """
+    Resposta 200 (full()) ou 206 (part(início, fim)) conforme Range/If-Range.
+    Só um intervalo por requisição; vários intervalos servem o arquivo inteiro.
+    """
+    rng_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range not in (headers.get("etag"), headers.get("last-modified")):
+        rng_header = None  # arquivo mudou desde a primeira parte: manda tudo
+    try:
+        rng = file_io.parse_range(rng_header, total)
+    except ValueError:
+        raise HTTPException(
+            416, detail=t(lang, "errors.range_not_satisfiable"),
+            headers={"Content-Range": f"bytes */{total}"},
+        )
+    if rng is None:
+        return full()
+    start, end = rng
+    headers = {
+        **headers,
+        "content-range": f"bytes {start}-{end}/{total}",
+        "content-length": str(end - start + 1),
+    }
+    return part(start, end, headers)
+
+@router.get("/file/raw")
+def read_file_raw(
+    request: Request,
+    path: str = Query(...),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Bytes do arquivo, sem JSON, com suporte a Range (206). Arquivos grandes são
+    lidos em blocos com pread; o Content-Type vem do sniff do prefixo.
+    """
+    lang = lang or get_current_lang()
+    f = safe_path(path)
+
+    if not f.exists() and is_excluded_child(f):
+        found = backups.read_backup(str(f.relative_to(BASE_DIR)))
+        if found is not None:
+            data, created = found
+            media = "text/plain; charset=utf-8" if file_io.sniff_utf8_bytes(data[:file_io.SNIFF_BYTES]) \
+                else "application/octet-stream"
+            headers = {"accept-ranges": "bytes", "last-modified": formatdate(created, usegmt=True)}
+            return _range_response(
+                request, len(data), media, headers, lang,
+                full=lambda: Response(data, media_type=media, headers=headers),
+                part=lambda s, e, h: Response(data[s:e + 1], status_code=206, media_type=media, headers=h),
+            )
+
+    if not f.exists() or not f.is_file():
+        raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+
+    st = f.stat()
+    media = "text/plain; charset=utf-8" if file_io.sniff_utf8(f) else "application/octet-stream"
+    # mesmos validadores que o FileResponse gera, para If-Range funcionar com ambos
+    headers = {
+        "accept-ranges": "bytes",
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "etag": '"%s"' % md5(f"{st.st_mtime}-{st.st_size}".encode(), usedforsecurity=False).hexdigest(),
+    }
+    return _range_response(
+        request, st.st_size, media, headers, lang,
+        full=lambda: FileResponse(f, media_type=media, stat_result=st, headers={"accept-ranges": "bytes"}),
+        part=lambda s, e, h: StreamingResponse(
+            file_io.iter_range(f, s, e), status_code=206, media_type=media, headers=h
+        ),
+    )
+
+@router.get("/file/window")
+def read_file_window(
+    request: Request,
+    path: str = Query(...),
+    offset: Optional[int] = Query(None, ge=0),
+    length: Optional[int] = Query(None, ge=0),
+    line: Optional[int] = Query(None, ge=1),
+    count: Optional[int] = Query(None, ge=0),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Lê só uma janela do arquivo: bytes (offset/length) ou linhas (line/count).
+    'version' deve voltar em /api/file/splice para detectar edição concorrente.
+    """
+    lang = lang or get_current_lang()
+    f = safe_path(path)
+    if not f.exists() or not f.is_file():
+        raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+    if not file_io.sniff_utf8(f):
+        raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
+
     st = f.stat()
+    max_bytes = settings.FILE_WINDOW_MAX_BYTES
+    total_lines = None
+    if line is not None:
+        start, end, total_lines = file_io.line_range(f, st, line, count if count is not None else 1000)
+    else:
+        start = offset or 0
+        end = start + (length if length is not None else max_bytes)
+        if start > st.st_size:
+            raise HTTPException(416, detail=t(lang, "errors.range_not_satisfiable"))
+    truncated = end - start > max_bytes
+    if truncated:
+        end = start + max_bytes
+
+    data, start, end = file_io.read_window(f, start, end)
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
     return {
         "path": path,
         "content": text,
+        "start": start,
+        "end": end,
+        "line": line,
+        "lines": total_lines,
+        "truncated": truncated,
+        "eof": end >= st.st_size,
+        "size": st.st_size,
         "mtime": int(st.st_mtime),
+        "version": file_io.version_of(st),
+    }
+
+@router.post("/file/splice")
+def splice_file(
+    request: Request,
+    body: SpliceBody,
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Troca um intervalo (bytes ou linhas) por 'content' sem reenviar o arquivo.
+    409 se o arquivo mudou desde a leitura da janela ('version').
+    """
+    lang = lang or get_current_lang()
+    f = safe_path(body.path)
+    if not f.exists() or not f.is_file():
+        raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+
+    data = body.content.encode("utf-8")
+    if len(data) > settings.FILE_WINDOW_MAX_BYTES:
+        raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+
+    # versão conferida e gravação sob o mesmo lock do PUT/PATCH (entre workers)
+    with file_io.write_lock():
+        st = f.stat()
+        if body.version != file_io.version_of(st):
+            raise HTTPException(409, detail=t(lang, "errors.file_changed"))
+
+        if body.line is not None:
+            if body.line < 1 or (body.count or 0) < 0:
+                raise HTTPException(416, detail=t(lang, "errors.range_not_satisfiable"))
+            start, end, _lines = file_io.line_range(f, st, body.line, body.count or 0)
+        else:
+            start, end = body.start, body.end
+            if start is None or end is None or not (0 <= start <= end <= st.st_size):
+                raise HTTPException(416, detail=t(lang, "errors.range_not_satisfiable"))
+        if end - start > settings.FILE_WINDOW_MAX_BYTES:
+            raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+
+        mode = file_io.splice(f, start, end, data)
+        st = f.stat()
+        # hash da nova versão em cache: o próximo If-Match/ETag não relê o arquivo
+        digest = file_io.content_hash(f, st)
+    temp.mark_dirty(body.path, False)
+    workspace_index.touch(str(f.relative_to(BASE_DIR)))
+
+    return {
+        "ok": True,
+        "mode": mode,
+        "start": start,
+        "end": start + len(data),
         "size": st.st_size,
+        "mtime": int(st.st_mtime),
+        "version": file_io.version_of(st),
+        "etag": file_io.etag_of(digest),
     }
 
 @router.post("/file")
@@ -189,30 +485,92 @@ def create_file(
         raise HTTPException(400, detail=t(lang, "errors.parent_not_exists"))
 
     try:
-        f.write_text(body.content or "", encoding="utf-8")
+        atomic.write_text(f, body.content or "", durable=True)
     except Exception as e:
         # handler global converte em JSON genérico
         raise HTTPException(500, detail="errors.internal_error") from e
 
+    workspace_index.touch(str(f.relative_to(BASE_DIR)))
     return {"ok": True, "path": body.path}
 
 @router.put("/file")
 def save_file(
     request: Request,
+    response: Response,
     body: SaveBody,
     lang: str = None,
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
+    """Grava o conteúdo. Com If-Match, recusa (412) se o arquivo mudou desde a leitura."""
     lang = lang or get_current_lang()
     f = safe_path(body.path)
     if not f.parent.exists():
         raise HTTPException(400, detail=t(lang, "errors.parent_not_exists"))
 
-    f.write_text(body.content, encoding="utf-8")
+    if_match = request.headers.get("if-match")
+    data = body.content.encode("utf-8")
+    with file_io.write_lock():
+        if if_match:
+            current = file_io.etag_of(file_io.content_hash(f)) if f.is_file() else None
+            if current is None or not file_io.etag_matches(if_match, current):
+                raise HTTPException(412, detail=t(lang, "errors.file_changed"))
+        atomic.write_bytes(f, data, durable=True)
+        digest = sha256(data).hexdigest()
+        file_io.remember_hash(f, f.stat(), digest)
     temp.mark_dirty(body.path, False)
+    workspace_index.touch(str(f.relative_to(BASE_DIR)))
 
-    return {"ok": True}
+    etag = file_io.etag_of(digest)
+    response.headers["ETag"] = etag
+    return {"ok": True, "etag": etag}
+
+@router.patch("/file")
+def patch_file(
+    request: Request,
+    response: Response,
+    body: PatchBody,
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Salva aplicando um diff unificado e/ou edições sobre a versão do If-Match
+    (obrigatório). 412 se a base mudou e 422 se o patch não se aplica: nos
+    dois casos o cliente volta para o PUT completo.
+    """
+    lang = lang or get_current_lang()
+    f = safe_path(body.path)
+    if not f.exists() or not f.is_file():
+        raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+    if_match = request.headers.get("if-match")
+    if not if_match:
+        raise HTTPException(428, detail=t(lang, "errors.precondition_required"))
+
+    with file_io.write_lock():
+        if f.stat().st_size > settings.FILE_INLINE_MAX_BYTES:
+            raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+        base = f.read_bytes()
+        if not file_io.etag_matches(if_match, file_io.etag_of(sha256(base).hexdigest())):
+            raise HTTPException(412, detail=t(lang, "errors.file_changed"))
+        try:
+            text = base.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
+        try:
+            edits = [e.dict() for e in body.edits] if body.edits is not None else None
+            data = apply_patch(text, body.diff, edits).encode("utf-8")
+        except PatchError:
+            raise HTTPException(422, detail=t(lang, "errors.patch_failed"))
+        atomic.write_bytes(f, data, durable=True)
+        digest = sha256(data).hexdigest()
+        file_io.remember_hash(f, f.stat(), digest)
+    temp.mark_dirty(body.path, False)
+    workspace_index.touch(str(f.relative_to(BASE_DIR)))
+
+    etag = file_io.etag_of(digest)
+    response.headers["ETag"] = etag
+    return {"ok": True, "etag": etag, "size": len(data)}
 
 @router.delete("/file")
 def delete_path(
@@ -236,19 +594,10 @@ def delete_path(
         p.unlink()
         temp.mark_dirty(path, False)
 
-        # 🔑 limpa também do índice de backups
-        idx = load_index()
-        rel_str = str(p.relative_to(BASE_DIR)).lstrip("/")
-        if rel_str in idx:
-            del idx[rel_str]
-            save_index(idx)
-
-        # 🔑 limpa associação de containers
-        containers = load_containers()
-        if rel_str in containers:
-            del containers[rel_str]
-            save_containers(containers)
+        # 🔑 limpa índice de backups (e blobs órfãos), dirty e associação de containers
+        backups.forget_file(str(p.relative_to(BASE_DIR)).lstrip("/"))
 
+    workspace_index.touch(str(p.relative_to(BASE_DIR)))
     return {"ok": True}
 
 # =========================================================
@@ -260,28 +609,84 @@ def search_files(
     request: Request,
     q: str = Query(..., min_length=1),
     root: str = "",
+    fuzzy: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     lang: str = None,
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
     lang = lang or get_current_lang()
     base = safe_path(root)
-    if not base.exists() or not base.is_dir():
+    if not base.exists() or not base.is_dir() or is_excluded_child(base):
         raise HTTPException(404, detail=t(lang, "errors.not_dir"))
+    root_rel = "" if base == BASE_DIR else str(base.relative_to(BASE_DIR))
+
+    # cursor opaco = deslocamento na lista ranqueada
+    try:
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(400, detail=t(lang, "errors.invalid_cursor"))
+
+    if workspace_index.ready:
+        hits, total = search_index.search(q, root_rel, fuzzy=fuzzy, offset=offset, limit=limit)
+    else:
+        # índice ainda montando: varredura simples por nome
+        needle = q.lower()
+        found = [(rel, is_dir) for rel, name, is_dir in workspace_index.walk(root_rel)
+                 if needle in name.lower()]
+        hits, total = found[offset:offset + limit], len(found)
 
-    matches = []
     dirty_map = temp.load_dirty()
-    for p in base.rglob("*"):
-        if is_excluded_child(p):
-            continue
-        if q.lower() in p.name.lower():
-            matches.append({
-                "path": str(p.relative_to(BASE_DIR)),
-                "is_dir": p.is_dir(),
-                "name": p.name,
-                "dirty": dirty_map.get(str(p.relative_to(BASE_DIR)), False),
-            })
-    return {"items": matches}
+    matches = [{
+        "path": rel,
+        "is_dir": is_dir,
+        "name": rel.rsplit("/", 1)[-1],
+        "dirty": dirty_map.get(rel, False),
+    } for rel, is_dir in hits]
+
+    nxt = offset + len(matches)
+    return {
+        "items": matches,
+        "total": total,
+        "next_cursor": str(nxt) if nxt < total else None,
+    }
+
+@router.get("/search/content")
+def search_content(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    root: str = "",
+    regex: bool = False,
+    case: bool = False,
+    max_per_file: int = Query(20, ge=1, le=1000),
+    max_files: int = Query(1000, ge=1, le=100000),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    lang = lang or get_current_lang()
+    base = safe_path(root)
+    if not base.exists() or not base.is_dir() or is_excluded_child(base):
+        raise HTTPException(404, detail=t(lang, "errors.not_dir"))
+    root_rel = "" if base == BASE_DIR else str(base.relative_to(BASE_DIR))
+
+    try:
+        pattern = content_search.compile_pattern(q, regex=regex, case=case)
+    except re.error:
+        raise HTTPException(400, detail=t(lang, "errors.invalid_regex"))
+
+    # arquivos vêm do índice (internos/EXCLUDE_NAMES já podados)
+    files = ((rel, BASE_DIR / rel) for rel, _name, is_dir in workspace_index.walk(root_rel) if not is_dir)
+
+    # NDJSON: primeiras ocorrências chegam antes do fim da varredura
+    return StreamingResponse(
+        content_search.stream_search(files, pattern, max_per_file=max_per_file, max_files=max_files),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
 
 # =========================================================
 # Backups
@@ -301,30 +706,20 @@ def backup_file(
     if not f.exists() or not f.is_file():
         raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
 
-    backup_root = BASE_DIR / ".backups"
-    backup_root.mkdir(parents=True, exist_ok=True)
-
+    # nome lógico no mesmo formato de antes; o conteúdo vai para o blob store
     rel_path = f.relative_to(BASE_DIR)
-    file_dir = backup_root / rel_path.parent / rel_path.stem
-    file_dir.mkdir(parents=True, exist_ok=True)
+    file_dir = Path(".backups") / rel_path.parent / rel_path.stem
 
     now = datetime.now(settings.TZ)
     ts_date = now.strftime("%Y-%m-%d")
     ts_time = now.strftime("%H-%M-%S")
     backup_name = f"backup---{f.stem}---{ts_date}---{ts_time}{f.suffix}"
-    backup_file = file_dir / backup_name
-
-    shutil.copy2(f, backup_file)
+    backup_rel = str(file_dir / backup_name)
 
-    # 🔑 atualizar índice
-    idx = load_index()
-    rel_str = str(rel_path).lstrip("/")
-    entry = idx.get(rel_str, [])
-    entry.append(str(backup_file.relative_to(BASE_DIR)))
-    idx[rel_str] = entry
-    save_index(idx)
+    # 🔑 blob deduplicado + índice
+    backups.create_backup(str(rel_path).lstrip("/"), backup_rel, f)
 
-    return {"ok": True, "backup": str(backup_file.relative_to(BASE_DIR))}
+    return {"ok": True, "backup": backup_rel}
 
 @router.get("/backups")
 def list_backups(
@@ -339,14 +734,45 @@ def list_backups(
     f = safe_path(path)
     rel_str = str(f.relative_to(BASE_DIR)).lstrip("/")
 
-    idx = load_index()
     items = []
-    for p in idx.get(rel_str, []):
-        full = BASE_DIR / p
-        if full.exists():
+    for p, blob in state.list_backups(rel_str):
+        # blob: o índice é a fonte da verdade; cópias antigas: confere o arquivo
+        if blob or (BASE_DIR / p).exists():
             items.append({"name": Path(p).name, "path": p})
     return {"items": items}
 
+def _retention_policy(policy: Optional[str], lang: str) -> Dict[str, int]:
+    try:
+        return retention.parse_policy(policy or settings.BACKUP_RETENTION)
+    except ValueError:
+        raise HTTPException(400, detail=t(lang, "errors.invalid_retention_policy"))
+
+@router.get("/backups/retention")
+def retention_preview(
+    request: Request,
+    policy: Optional[str] = Query(None),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """Dry-run: o que a política (BACKUP_RETENTION ou ?policy=) removeria e quantos bytes liberaria."""
+    lang = lang or get_current_lang()
+    rules = _retention_policy(policy, lang)
+    return {"ok": True, **retention.sweep(rules, dry_run=True)}
+
+@router.post("/backups/retention")
+def retention_run(
+    request: Request,
+    policy: Optional[str] = Query(None),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """Executa uma varredura agora (um lote de BACKUP_RETENTION_BATCH)."""
+    lang = lang or get_current_lang()
+    rules = _retention_policy(policy, lang)
+    return {"ok": True, **retention.sweep(rules)}
+
 @router.post("/backup/restore")
 def restore_backup(
     request: Request,
@@ -363,10 +789,13 @@ def restore_backup(
 
     if not f.exists() or not f.is_file():
         raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
-    if not b.exists() or not b.is_file():
-        raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
 
-    shutil.copy2(b, f)
+    if not backups.restore_backup(str(b.relative_to(BASE_DIR)), f):
+        # backup antigo (cópia física)
+        if not b.exists() or not b.is_file():
+            raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+        atomic.write_bytes(f, b.read_bytes(), durable=True)
+    workspace_index.touch(str(f.relative_to(BASE_DIR)))
     return {"ok": True}
 
 @router.delete("/backup")
@@ -380,20 +809,20 @@ def delete_backup(
     lang = lang or get_current_lang()
 
     b = safe_path(backup)
+    b_rel = str(b.relative_to(BASE_DIR))
+
+    # 🔑 backup em blob: remove do índice (e o blob, se ninguém mais usa)
+    if backups.delete_backup(b_rel):
+        return {"ok": True}
+
+    # backup antigo (cópia física)
     if not b.exists() or not b.is_file():
         raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
 
     b.unlink()
 
     # 🔑 remove do índice
-    idx = load_index()
-    for k, v in list(idx.items()):
-        if backup in v:
-            idx[k] = [x for x in v if x != backup]
-            if not idx[k]:
-                del idx[k]
-            save_index(idx)
-            break
+    state.remove_backup(b_rel)
 
     return {"ok": True}
 
@@ -420,9 +849,6 @@ def move_path(
     if dst.exists():
         raise HTTPException(409, detail=t(lang, "errors.path_already_exists"))
 
-    src_is_file = src.is_file()
-    src_is_dir = src.is_dir()
-
     dst.parent.mkdir(parents=True, exist_ok=True)
 
     try:
@@ -430,16 +856,12 @@ def move_path(
     except Exception as e:
         raise HTTPException(400, detail=f"{t(lang, 'errors.rename_failed')}: {e}")
 
-    # atualizar mapa dirty
-    dirty_map = temp.load_dirty()
-    if body.src in dirty_map:
-        dirty_map[body.dst] = dirty_map.pop(body.src)
-        temp.save_dirty(dirty_map)
-
     # atualizar temp
     src_rel = str(src.relative_to(BASE_DIR)).lstrip("/")
     dst_rel = str(dst.relative_to(BASE_DIR)).lstrip("/")
-    
+    # rascunhos pendentes e mapa dirty vão para o disco/banco antes de mover
+    temp.drafts.release(src_rel)
+
     tmp_dir = Path(settings.TEMP_DIR)
     old_tmp = tmp_dir / src_rel
     new_tmp = tmp_dir / dst_rel
@@ -450,27 +872,12 @@ def move_path(
         except Exception as e:
             logger.warning("Falha ao mover arquivo temporário %s -> %s: %s", old_tmp, new_tmp, e)
 
-    # 🔑 atualizar índice de backups
-    idx = load_index()
-    src_rel = str(src.relative_to(BASE_DIR)).lstrip("/")
-    dst_rel = str(dst.relative_to(BASE_DIR)).lstrip("/")
+    # 🔑 atualizar índice de backups, mapa dirty e associações de containers
+    # (arquivo ou tudo sob a pasta, numa única transação)
+    state.move_prefix(src_rel, dst_rel)
 
-    if src_is_file:
-        if src_rel in idx:
-            idx[dst_rel] = idx.pop(src_rel)
-    elif src_is_dir:
-        keys_to_update = [key for key in list(idx.keys()) if key == src_rel or key.startswith(src_rel + "/")]
-        updates = {}
-        for key in keys_to_update:
-            new_key = key.replace(src_rel, dst_rel, 1)
-            updates[new_key] = idx[key]
-        for key in keys_to_update:
-            del idx[key]
-        idx.update(updates)
-    save_index(idx)
-
-    # 🔑 atualizar associações de containers
-    update_containers_on_move(src_rel, dst_rel, is_dir=src_is_dir)
+    workspace_index.touch(src_rel)
+    workspace_index.touch(dst_rel)
 
     return {
         "ok": True,
@@ -478,10 +885,109 @@ def move_path(
         "dst": str(dst.relative_to(BASE_DIR)),
     }
 
+# =========================================================
+# Diff
+# =========================================================
+
+def _diff_source(side: DiffSide, lang: str) -> bytes:
+    """Conteúdo de um lado do diff (sempre texto UTF-8, até DIFF_MAX_BYTES)."""
+    kind = (side.kind or "").lower()
+    limit = settings.DIFF_MAX_BYTES
+    if kind == "text":
+        data = (side.text or "").encode("utf-8")
+    elif kind not in ("file", "backup", "draft"):
+        raise HTTPException(400, detail=t(lang, "errors.invalid_diff_source"))
+    elif not side.path:
+        raise HTTPException(400, detail=t(lang, "errors.missing_path"))
+    elif kind == "draft":
+        found = temp.drafts.get(temp.draft_key(temp.safe_tmp(side.path)))
+        if found is None:
+            raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+        data = found[0]
+    else:
+        f = safe_path(side.path)
+        found = None
+        if kind == "backup" and not f.exists() and is_excluded_child(f):
+            found = backups.read_backup(str(f.relative_to(BASE_DIR)))
+        if found is not None:
+            data = found[0]
+        else:
+            if not f.is_file():
+                raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+            if f.stat().st_size > limit:
+                raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+            data = f.read_bytes()
+    if len(data) > limit:
+        raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+    if not file_io.sniff_utf8_bytes(data[:file_io.SNIFF_BYTES]):
+        raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
+    return data
+
+@router.post("/diff")
+def diff_sources(
+    body: DiffBody,
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Diff por linhas entre dois conteúdos (arquivo, backup, rascunho ou texto
+    enviado). Resposta paginada por hunk: 'limit' hunks por página, 'cursor'
+    = next_cursor da página anterior. O cálculo fica em cache pelo par de
+    hashes, então as páginas seguintes só remontam as linhas.
+    """
+    lang = lang or get_current_lang()
+    try:
+        offset = int(body.cursor) if body.cursor else 0
+        if offset < 0:
+            raise ValueError(body.cursor)
+    except ValueError:
+        raise HTTPException(400, detail=t(lang, "errors.invalid_cursor"))
+    limit = max(1, min(body.limit, 500))
+    context = max(0, min(body.context, 100))
+
+    sides = []
+    for side in (body.left, body.right):
+        data = _diff_source(side, lang)
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(415, detail=t(lang, "errors.not_utf8"))
+        sides.append((sha256(data).hexdigest(), text_diff.split_lines(text)))
+    (a_hash, a_lines), (b_hash, b_lines) = sides
+
+    groups, stats, cached = text_diff.compute(a_hash, b_hash, a_lines, b_lines, context)
+    page = groups[offset:offset + limit]
+    nxt = offset + len(page)
+    return {
+        "left": {"kind": body.left.kind, "path": body.left.path, "etag": file_io.etag_of(a_hash)},
+        "right": {"kind": body.right.kind, "path": body.right.path, "etag": file_io.etag_of(b_hash)},
+        "stats": {**stats, "cached": cached},
+        "hunks": text_diff.render(page, a_lines, b_lines),
+        "next_cursor": str(nxt) if nxt < len(groups) else None,
+    }
+
 # =========================================================
 # Validação
 # =========================================================
 
+def _validation_message(lang: str, result: dict) -> str:
+    errors = result.get("errors") or []
+    first = errors[0] if errors else {"message": "", "line": None, "column": None}
+    where = ""
+    if first["line"]:
+        where = f"line {first['line']}" + (f", column {first['column']}" if first["column"] else "") + ": "
+    if result["key"] == "validate.error":
+        return t(lang, "validate.error").format(error=where + first["message"])
+    if result["key"] in ("validate.schema_error", "validate.schema_invalid"):
+        return t(lang, result["key"]).format(schema=result.get("schema"), error=where + first["message"])
+    if result["key"] in ("validate.schema_ok", "validate.schema_unavailable"):
+        return t(lang, result["key"]).format(schema=result.get("schema"))
+    if result["key"] == "validate.timeout":
+        seconds = settings.VALIDATE_STREAM_TIMEOUT if result.get("streamed") else settings.VALIDATE_TIMEOUT
+        return t(lang, "validate.timeout").format(seconds=seconds)
+    return t(lang, result["key"])
+
 @router.post("/validate")
 def validate_file(
     body: SaveBody,
@@ -489,77 +995,139 @@ def validate_file(
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
+    """
+    Valida o conteúdo pelo registro de validadores (processo isolado, com prazo
+    e cache por extensão + hash). 'errors' traz linha/coluna quando o parser informa.
+    Com JSON Schema associado ao caminho, o documento também é checado contra ele.
+    """
     lang = lang or get_current_lang()
 
-    path = body.path
     content = body.content or ""
-    ext = Path(path).suffix.lower()
+    ext = Path(body.path).suffix.lower()
+    result = validators.validate(ext, content, Path(body.path).name, schemas.resolve(body.path))
 
-    try:
-        if ext in [".yaml", ".yml"]:
-            import yaml
-            yaml.safe_load(content)
-            return {"success": True, "message": t(lang, "validate.yaml_ok")}
-
-        elif ext == ".json":
-            import json as _json
-            _json.loads(content)
-            return {"success": True, "message": t(lang, "validate.json_ok")}
-
-        elif ext == ".xml":
-            import xml.etree.ElementTree as ET
-            ET.fromstring(content)
-            return {"success": True, "message": t(lang, "validate.xml_ok")}
-
-        elif ext == ".html":
-            from html.parser import HTMLParser
-            parser = HTMLParser()
-            parser.feed(content)
-            return {"success": True, "message": t(lang, "validate.html_ok")}
-
-        elif ext == ".py":
-            compile(content, path, "exec")
-            return {"success": True, "message": t(lang, "validate.python_ok")}
-
-        elif ext == ".ini":
-            import configparser
-            parser = configparser.ConfigParser()
-            parser.read_string(content)
-            return {"success": True, "message": t(lang, "validate.ini_ok")}
-
-        elif ext == ".css":
-            if not content.strip():
-                return {"success": False, "message": t(lang, "validate.empty")}
-            return {"success": True, "message": t(lang, "validate.css_ok")}
-
-        elif ext == ".toml":
-            try:
-                import tomllib
-                tomllib.loads(content)
-            except ModuleNotFoundError:
-                import toml
-                toml.loads(content)
-            return {"success": True, "message": t(lang, "validate.toml_ok")}
-
-        elif ext == ".md":
-            if not content.strip():
-                return {"success": False, "message": t(lang, "validate.empty")}
-            return {"success": True, "message": t(lang, "validate.md_ok")}
-
-        elif ext == ".csv":
-            import csv, io
-            reader = csv.reader(io.StringIO(content))
-            for row in reader:
-                _ = [cell for cell in row]
-            return {"success": True, "message": t(lang, "validate.csv_ok")}
+    return {
+        "success": result["success"],
+        "message": _validation_message(lang, result),
+        "errors": result["errors"],
+        "cached": result["cached"],
+        "timed_out": result["timed_out"],
+        "schema": result.get("schema"),
+    }
 
-        else:
-            if not content.strip():
-                return {"success": False, "message": t(lang, "validate.empty")}
-            return {"success": False, "message": t(lang, "validate.not_supported")}
+@router.post("/validate/file")
+def validate_path(
+    path: str = Query(...),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Valida o arquivo como está no disco, sem upload do conteúdo. Acima de
+    VALIDATE_STREAM_BYTES usa o parser incremental da extensão (XML, CSV,
+    YAML, JSON com ijson), então arquivos de centenas de MB são validados com
+    memória limitada. Sem parser incremental vale o limite FILE_INLINE_MAX_BYTES.
+    """
+    lang = lang or get_current_lang()
+    f = safe_path(path)
+    if not f.exists() or not f.is_file() or is_excluded_child(f):
+        raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+    ext = f.suffix.lower()
+    if not validator_supported(ext):
+        return {"success": False, "message": t(lang, "validate.not_supported"), "errors": [],
+                "cached": False, "timed_out": False, "streamed": False}
 
-    except Exception as e:
-        return {"success": False, "message": t(lang, "validate.error").format(error=str(e))}
+    st = f.stat()
+    if not validator_fits(ext, st.st_size):
+        raise HTTPException(413, detail=t(lang, "errors.file_too_large"))
+    rel = str(f.relative_to(BASE_DIR))
+    result = validators.validate_path(ext, str(f), file_io.content_hash(f, st), st.st_size, schemas.resolve(rel))
+
+    return {
+        "success": result["success"],
+        "message": _validation_message(lang, result),
+        "errors": result["errors"],
+        "cached": result["cached"],
+        "timed_out": result["timed_out"],
+        "streamed": result["streamed"],
+        "schema": result.get("schema"),
+    }
+
+@router.get("/file/schema")
+def get_file_schema(
+    path: str = Query(...),
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """Schema aplicável ao arquivo e de onde veio ("file", "glob" ou "env")."""
+    schema, source = schemas.association(path)
+    return {"path": path, "schema": schema, "source": source}
+
+@router.put("/file/schema")
+def put_file_schema(
+    body: SchemaAssocBody,
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """Associa um JSON Schema a um arquivo ou glob (salvo no banco de estado)."""
+    lang = lang or get_current_lang()
+    pattern = body.path.strip().strip("/")
+    if not pattern:
+        raise HTTPException(400, detail=t(lang, "errors.missing_path"))
+    if not schemas.is_glob(pattern):
+        f = safe_path(pattern)
+        if not f.exists() or not f.is_file():
+            raise HTTPException(404, detail=t(lang, "errors.file_not_found"))
+    schema_file = safe_path(body.schema_path)
+    if not schema_file.exists() or not schema_file.is_file():
+        raise HTTPException(404, detail=t(lang, "errors.schema_not_found"))
+    state.set_schema(pattern, str(schema_file.relative_to(BASE_DIR)))
+    return {"ok": True}
+
+@router.delete("/file/schema")
+def delete_file_schema(
+    path: str = Query(...),
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    state.delete_schema(path.strip().strip("/"))
+    return {"ok": True}
+
+@router.get("/schemas/map")
+def get_schemas_map(
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """Associações salvas ("map") e as fixas de VALIDATE_SCHEMAS ("static")."""
+    return {"map": state.schemas_map(), "static": dict(getattr(settings, "VALIDATE_SCHEMAS", {}))}
+
+@router.post("/validate/tree")
+def validate_tree(
+    path: str = Query("", description="pasta (vazio = workspace inteiro)"),
+    force: bool = Query(False, description="revalida mesmo os arquivos inalterados"),
+    lang: str = None,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """
+    Valida em lote todos os arquivos com validador sob 'path', em paralelo e
+    direto do disco. NDJSON: uma linha por arquivo e um resumo no fim.
+    Arquivos inalterados desde a última execução (mtime/tamanho/hash) não
+    são revalidados; o último resultado e o último válido ficam no banco.
+    """
+    lang = lang or get_current_lang()
+    base = safe_path(path)
+    if not base.exists() or not base.is_dir() or is_excluded_child(base):
+        raise HTTPException(404, detail=t(lang, "errors.not_dir"))
+    root_rel = "" if base == BASE_DIR else str(base.relative_to(BASE_DIR))
+
+    files = ((rel, BASE_DIR / rel) for rel, _name, is_dir in workspace_index.walk(root_rel) if not is_dir)
+    return StreamingResponse(
+        bulk_validate.stream_validate(root_rel, files, lambda r: _validation_message(lang, r), force=force),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/mkdir")
 def mkdir(
@@ -583,4 +1151,5 @@ def mkdir(
     except Exception as e:
         raise HTTPException(500, detail="errors.internal_error") from e
 
+    workspace_index.touch(str(d.relative_to(BASE_DIR)))
     return {"ok": True}
@@ -1,16 +1,22 @@
 # backend/routes/health.py
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
 from pathlib import Path
 from typing import Dict, List
-import json, logging, os
+import logging, os
 from datetime import datetime, timezone
 
-try:
-    import docker
-except Exception:
-    docker = None
-
 from ..config import settings
+from ..core.workspace_index import workspace_index
+from ..core.search_index import search_index
+from ..core.retention import retention
+from ..core.atomic import atomic
+from ..core.drafts import drafts
+from ..core.validators import validators
+from ..core.docker_client import docker_client
+from ..core.container_state import container_states
+from ..core.docker_jobs import docker_jobs
+from ..core.container_health import container_health, docker_enabled, load_dynamic
 from .deps import require_user, browser_blocker
 
 logger = logging.getLogger(__name__)
@@ -18,32 +24,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["health"])
 
 BASE_DIR = Path(getattr(settings, "DATA_DIR", "meus_arquivos")).resolve()
-STORE_PATH = BASE_DIR / ".file_containers.json"
-
-def _load_dynamic() -> dict[str, str]:
-    try:
-        if STORE_PATH.exists():
-            return json.loads(STORE_PATH.read_text(encoding="utf-8") or "{}")
-    except Exception as e:
-        logger.warning("Failed to read %s: %s", STORE_PATH, e)
-    return {}
-
-def _get_docker_client(timeout=3):
-    # Permite desativar checagens de Docker via env
-    if os.environ.get("DISABLE_DOCKER_CHECKS", "").lower() in ("1","true","yes","on"):
-        return None
-    if not docker:
-        return None
-    try:
-        client = docker.from_env()
-        try:
-            client.api.timeout = getattr(settings, "DOCKER_TIMEOUT", timeout)
-        except Exception:
-            pass
-        return client
-    except Exception as e:
-        logger.warning("Docker client unavailable: %s", e)
-        return None
 
 @router.get("/health")
 def health_check(
@@ -52,7 +32,7 @@ def health_check(
 ):
     # 1) une estático (.env/settings) + dinâmico (arquivo no workspace)
     static_map: Dict[str, str] = dict(getattr(settings, "FILE_CONTAINERS", {}))
-    dynamic_map: Dict[str, str] = _load_dynamic()
+    dynamic_map: Dict[str, str] = load_dynamic()
     merged: Dict[str, str] = {**static_map, **dynamic_map}
 
     # 2) reorganiza em container -> [files]
@@ -68,41 +48,33 @@ def health_check(
     temp_ok = Path(settings.TEMP_DIR).exists()
     data_ok = BASE_DIR.exists()
 
-    # 4) docker
+    # 4) docker: snapshot do refresh em segundo plano, se ativo; senão sweep com prazo
     docker_info = {"available": False}
     containers: Dict[str, dict] = {}
-    
-    client = _get_docker_client()
-    if client:
-        docker_info["available"] = True
-        for cname, files in container_files.items():
-            ok = False
-            status = None
-            health = None
-            try:
-                c = client.containers.get(cname)
-                st = (getattr(c, "attrs", {}) or {}).get("State") or {}
-                status = st.get("Status")
-                health = (st.get("Health") or {}).get("Status")
-                ok = (status == "running") and (health in (None, "healthy"))
-            except Exception as e:
-                logger.debug("Container inspect failed (%s): %s", cname, e)
-                ok = False
-            containers[cname] = {
-                "ok": ok,
-                "files": sorted(files),
-                "status": status,
-                "health": health,
-            }
+
+    snap = container_health.snapshot()
+    if snap is not None:
+        available, states = snap["available"], dict(snap["containers"])
+        docker_info["snapshot_age"] = snap["age"]
+        missing = [c for c in container_files if c not in states]
+        if available and missing:
+            # associação nova desde o último refresh
+            states.update(container_health.sweep(missing))
     else:
+        available = docker_enabled()
+        states = container_health.sweep(container_files) if available else {}
+        docker_info["snapshot_age"] = None
+
+    docker_info["available"] = available
+    for cname, files in container_files.items():
         # docker indisponível: ainda retornamos files mapeados
-        for cname, files in container_files.items():
-            containers[cname] = {
-                "ok": False,
-                "files": sorted(files),
-                "status": None,
-                "health": None,
-            }
+        entry = states.get(cname) or {"ok": False, "status": None, "health": None, "timed_out": False}
+        containers[cname] = {**entry, "files": sorted(files)}
+
+    docker_info["client"] = docker_client.stats()
+    docker_info["events"] = container_states.stats()
+    docker_info["jobs"] = docker_jobs.stats()
+    docker_info["sweep"] = container_health.stats()
 
     return {
         "ok": True,
@@ -115,6 +87,12 @@ def health_check(
             "static_count": len(static_map),
             "dynamic_count": len(dynamic_map),
         },
+        "index": workspace_index.stats(),
+        "search_index": search_index.stats(),
+        "backup_retention": retention.last_report,
+        "writes": atomic.stats(),
+        "drafts": drafts.stats(),
+        "validators": validators.stats(),
     }
 
 @router.get("/healthz", include_in_schema=False)
@@ -128,41 +106,30 @@ def readyz():
     temp_ok = Path(settings.TEMP_DIR).exists()
 
     # Mapeamentos (arquivos associados)
-    dynamic_map = _load_dynamic()
+    dynamic_map = load_dynamic()
     static_map = dict(getattr(settings, "FILE_CONTAINERS", {}))
     merged = {**static_map, **dynamic_map}
 
-    # Docker opcional (se disponível e não desabilitado)
-    docker_ok = True
+    # Docker opcional (se disponível e não desabilitado): circuito aberto = daemon falhando
+    docker_ok = not docker_client.stats()["circuit_open"]
     containers_summary = {}
-    client = _get_docker_client()
-    if client:
-        try:
-            client.ping()
-        except Exception:
-            docker_ok = False
-
-        if docker_ok and merged:
-            for cname in sorted(set(merged.values())):
-                status = None
-                health = None
-                running_ok = False
-                try:
-                    c = client.containers.get(cname)
-                    st = (getattr(c, "attrs", {}) or {}).get("State") or {}
-                    status = st.get("Status")
-                    health = (st.get("Health") or {}).get("Status")
-                    running_ok = (status == "running") and (health in (None, "healthy"))
-                except Exception:
-                    running_ok = False
-                containers_summary[cname] = {
-                    "status": status,
-                    "health": health,
-                    "ok": running_ok,
-                }
-
-    # Política de “pronto”: diretórios OK + (se docker disponível) ping OK
-    all_ok = data_ok and temp_ok and (docker_ok is True)
+    if merged:
+        snap = container_health.snapshot()
+        if snap is not None:
+            states = snap["containers"] if snap["available"] else {}
+        else:
+            states = container_health.sweep(set(merged.values())) if docker_enabled() else {}
+        for cname in sorted(set(merged.values()) & set(states)):
+            e = states[cname]
+            containers_summary[cname] = {
+                "status": e["status"],
+                "health": e["health"],
+                "ok": e["ok"],
+                "timed_out": e["timed_out"],
+            }
+
+    # Política de “pronto”: diretórios OK (daemon inacessível = Docker indisponível, não bloqueia)
+    all_ok = data_ok and temp_ok
 
     body = {
         "ok": all_ok,
@@ -172,4 +139,4 @@ def readyz():
         "containers": containers_summary,
     }
     # 200 se pronto, 503 se não
-    return (body, 200) if all_ok else (body, 503)
\ No newline at end of file
+    return JSONResponse(body, status_code=200 if all_ok else 503)
\ No newline at end of file
@@ -7,6 +7,7 @@ from pydantic import BaseModel
 from ..core.templates import render_template
 from ..core.context import get_current_user
 from ..config import settings
+from ..core.atomic import atomic
 
 router = APIRouter()
 
@@ -70,8 +71,7 @@ async def set_language(data: UserLang, accept: str = Header(default="*/*")):
         raise HTTPException(400, detail="errors.lang_not_supported")
 
     lang_data = {"language": data.language}
-    with LANG_FILE.open("w", encoding="utf-8") as f:
-        json.dump(lang_data, f, indent=2, ensure_ascii=False)
+    atomic.write_json(LANG_FILE, lang_data, durable=True)
     return {"ok": True}
 
 @router.get("/editor")
@@ -10,6 +10,7 @@ from .deps import require_user
 from ..core.totp import verify_totp
 from ..i18n import t
 from ..config import settings
+from ..core.atomic import atomic
 
 USER_FILE = settings.USER_FILE
 
@@ -80,8 +81,7 @@ async def change_username_submit(
 
     # salvar novo usuário
     data["username"] = username
-    with USER_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    atomic.write_json(USER_FILE, data, durable=True)
 
     # atualiza sessão
     request.session["username"] = username
@@ -146,8 +146,7 @@ async def change_password_submit(
     # salvar hash novo
     new_hash = bcrypt.hash(new_password)
     data["password"] = new_hash
-    with USER_FILE.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    atomic.write_json(USER_FILE, data, durable=True)
 
     return JSONResponse({"ok": True, "msg": t(lang, "flash.pass_changed_success")})
 
@@ -208,8 +207,7 @@ async def totp_manage_post(
 
         # Ativa 2FA
         data["totp_secret"] = preview_secret
-        with USER_FILE.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        atomic.write_json(USER_FILE, data, durable=True)
         request.session.pop("enable_secret", None)
         return JSONResponse({"ok": True, "msg": t(lang, "flash.2fa_enabled_success")})
 
@@ -222,8 +220,7 @@ async def totp_manage_post(
             return JSONResponse({"error": t(lang, "flash.2fa_invalid")}, status_code=400)
 
         data.pop("totp_secret", None)
-        with USER_FILE.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        atomic.write_json(USER_FILE, data, durable=True)
         return JSONResponse({"ok": True, "msg": t(lang, "flash.2fa_disabled")})
 
     return JSONResponse({"error": t(lang, "flash.invalid_action")}, status_code=400)
@@ -1,11 +1,15 @@
 # backend/routes/temp.py
 from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List
 import os
-import json
 
 from ..config import settings
+from ..core import file_io
+from ..core.drafts import drafts
+from ..core.text_patch import apply_patch, PatchError
 from .deps import require_user, browser_blocker
 
 # Mantém as mesmas URLs finais (/api/temp, /api/dirty)
@@ -15,7 +19,6 @@ router = APIRouter(prefix="/api", tags=["temp"])
 os.makedirs(settings.TEMP_DIR, exist_ok=True)
 
 TEMP_ROOT = Path(settings.TEMP_DIR).resolve()
-DIRTY_FILE = TEMP_ROOT / ".dirty.json"
 
 # ------------------------
 # Helpers
@@ -27,25 +30,28 @@ def safe_tmp(rel: str) -> Path:
         raise HTTPException(400, detail="errors.path_outside_workspace")
     return p
 
-def load_dirty() -> dict:
-    if DIRTY_FILE.exists():
-        try:
-            return json.loads(DIRTY_FILE.read_text(encoding="utf-8") or "{}")
-        except Exception:
-            return {}
-    return {}
+class DraftEditOp(BaseModel):
+    start_line: int
+    start_col: int
+    end_line: int
+    end_col: int
+    text: str = ""
+
+class DraftPatchBody(BaseModel):
+    path: str
+    diff: Optional[str] = None
+    edits: Optional[List[DraftEditOp]] = None
 
-def save_dirty(data: dict):
-    DIRTY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    DIRTY_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+def draft_key(temp_path: Path) -> str:
+    return str(temp_path.relative_to(TEMP_ROOT))
+
+def load_dirty() -> dict:
+    # banco + mudanças ainda no buffer de rascunhos deste worker
+    return drafts.dirty_map()
 
 def mark_dirty(path: str, is_dirty: bool):
-    data = load_dirty()
-    if is_dirty:
-        data[path] = True
-    else:
-        data.pop(path, None)
-    save_dirty(data)
+    # mesma chave do drafts.put ("/a.yml", "./a.yml" → "a.yml"); aplicado em lote pelo flusher
+    drafts.mark(draft_key(safe_tmp(path)), is_dirty)
 
 # ------------------------
 # Rotas
@@ -70,59 +76,93 @@ async def save_temp(
     if not path:
         raise HTTPException(400, detail="errors.missing_path")
 
+    # corpo lido no event loop; o stat do rascunho vai para o threadpool
+    return await run_in_threadpool(_save_temp, path, content or "")
+
+def _save_temp(path: str, content: str) -> dict:
     temp_path = safe_tmp(path)
 
     # se já existe uma pasta nesse caminho, não pode salvar como arquivo
     if temp_path.exists() and temp_path.is_dir():
         raise HTTPException(400, detail="errors.path_is_directory")
 
-    temp_path.parent.mkdir(parents=True, exist_ok=True)
-    temp_path.write_text(content or "", encoding="utf-8")
+    # autosave: só memória; o flusher grava no disco e marca dirty em lote
+    key = draft_key(temp_path)
+    etag = drafts.put(key, content.encode("utf-8"))
+    return {"ok": True, "path": key, "etag": etag}
 
-    # marca como dirty
-    mark_dirty(path, True)
-    return {"ok": True, "path": str(temp_path.relative_to(TEMP_ROOT))}
+@router.patch("/temp")
+def patch_temp(
+    request: Request,
+    body: DraftPatchBody,
+    user=Depends(require_user),
+    _: str = Depends(browser_blocker),
+):
+    """Autosave incremental do rascunho; 412/422 → o cliente reenvia com PUT completo."""
+    temp_path = safe_tmp(body.path)
+    key = draft_key(temp_path)
+    if_match = request.headers.get("if-match")
+    if not if_match:
+        raise HTTPException(428, detail="errors.precondition_required")
+
+    # check-and-write serializado entre workers; get() confere o buffer contra o disco
+    with file_io.write_lock():
+        current = drafts.get(key)
+        if current is None:
+            raise HTTPException(404, detail="errors.file_not_found")
+        base, etag = current
+        if not file_io.etag_matches(if_match, etag):
+            raise HTTPException(412, detail="errors.file_changed")
+        try:
+            edits = [e.dict() for e in body.edits] if body.edits is not None else None
+            data = apply_patch(base.decode("utf-8"), body.diff, edits).encode("utf-8")
+        except (PatchError, UnicodeDecodeError):
+            raise HTTPException(422, detail="errors.patch_failed")
+        etag = drafts.put(key, data)
+    return {"ok": True, "path": key, "etag": etag}
 
 @router.get("/temp")
-async def get_temp(
+def get_temp(
     path: str = Query(...),
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
     temp_path = safe_tmp(path)
 
-    if temp_path.exists() and temp_path.is_file():
-        return {"exists": True, "content": temp_path.read_text(encoding="utf-8")}
+    current = drafts.get(draft_key(temp_path)) if not temp_path.is_dir() else None
+    if current is not None:
+        data, etag = current
+        return {"exists": True, "content": data.decode("utf-8"), "etag": etag}
 
     # se for pasta ou não existir, responde vazio
     return {"exists": False}
 
 @router.delete("/temp")
-async def delete_temp(
+def delete_temp(
     path: str = Query(...),
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
     temp_path = safe_tmp(path)
+    key = draft_key(temp_path)
 
-    if temp_path.exists() and temp_path.is_file():
-        temp_path.unlink()
-
-    mark_dirty(path, False)
+    if not temp_path.is_dir():
+        drafts.discard(key)
+    mark_dirty(key, False)
     return {"ok": True, "path": path}
 
 @router.get("/dirty")
-async def get_dirty_route(
+def get_dirty_route(
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
     return {"dirty": load_dirty()}
 
 @router.delete("/dirty")
-async def clear_dirty(
+def clear_dirty(
     path: str = Query(...),
     user=Depends(require_user),
     _: str = Depends(browser_blocker),
 ):
-    mark_dirty(path, False)
+    mark_dirty(draft_key(safe_tmp(path)), False)
     return {"ok": True, "path": path}
\ No newline at end of file
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Compara os formatos de backup: cópia física (copy2, formato antigo), blob
+comprimido por versão (BACKUP_MODE=blob) e cadeia de deltas com keyframes
+(BACKUP_MODE=delta).
+
+Gera um arquivo de configuração sintético, aplica N pequenas edições com um
+backup após cada uma e mede espaço em disco e latência de restauração (cache
+frio e quente).
+
+Uso:
+    python benchmarks/bench_backups.py [--lines 2000] [--versions 200] [--keyframe 10]
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse, os, random, shutil, statistics, sys, tempfile, time
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def make_versions(lines: int, versions: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    body = [f"key_{i}: value-{rnd.randint(0, 10**6)}  # comentário {i % 17}\n" for i in range(lines)]
+    out = ["".join(body).encode()]
+    for _ in range(versions - 1):
+        for _ in range(rnd.randint(1, 3)):
+            i = rnd.randrange(len(body))
+            op = rnd.random()
+            if op < 0.7:
+                body[i] = f"key_{i}: value-{rnd.randint(0, 10**6)}\n"
+            elif op < 0.85:
+                body.insert(i, f"new_{rnd.randint(0, 10**6)}: true\n")
+            elif len(body) > 1:
+                del body[i]
+        out.append("".join(body).encode())
+    return out
+
+
+def timed(fn, reps: int = 1) -> float:
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) * 1000 / reps
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, default=2000)
+    ap.add_argument("--versions", type=int, default=200)
+    ap.add_argument("--keyframe", type=int, default=10)
+    args = ap.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-backups-"))
+    os.environ["DATA_DIR"] = str(work / "data")
+    os.environ["STATE_DIR"] = str(work / "state")
+    os.environ["BACKUP_KEYFRAME_INTERVAL"] = str(args.keyframe)
+    sys.path.insert(0, str(ROOT))
+
+    from backend.config import settings
+    from backend.core import backups
+    from backend.core.state_store import state
+
+    versions = make_versions(args.lines, args.versions)
+    data_dir = Path(settings.DATA_DIR)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    print(f"{args.versions} versões de ~{len(versions[-1]) // 1024} KiB, keyframe a cada {args.keyframe}\n")
+    print(f"{'formato':<10} {'disco':>12} {'backup/op':>11} {'restore frio':>13} {'restore quente':>15}")
+
+    try:
+        # --- copy2 (formato antigo)
+        src = data_dir / "copy2.yml"
+        copies = work / "copies"
+        copies.mkdir()
+        t_backup = []
+        for i, v in enumerate(versions):
+            src.write_bytes(v)
+            t_backup.append(timed(lambda: shutil.copy2(src, copies / f"v{i}.yml")))
+        t_restore = [timed(lambda: shutil.copy2(copies / f"v{i}.yml", src)) for i in range(len(versions))]
+        print(f"{'copy2':<10} {dir_size(copies):>10,} B {statistics.mean(t_backup):>9.2f}ms "
+              f"{statistics.mean(t_restore):>11.2f}ms {'-':>15}")
+
+        # --- blob / delta
+        for mode in ("blob", "delta"):
+            settings.BACKUP_MODE = mode
+            src = data_dir / f"{mode}.yml"
+            names = [f".backups/{mode}/v{i:05d}.yml" for i in range(len(versions))]
+            # diretório de blobs próprio: keyframes iguais aos blobs do outro modo seriam deduplicados
+            backups.BLOB_DIR = work / f"blobs-{mode}"
+            t_backup = []
+            for name, v in zip(names, versions):
+                src.write_bytes(v)
+                t_backup.append(timed(lambda: backups.create_backup(f"{mode}.yml", name, src)))
+            size = dir_size(backups.BLOB_DIR)
+
+            backups._cache = backups._ContentCache()
+            cold = [timed(lambda: backups.restore_backup(n, src)) for n in reversed(names)]
+            warm = [timed(lambda: backups.restore_backup(n, src)) for n in names]
+            assert src.read_bytes() == versions[-1], "restauração divergente"
+            for n, v in zip(names, versions):
+                assert backups.read_backup(n)[0] == v, f"conteúdo divergente em {n}"
+            print(f"{mode:<10} {size:>10,} B {statistics.mean(t_backup):>9.2f}ms "
+                  f"{statistics.mean(cold):>11.2f}ms {statistics.mean(warm):>13.2f}ms")
+    finally:
+        state.close()
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
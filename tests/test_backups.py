@@ -0,0 +1,90 @@
+import time
+from datetime import timezone
+
+import pytest
+
+from backend.config import settings
+from backend.core import backups, retention
+from backend.core.state_store import StateStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Índice e blobs isolados em tmp_path; cache desligado para sempre reconstruir dos blobs."""
+    st = StateStore(tmp_path / "state" / "state.db", legacy={})
+    monkeypatch.setattr(backups, "state", st)
+    monkeypatch.setattr(retention, "state", st)
+    monkeypatch.setattr(backups, "BLOB_DIR", tmp_path / ".backups" / ".blobs")
+    monkeypatch.setattr(retention, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(backups, "_cache", backups._ContentCache())
+    monkeypatch.setattr(settings, "BACKUP_CACHE_BYTES", 0, raising=False)
+    monkeypatch.setattr(settings, "BACKUP_KEYFRAME_INTERVAL", 10, raising=False)
+    yield st
+    st.close()
+
+
+def _version(i: int) -> bytes:
+    lines = [f"key_{n}: value {n}\n" for n in range(80)]
+    lines[i % 80] = f"key_{i % 80}: edited {i}\n"
+    return "".join(lines).encode()
+
+
+def _create(tmp_path, name: str, count: int, start: int = 0) -> dict:
+    src = tmp_path / "f.yml"
+    made = {}
+    for i in range(start, start + count):
+        src.write_bytes(_version(i))
+        rel = f".backups/f/{name}{i}.yml"
+        backups.create_backup("f.yml", rel, src)
+        made[rel] = _version(i)
+    return made
+
+
+def test_delete_base_keeps_dependents_readable(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BACKUP_MODE", "delta", raising=False)
+    made = _create(tmp_path, "v", 3)
+    names = list(made)
+    assert [store.get_backup(n)[5] is not None for n in names] == [False, True, True]
+
+    # apaga o keyframe: o primeiro delta vira keyframe, o segundo continua delta
+    assert backups.delete_backup(names[0])
+    assert store.get_backup(names[1])[5] is None
+    assert store.get_backup(names[2])[5] == store.get_backup(names[1])[4]
+    for n in names[1:]:
+        assert backups.read_backup(n)[0] == made[n]
+
+    # apaga um delta do meio: o dependente é refeito contra a base dele
+    more = _create(tmp_path, "w", 2, start=3)
+    mid, last = list(more)
+    assert backups.delete_backup(mid)
+    assert store.get_backup(last)[5] == store.get_backup(names[2])[4]
+    for n in (names[1], names[2], last):
+        assert backups.read_backup(n)[0] == {**made, **more}[n]
+    assert backups.read_backup(mid) is None
+
+
+def test_retention_over_mixed_chain_keeps_versions_readable(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "TXN_BATCH", 2)
+    monkeypatch.setattr(settings, "BACKUP_MODE", "blob", raising=False)
+    made = _create(tmp_path, "b", 3)
+    monkeypatch.setattr(settings, "BACKUP_MODE", "delta", raising=False)
+    made.update(_create(tmp_path, "d", 9, start=3))
+    kinds = {store.get_backup(n)[5] is None for n in made}
+    assert kinds == {True, False}  # keyframes (blob e delta) e deltas
+
+    # dois backups por hora: a política horária mantém só o mais novo de cada par
+    monkeypatch.setattr(settings, "TZ", timezone.utc, raising=False)
+    anchor = time.time() // 3600 * 3600 - 1800  # meio da hora anterior
+    names = list(made)
+    with store.transaction() as conn:
+        for i, n in enumerate(reversed(names)):
+            conn.execute("UPDATE backups SET created = ? WHERE backup = ?",
+                         (anchor - (i // 2) * 3600 - (i % 2), n))
+
+    report = retention.sweep({"hourly": 24})
+    assert report["deleted"] == report["expired"] == len(names) // 2
+    kept = [b for b, _ in store.list_backups("f.yml")]
+    assert kept == names[1::2]
+    for n in kept:
+        assert backups.read_backup(n)[0] == made[n]
+    assert retention.plan({"hourly": 24})["expired"] == 0
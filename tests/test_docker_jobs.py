@@ -0,0 +1,55 @@
+import asyncio, threading
+
+import pytest
+
+from backend.config import settings
+from backend.core.docker_jobs import DockerJobs, ContainerBusy, DockerTimeout
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    monkeypatch.setattr(settings, "DOCKER_WORKERS", 1, raising=False)
+    monkeypatch.setattr(settings, "DOCKER_CONTAINER_CONCURRENCY", 1, raising=False)
+    j = DockerJobs()
+    yield j
+    j.shutdown()
+
+
+def test_timeout_while_queued_releases_queue_and_container(jobs):
+    gate = threading.Event()
+
+    async def scenario():
+        slow = asyncio.ensure_future(jobs.run(gate.wait, timeout=5))
+        await asyncio.sleep(0.05)  # ocupa o único worker
+        with pytest.raises(DockerTimeout):
+            await jobs.run(lambda: "never", timeout=0.2, key="web")
+        s = jobs.stats()
+        assert s["queued"] == 0
+        assert s["busy_containers"] == []
+        gate.set()
+        await slow
+        # o container volta a aceitar operações
+        assert await jobs.run(lambda: "ok", timeout=1, key="web") == "ok"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        gate.set()
+
+
+def test_per_container_limit(jobs):
+    gate = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(jobs.run(gate.wait, timeout=5, key="web"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ContainerBusy):
+            await jobs.run(lambda: None, timeout=1, key="web")
+        gate.set()
+        await first
+        assert jobs.stats()["busy_containers"] == []
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        gate.set()
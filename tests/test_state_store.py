@@ -0,0 +1,46 @@
+import json
+import sqlite3
+
+from backend.core.state_store import SCHEMA_VERSION, StateStore
+
+
+def test_legacy_json_migrates_to_current_schema(tmp_path):
+    legacy = {
+        "index": tmp_path / "index.json",
+        "dirty": tmp_path / ".dirty.json",
+        "containers": tmp_path / ".file_containers.json",
+    }
+    legacy["index"].write_text(json.dumps({"a.yml": [".backups/a/1.yml", ".backups/a/2.yml"]}))
+    legacy["dirty"].write_text(json.dumps({"a.yml": True, "b.yml": False}))
+    legacy["containers"].write_text(json.dumps({"a.yml": "web", "c.yml": ""}))
+
+    db = tmp_path / "state" / "state.db"
+    st = StateStore(db, legacy=legacy)
+    try:
+        # backups antigos: cópias físicas, sem blob nem cadeia de delta
+        assert st.list_backups("a.yml") == [(".backups/a/1.yml", None), (".backups/a/2.yml", None)]
+        assert st.get_backup(".backups/a/2.yml")[1:] == (None, None, None, 2, None, 0)
+        assert st.dirty_map() == {"a.yml": True}
+        assert st.containers_map() == {"a.yml": "web"}
+        # tabelas das migrações 4 e 5 existem e funcionam
+        st.set_schema("*.yml", "schemas/app.json")
+        assert st.schemas_map() == {"*.yml": "schemas/app.json"}
+        assert st.validations_under("") == {}
+    finally:
+        st.close()
+
+    conn = sqlite3.connect(str(db))
+    try:
+        version = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0]
+    finally:
+        conn.close()
+    assert int(version) == SCHEMA_VERSION == 5
+
+    # reabrir não importa os JSON de novo
+    legacy["dirty"].write_text(json.dumps({"z.yml": True}))
+    again = StateStore(db, legacy=legacy)
+    try:
+        assert again.dirty_map() == {"a.yml": True}
+        assert len(again.all_backups()) == 2
+    finally:
+        again.close()